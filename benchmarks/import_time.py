@@ -0,0 +1,55 @@
+"""Import-time benchmark of indiff.
+
+Times, in fresh interpreters, importing the package, its pure-numpy
+kernels, and the full xarray-based operators, and reports whether xarray
+was imported.
+
+Usage: python benchmarks/import_time.py [--repeat N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+STATEMENTS = [
+    ('numpy', 'import numpy'),
+    ('indiff', 'import indiff'),
+    ('indiff.kernels', 'import indiff.kernels'),
+    ('indiff.Workspace', 'from indiff import Workspace'),
+    ('indiff.CenDeriv', 'from indiff import CenDeriv'),
+    ('indiff.advec', 'import indiff.advec'),
+]
+
+_TIMER = ('import sys, time; start = time.perf_counter(); {}; '
+          'print(time.perf_counter() - start, "xarray" in sys.modules)')
+
+
+def time_import(statement, repeat):
+    """Best time over fresh interpreters, and whether xarray was imported."""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root] + [path for path in [env.get('PYTHONPATH')] if path]
+    )
+    times = []
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, '-c', _TIMER.format(statement)], env=env
+        ).decode().split()
+        times.append(float(out[0]))
+    return min(times), out[1] == 'True'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print('{:<20} {:>10}  {}'.format('import', 'time (ms)', 'xarray'))
+    for label, statement in STATEMENTS:
+        seconds, xarray = time_import(statement, args.repeat)
+        print('{:<20} {:>10.1f}  {}'.format(label, 1e3*seconds,
+                                            'yes' if xarray else 'no'))
+
+
+if __name__ == '__main__':
+    main()
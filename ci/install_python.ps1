@@ -8,7 +8,7 @@ $BASE_URL = "https://www.python.org/ftp/python/"
 
 function DownloadMiniconda ($python_version, $platform_suffix) {
     $webclient = New-Object System.Net.WebClient
-    $py3versions = "3.4", "3.5", "3.6"
+    $py3versions = "3.8", "3.9", "3.10", "3.11"
     if ($py3versions -contains $python_version) {
         $filename = "Miniconda3-latest-Windows-" + $platform_suffix + ".exe"
     } else {
@@ -1,13 +1,47 @@
-"""Utilities, numerical derivatives, and advection via finite differencing."""
+"""Utilities, numerical derivatives, and advection via finite differencing.
+
+Subpackages and the names below are imported on first access, so that
+importing the package, or only its pure-numpy parts such as `kernels` and
+`workspace`, doesn't import xarray.
+"""
+import importlib
+
 from ._constants import _PFULL_STR, _RADEARTH
-from . import utils
-from . import diff
-from .diff import FiniteDiff, OneSidedDiff, FwdDiff, BwdDiff, CenDiff
-from . import coord
-from .coord import Coord, HorizCoord, XCoord, YCoord, Lon, Lat
-from .coord import VertCoord, ZCoord, Pressure, Sigma, Eta
-from . import geom
-from . import deriv
-from .deriv import FiniteDeriv, OneSidedDeriv, FwdDeriv, BwdDeriv, CenDeriv
-from . import advec
-from .advec import Advec, CenAdvec, Upwind
+
+_SUBMODULES = ['utils', 'workspace', 'kernels', 'region', 'incremental',
+               'cache', 'lazy', 'ensemble', 'shared', 'pickling', 'diff',
+               'coord', 'geom', 'deriv', 'advec', 'integrate']
+_ATTRS = {
+    'workspace': ['Workspace'],
+    'region': ['Region'],
+    'incremental': ['IncrementalStore'],
+    'cache': ['ResultCache'],
+    'ensemble': ['EnsembleRunner'],
+    'shared': ['SharedMemoryRunner'],
+    'diff': ['FiniteDiff', 'OneSidedDiff', 'FwdDiff', 'BwdDiff', 'CenDiff'],
+    'coord': ['Coord', 'HorizCoord', 'XCoord', 'YCoord', 'Lon', 'Lat',
+              'VertCoord', 'ZCoord', 'Pressure', 'Sigma', 'Eta'],
+    'deriv': ['FiniteDeriv', 'OneSidedDeriv', 'FwdDeriv', 'BwdDeriv',
+              'CenDeriv', 'CompactDeriv', 'StencilMap'],
+    'advec': ['Advec', 'CenAdvec', 'Upwind'],
+    'integrate': ['ForwardEuler', 'SSPRK2', 'SSPRK3'],
+}
+_ATTR_MODULES = {attr: module for module, attrs in _ATTRS.items()
+                 for attr in attrs}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if name in _ATTR_MODULES:
+        value = getattr(importlib.import_module(
+            '.' + _ATTR_MODULES[name], __name__
+        ), name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module '{}' has no attribute "
+                         "'{}'".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES) | set(_ATTR_MODULES))
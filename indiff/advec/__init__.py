@@ -7,4 +7,17 @@ from . import upwind
 from .upwind import Upwind
 from . import phys
 from .phys import (PhysUpwind, LonUpwind, LatUpwind, EtaUpwind, SphereUpwind,
-                   LonUpwindConstP, LatUpwindConstP, SphereEtaUpwind)
+                   PressureUpwind, LonUpwindConstP, LatUpwindConstP,
+                   SphereEtaUpwind, SigmaUpwind, LonSigmaUpwindConstP,
+                   LatSigmaUpwindConstP, SphereSigmaUpwind)
+from . import flux
+from .flux import (FluxDiv, LonFluxDiv, LatFluxDiv, EtaFluxDiv,
+                   SphereEtaFluxDiv)
+from . import tvd
+from .tvd import TVDUpwind, LonTVDUpwind, LatTVDUpwind, EtaTVDUpwind
+from . import semi_lagrangian
+from .semi_lagrangian import SphereEtaSemiLagrangian
+from . import batch
+from .batch import SphereEtaBatchUpwind
+from . import implicit
+from .implicit import EtaImplicitFluxDiv
@@ -1,7 +1,8 @@
 from ..deriv import FiniteDeriv
+from ..pickling import LightPickle
 
 
-class Advec(object):
+class Advec(LightPickle):
     """Base class for advection."""
     _DERIV_CLS = FiniteDeriv
 
@@ -10,7 +11,7 @@ class Advec(object):
         return self._deriv_obj.deriv()
 
     def __init__(self, flow, arr, dim, coord=None, spacing=1, order=2,
-                 fill_edge=True):
+                 fill_edge=True, workspace=None):
         self.flow = flow
         self.arr = arr
         self.dim = dim
@@ -18,10 +19,12 @@ class Advec(object):
         self.spacing = spacing
         self.order = order
         self.fill_edge = fill_edge
+        self.workspace = workspace
         self._deriv_obj = self._DERIV_CLS(self.arr, self.dim, coord=self.coord,
                                           spacing=self.spacing,
                                           order=self.order,
-                                          fill_edge=self.fill_edge)
+                                          fill_edge=self.fill_edge,
+                                          workspace=self.workspace)
 
     def advec(self):
         """Advect the tracer array with the flow."""
@@ -0,0 +1,170 @@
+"""Upwind advection of many tracers by the same flow."""
+import numpy as np
+import xarray as xr
+
+from .._constants import LON_STR, LAT_STR, PFULL_STR, _RADEARTH
+from ..geom import SphereEtaGeom
+from ..geom.horiz import _along
+from ..kernels import cen_deriv
+from ..pickling import LightPickle
+from ..utils import broadcastable
+
+_TRACER_DIM = 'tracer'
+
+
+class SphereEtaBatchUpwind(LightPickle):
+    """Upwind advection of a stack of tracers in lat-lon and hybrid
+    sigma-pressure coordinates.
+
+    Gives the same result for each tracer as `SphereEtaUpwind` with its
+    defaults.  Everything that depends only on the flow, the grid, and the
+    surface pressure is computed once, at construction: the positive and
+    negative parts of each flow component, already multiplied by the metric
+    factors; the pressure at the full levels; and the flow-weighted surface
+    pressure gradients of the transformation to constant pressure.  Each
+    call then differences all of the tracers at once.
+    """
+    _DATA_ARGS = LightPickle._DATA_ARGS + ('u', 'v', 'omega')
+    _DIFF_DIMS = (LON_STR, LAT_STR, PFULL_STR)
+
+    def __init__(self, u, v, omega, pk, bk, ps, spacing=1, order=2,
+                 cyclic_lon=True, radius=_RADEARTH):
+        """
+        :param u: Zonal flow, with dims including pfull, lat, and lon.
+        :param v: Meridional flow, with the same dims as `u`.
+        :param omega: Flow in pressure, with the same dims as `u`.
+        """
+        self.u = u
+        self.v = v
+        self.omega = omega
+        self.pk = pk
+        self.bk = bk
+        self.ps = ps
+        self.spacing = spacing
+        self.order = order
+        self.cyclic_lon = cyclic_lon
+        self.radius = radius
+        self.dims = u.dims
+
+        self._geom = SphereEtaGeom(u[LON_STR], u[LAT_STR], pk, bk,
+                                   u[PFULL_STR], spacing=spacing,
+                                   order=order, cyclic_lon=cyclic_lon,
+                                   radius=radius)
+        self._horiz_geom = self._geom._horiz_geom
+        self._x_axis = u.get_axis_num(LON_STR)
+        self._y_axis = u.get_axis_num(LAT_STR)
+        self._z_axis = u.get_axis_num(PFULL_STR)
+
+        u_values = (self._values(u) *
+                    _along(self._horiz_geom.x_prefactor, u, LAT_STR))
+        v_values = self._values(v)*self._horiz_geom.y_prefactors['grad']
+        self._flows = {}
+        for name, values in [('x', u_values), ('y', v_values),
+                             ('z', self._values(omega))]:
+            self._flows[name] = (np.maximum(values, 0),
+                                 np.minimum(values, 0))
+        self.pfull = broadcastable(self._geom.z.pfull_from_ps(ps), u)
+
+        ps_values = self._values(ps.broadcast_like(u))
+        factor = self._values(self._geom.bk_at_pfull /
+                              (self._geom.da_deta + self._geom.db_deta*ps))
+        self._const_p_coeffs = {'x': self._upwind_x(ps_values)*factor,
+                                'y': self._upwind_y(ps_values)*factor}
+        self._const_p_coeffs['horiz'] = (self._const_p_coeffs['x'] +
+                                         self._const_p_coeffs['y'])
+
+    def _values(self, arr):
+        """Values of the array, broadcastable against the flow."""
+        return broadcastable(arr, self.u)
+
+    def _axis(self, values, axis):
+        """Axis of the values, which may have leading tracer axes."""
+        return values.ndim - len(self.dims) + axis
+
+    def _upwind(self, flows, bwd, fwd):
+        pos, neg = flows
+        return pos*bwd + neg*fwd
+
+    def _upwind_x(self, values):
+        geom = self._horiz_geom
+        if geom.x_halo_map is None:
+            bwd, fwd = geom._derivs_bwd_fwd(
+                values, geom.x_values, self._axis(values, self._x_axis)
+            )
+        else:
+            bwd, fwd = geom._derivs_bwd_fwd(
+                values, geom._x_values_halo,
+                self._axis(values, self._x_axis), halo_map=geom.x_halo_map
+            )
+        return self._upwind(self._flows['x'], bwd, fwd)
+
+    def _upwind_y(self, values):
+        bwd, fwd = self._horiz_geom._derivs_bwd_fwd(
+            values, self._horiz_geom.y_values,
+            self._axis(values, self._y_axis)
+        )
+        return self._upwind(self._flows['y'], bwd, fwd)
+
+    def _upwind_z(self, values):
+        pfull = self.pfull.reshape((1,)*(values.ndim - self.pfull.ndim) +
+                                   self.pfull.shape)
+        bwd, fwd = self._horiz_geom._derivs_bwd_fwd(
+            values, pfull, self._axis(values, self._z_axis)
+        )
+        return self._upwind(self._flows['z'], bwd, fwd)
+
+    def _const_p_correction(self, values, component):
+        """Horizontal advection's correction to constant pressure."""
+        axis = self._axis(values, self._z_axis)
+        darr_deta = cen_deriv(values, np.arange(values.shape[axis],
+                                                dtype=float), axis=axis)
+        return darr_deta*self._const_p_coeffs[component]
+
+    def _stack(self, tracers):
+        """Tracers as an array with the flow's dims last."""
+        if isinstance(tracers, xr.Dataset):
+            tracers = tracers.to_array(dim=_TRACER_DIM)
+        extra_dims = [dim for dim in tracers.dims if dim not in self.dims]
+        return tracers.transpose(*(extra_dims + list(self.dims)))
+
+    def _apply(self, tracers, func):
+        stacked = self._stack(tracers)
+        result = stacked.copy(data=func(np.asarray(stacked.values)))
+        if isinstance(tracers, xr.Dataset):
+            return result.to_dataset(dim=_TRACER_DIM)
+        return result.transpose(*tracers.dims)
+
+    def advec_x_const_p(self, tracers):
+        """Zonal advection at constant pressure of each of the tracers.
+
+        :param tracers: Either an array with the flow's dims plus one or more
+            others, e.g. one indexing the tracers, or a `Dataset` with one
+            tracer per variable.
+        """
+        return self._apply(tracers, lambda values: (
+            self._upwind_x(values) + self._const_p_correction(values, 'x')
+        ))
+
+    def advec_y_const_p(self, tracers):
+        return self._apply(tracers, lambda values: (
+            self._upwind_y(values) + self._const_p_correction(values, 'y')
+        ))
+
+    def advec_horiz_const_p(self, tracers):
+        return self._apply(tracers, lambda values: (
+            self._upwind_x(values) + self._upwind_y(values) +
+            self._const_p_correction(values, 'horiz')
+        ))
+
+    def advec_p(self, tracers):
+        return self._apply(tracers, self._upwind_z)
+
+    advec_z = advec_p
+
+    def advec_3d(self, tracers):
+        """Three-dimensional advection of each of the tracers."""
+        return self._apply(tracers, lambda values: (
+            self._upwind_x(values) + self._upwind_y(values) +
+            self._const_p_correction(values, 'horiz') +
+            self._upwind_z(values)
+        ))
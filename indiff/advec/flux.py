@@ -0,0 +1,229 @@
+"""Advection in flux form, conserving the tracer.
+
+Rather than the flow times the gradient of the tracer, these compute the
+divergence of the tracer's flux, with finite volumes centered on the
+gridpoints.  The flux through each face leaves one cell and enters its
+neighbor, so that the tracer summed over the domain, weighted by the cells'
+sizes, is conserved to round-off.
+"""
+import numpy as np
+import xarray as xr
+
+from .._constants import LON_STR, LAT_STR, PFULL_STR, _RADEARTH
+from ..coord import Eta
+from ..kernels import flux_div
+from ..pickling import LightPickle
+from ..utils import broadcastable, to_radians
+
+
+def _face_values(values, cyclic=False, circumf=0.):
+    """Coordinate values at the faces between the points.
+
+    If not cyclic, the outer faces lie half a cell beyond the edge points.
+    Otherwise there is one face per point, the last between the last point
+    and the first point moved on by `circumf`.
+    """
+    values = np.asarray(values, dtype=float)
+    if cyclic:
+        upper = np.append(values[1:], values[0] + circumf)
+        return 0.5*(values + upper)
+    inner = 0.5*(values[1:] + values[:-1])
+    return np.concatenate([[1.5*values[0] - 0.5*values[1]], inner,
+                           [1.5*values[-1] - 0.5*values[-2]]])
+
+
+def _cell_widths(values, cyclic=False, circumf=0.):
+    faces = _face_values(values, cyclic=cyclic, circumf=circumf)
+    if cyclic:
+        return np.diff(np.append(faces[-1] - circumf, faces))
+    return np.diff(faces)
+
+
+def _flux_div(arr, flow, dim, widths, face_factor=None, scheme='upwind',
+              cyclic=False):
+    values = flux_div(np.asarray(arr.values),
+                      np.asarray(flow.transpose(*arr.dims).values), widths,
+                      axis=arr.get_axis_num(dim), face_factor=face_factor,
+                      scheme=scheme, cyclic=cyclic)
+    return xr.DataArray(values, dims=arr.dims, coords=arr.coords)
+
+
+def _lon_metrics(lon, cyclic):
+    lon = np.asarray(to_radians(lon).values, dtype=float)
+    return _cell_widths(lon, cyclic=cyclic, circumf=2*np.pi)
+
+
+def _lat_metrics(lat):
+    """Widths in sin(lat) of the cells, and cos(lat) at the inner faces.
+
+    The outer faces are at most at the poles.
+    """
+    lat = np.asarray(to_radians(lat).values, dtype=float)
+    faces = np.clip(_face_values(lat), -0.5*np.pi, 0.5*np.pi)
+    return np.diff(np.sin(faces)), np.cos(faces[1:-1])
+
+
+class FluxDiv(LightPickle):
+    """Divergence of the flux of a tracer along one dimension."""
+    _SCHEMES = ('upwind', 'centered')
+
+    def __init__(self, flow, arr, dim, coord=None, scheme='upwind',
+                 cyclic=False, circumf=0.):
+        """
+        :param flow: Flow along the dimension, with the same dims as `arr`.
+        :param arr: Tracer being advected.
+        :param str dim: Dimension along which to take the divergence.
+        :param coord: Coordinate of the cell centers.  If not given,
+            arr[dim] is used.
+        :param str scheme: Value of the tracer at the faces: 'upwind' for
+            that of the upstream cell, or 'centered' for the mean of the two
+            cells.
+        :param bool cyclic: Whether the dimension is cyclic, with the flux
+            through the last face entering the first cell.
+        :param float circumf: Span of the coordinate, if cyclic.
+        """
+        if scheme not in self._SCHEMES:
+            raise ValueError("Scheme must be one of {}: "
+                             "'{}'".format(self._SCHEMES, scheme))
+        self.flow = flow
+        self.arr = arr
+        self.dim = dim
+        self.coord = coord if coord is not None else arr[dim]
+        self.scheme = scheme
+        self.cyclic = cyclic
+        self.circumf = circumf
+        self.widths = _cell_widths(self.coord.values, cyclic=cyclic,
+                                   circumf=circumf)
+
+    def advec(self):
+        """Divergence of the flux of the tracer by the flow."""
+        return _flux_div(self.arr, self.flow, self.dim, self.widths,
+                         scheme=self.scheme, cyclic=self.cyclic)
+
+
+class LonFluxDiv(FluxDiv):
+    """Divergence in longitude of the flux of a tracer on the sphere."""
+    def __init__(self, flow, arr, dim=None, coord=None, scheme='upwind',
+                 cyclic=True, radius=_RADEARTH):
+        dim = dim if dim is not None else LON_STR
+        super(LonFluxDiv, self).__init__(flow, arr, dim, coord=coord,
+                                         scheme=scheme, cyclic=cyclic,
+                                         circumf=2*np.pi)
+        self.radius = radius
+        self.widths = _lon_metrics(self.coord, cyclic)
+
+    def advec(self):
+        return (super(LonFluxDiv, self).advec() /
+                (self.radius*np.cos(to_radians(self.arr[LAT_STR]))))
+
+
+class LatFluxDiv(FluxDiv):
+    """Divergence in latitude of the flux of a tracer on the sphere.
+
+    The cells' widths are in sin(lat), i.e. proportional to their areas.
+    """
+    def __init__(self, flow, arr, dim=None, coord=None, scheme='upwind',
+                 radius=_RADEARTH):
+        dim = dim if dim is not None else LAT_STR
+        super(LatFluxDiv, self).__init__(flow, arr, dim, coord=coord,
+                                         scheme=scheme)
+        self.radius = radius
+        self.widths, self.face_cos_lat = _lat_metrics(self.coord)
+
+    def advec(self):
+        return _flux_div(self.arr, self.flow, self.dim, self.widths,
+                         face_factor=self.face_cos_lat,
+                         scheme=self.scheme) / self.radius
+
+
+class EtaFluxDiv(FluxDiv):
+    """Divergence in pressure of the flux of a tracer on hybrid levels.
+
+    The cells are the layers between the half levels, so that the tracer
+    summed over each column, weighted by the layers' pressure thickness, is
+    conserved.  No flux passes through the top or the surface.
+    """
+    def __init__(self, flow, arr, pk, bk, ps, dim=None, scheme='upwind'):
+        """
+        :param flow: Flow in pressure, i.e. omega, on the full levels.
+        """
+        dim = dim if dim is not None else PFULL_STR
+        if scheme not in self._SCHEMES:
+            raise ValueError("Scheme must be one of {}: "
+                             "'{}'".format(self._SCHEMES, scheme))
+        self.flow = flow
+        self.arr = arr
+        self.pk = pk
+        self.bk = bk
+        self.ps = ps
+        self.dim = dim
+        self.scheme = scheme
+        self.cyclic = False
+        self._coord_obj = Eta(pk, bk, arr[dim], dim=dim)
+        self.dp = self._coord_obj.dp_from_ps(ps)
+        self.widths = broadcastable(self.dp, arr)
+
+    def advec(self):
+        return _flux_div(self.arr, self.flow, self.dim, self.widths,
+                         scheme=self.scheme)
+
+
+class SphereEtaFluxDiv(LightPickle):
+    """Flux-form advection in lat-lon and hybrid sigma-pressure coordinates.
+
+    The metric terms of the grid, and the pressure thickness of the layers,
+    are computed once and shared by all of the components.
+    """
+    _DIFF_DIMS = (LON_STR, LAT_STR, PFULL_STR)
+
+    def __init__(self, arr, pk, bk, ps, scheme='upwind', cyclic_lon=True,
+                 radius=_RADEARTH):
+        """
+        :param str scheme: 'upwind' or 'centered'; see `FluxDiv`.
+        """
+        if scheme not in FluxDiv._SCHEMES:
+            raise ValueError("Scheme must be one of {}: "
+                             "'{}'".format(FluxDiv._SCHEMES, scheme))
+        self.arr = arr
+        self.pk = pk
+        self.bk = bk
+        self.ps = ps
+        self.scheme = scheme
+        self.cyclic_lon = cyclic_lon
+        self.radius = radius
+
+        self.lon_widths = _lon_metrics(arr[LON_STR], cyclic_lon)
+        self.lat_widths, self.face_cos_lat = _lat_metrics(arr[LAT_STR])
+        self.cos_lat = np.cos(to_radians(arr[LAT_STR]))
+        self.dp = Eta(pk, bk, arr[PFULL_STR]).dp_from_ps(ps)
+        self._dp_widths = broadcastable(self.dp, arr)
+
+    def cell_area(self):
+        """Horizontal area of each cell."""
+        return (self.radius**2 *
+                xr.DataArray(self.lon_widths, dims=[LON_STR],
+                             coords={LON_STR: self.arr[LON_STR]}) *
+                xr.DataArray(self.lat_widths, dims=[LAT_STR],
+                             coords={LAT_STR: self.arr[LAT_STR]}))
+
+    def advec_x(self, u):
+        return _flux_div(self.arr, u, LON_STR, self.lon_widths,
+                         scheme=self.scheme, cyclic=self.cyclic_lon) / (
+                             self.radius*self.cos_lat)
+
+    def advec_y(self, v):
+        return _flux_div(self.arr, v, LAT_STR, self.lat_widths,
+                         face_factor=self.face_cos_lat,
+                         scheme=self.scheme) / self.radius
+
+    def advec_horiz(self, u, v):
+        return self.advec_x(u) + self.advec_y(v)
+
+    def advec_p(self, omega):
+        return _flux_div(self.arr, omega, PFULL_STR, self._dp_widths,
+                         scheme=self.scheme)
+
+    advec_z = advec_p
+
+    def advec_3d(self, u, v, omega):
+        return self.advec_horiz(u, v) + self.advec_p(omega)
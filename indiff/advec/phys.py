@@ -1,8 +1,16 @@
+import xarray as xr
+
 from .._constants import LON_STR, LAT_STR, PFULL_STR
 from ..deriv import (PhysDeriv, LonBwdDeriv, LonFwdDeriv, LatBwdDeriv,
                      LatFwdDeriv, EtaBwdDeriv, EtaFwdDeriv,
-                     SphereEtaBwdDeriv, SphereEtaFwdDeriv)
+                     PressureBwdDeriv, PressureFwdDeriv, SigmaBwdDeriv,
+                     SigmaFwdDeriv, SphereEtaBwdDeriv, SphereEtaFwdDeriv,
+                     SphereSigmaBwdDeriv, SphereSigmaFwdDeriv)
+from ..lazy import Expr, Term, Value, maximum, minimum
+from ..pickling import LightPickle
+from ..utils import broadcastable
 from . import Upwind
+from .upwind import _check_scheme
 
 
 def _make_derivs(obj, arr, *deriv_args, **deriv_kwargs):
@@ -20,7 +28,11 @@ class PhysUpwind(Upwind):
     _ADVEC_CLS = Upwind
 
     def __init__(self, flow, arr, dim, coord=None, spacing=1, order=2,
-                 cyclic=False, fill_edge=True):
+                 cyclic=False, fill_edge=True, workspace=None, scheme=None):
+        """
+        :param str scheme: 'upwind3' or 'weno5', if not to use the finite
+            differences; see `Upwind`.
+        """
         self.flow = flow
         self.arr = arr
         self.dim = dim
@@ -29,10 +41,13 @@ class PhysUpwind(Upwind):
         self.order = order
         self.cyclic = cyclic
         self.fill_edge = fill_edge
+        self.workspace = workspace
+        self.scheme = _check_scheme(scheme)
 
         deriv_args = [dim]
         deriv_kwargs = dict(coord=coord, spacing=spacing, order=order,
-                            cyclic=cyclic, fill_edge=fill_edge)
+                            cyclic=cyclic, fill_edge=fill_edge,
+                            workspace=workspace)
         _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
 
     def _derivs_bwd_fwd(self, *args, **kwargs):
@@ -44,6 +59,8 @@ class PhysUpwind(Upwind):
         opposite signed differencing is used with the same order of accuracy as
         in the interior.
         """
+        if getattr(self, 'scheme', None) is not None:
+            return self._reconstructed_derivs(*args, **kwargs)
         bwd = self._deriv_bwd(*args, **kwargs)
         fwd = self._deriv_fwd(*args, **kwargs)
         # Forward diff on left edge; backward diff on right edge if not cyclic.
@@ -51,6 +68,50 @@ class PhysUpwind(Upwind):
             return bwd, fwd
         return self._swap_bwd_fwd_edges(bwd, fwd)
 
+    def _reconstructed_derivs(self, *args, **kwargs):
+        """Derivs from the scheme's face values, with the same physical
+        factors as the finite-difference derivs."""
+        deriv_obj = self._deriv_bwd_obj
+        arr = deriv_obj.arr * deriv_obj.deriv_factor(*args, **kwargs)
+        coord = deriv_obj._prep_coord(deriv_obj.coord.copy(deep=True))
+        circumf = float(deriv_obj._prep_coord(
+            xr.DataArray(float(deriv_obj._WRAP_CIRCUMF))
+        ))
+        return self._reconstruct(
+            arr, broadcastable(coord, arr), cyclic=self.cyclic,
+            circumf=circumf,
+            prefactor=deriv_obj._coord_obj.deriv_prefactor(*args, **kwargs)
+        )
+
+    def _with_edge(self, arr, other, edge):
+        """Copy of the array with its values at the edge from `other`."""
+        arr = arr.copy()
+        arr[{self.dim: edge}] = other[{self.dim: edge}]
+        return arr
+
+    def _slice_middle(self, arr):
+        return arr[{self.dim: slice(self.order, -self.order)}]
+
+    def _advec_expr(self, *args, **kwargs):
+        """Upwind advection as an unevaluated `indiff.lazy.Expr`."""
+        derivs = []
+        for deriv_obj, deriv in [(self._deriv_bwd_obj, self._deriv_bwd),
+                                 (self._deriv_fwd_obj, self._deriv_fwd)]:
+            if getattr(deriv_obj, 'lazy', False):
+                derivs.append(deriv(*args, **kwargs))
+            else:
+                derivs.append(Term(deriv, args, kwargs))
+        bwd, fwd = derivs
+        cyclic = getattr(self, 'cyclic', False)
+        if not cyclic:
+            bwd, fwd = (Term(self._with_edge, [bwd, fwd, 0]),
+                        Term(self._with_edge, [fwd, bwd, -1]))
+        flow = Value(self.flow)
+        advec_arr = maximum(flow, 0)*bwd + minimum(flow, 0)*fwd
+        if not self.fill_edge and not cyclic:
+            advec_arr = Term(self._slice_middle, [advec_arr])
+        return advec_arr
+
     def advec(self, *args, **kwargs):
         """
         Upwind differencing scheme for advection.
@@ -61,9 +122,10 @@ class PhysUpwind(Upwind):
         :param arr: Field being advected.
         :param flow: Flow that is advecting the field.
         """
+        if getattr(self, 'lazy', False):
+            return self._advec_expr(*args, **kwargs)
         bwd, fwd = self._derivs_bwd_fwd(*args, **kwargs)
-        neg, pos = self._flow_neg_pos()
-        advec_arr = pos*bwd + neg*fwd
+        advec_arr = self._weight_by_flow(bwd, fwd)
         if not self.fill_edge and not self.cyclic:
             slice_middle = {self.dim: slice(self.order, -self.order)}
             advec_arr = advec_arr[slice_middle]
@@ -77,20 +139,23 @@ class LonUpwind(PhysUpwind):
     _DIM = LON_STR
 
     def __init__(self, flow, arr, dim=None, coord=None, spacing=1, order=2,
-                 cyclic=True, fill_edge=False):
+                 cyclic=True, fill_edge=False, workspace=None, scheme=None):
         self.flow = flow
         self.arr = arr
         self.spacing = spacing
         self.order = order
         self.cyclic = cyclic
         self.fill_edge = fill_edge
+        self.workspace = workspace
+        self.scheme = _check_scheme(scheme)
 
         self.dim = dim if dim is not None else self._DIM
         self.coord = coord if coord is not None else self.arr[self._DIM]
 
         deriv_args = [self.dim]
         deriv_kwargs = dict(coord=coord, spacing=spacing, order=order,
-                            fill_edge=True, cyclic=cyclic)
+                            fill_edge=True, cyclic=cyclic,
+                            workspace=workspace)
         _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
 
 
@@ -101,19 +166,22 @@ class LatUpwind(PhysUpwind):
     _DIM = LAT_STR
 
     def __init__(self, flow, arr, dim=None, coord=None, spacing=1, order=2,
-                 fill_edge=True):
+                 fill_edge=True, workspace=None, scheme=None):
         self.flow = flow
         self.arr = arr
         self.spacing = spacing
         self.order = order
+        self.cyclic = False
         self.fill_edge = fill_edge
+        self.workspace = workspace
+        self.scheme = _check_scheme(scheme)
 
         self.dim = dim if dim is not None else self._DIM
         self.coord = coord if coord is not None else self.arr[self._DIM]
 
         deriv_args = [self.dim]
         deriv_kwargs = dict(coord=coord, spacing=spacing, order=order,
-                            fill_edge=True)
+                            fill_edge=True, workspace=workspace)
         _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
 
 
@@ -124,7 +192,7 @@ class EtaUpwind(PhysUpwind):
     _DIM = PFULL_STR
 
     def __init__(self, flow, arr, pk, bk, ps, dim=None, coord=None, spacing=1,
-                 order=2, fill_edge=True):
+                 order=2, fill_edge=True, workspace=None, scheme=None):
         self.flow = flow
         self.arr = arr
         self.pk = pk
@@ -132,13 +200,77 @@ class EtaUpwind(PhysUpwind):
         self.ps = ps
         self.spacing = spacing
         self.order = order
+        self.cyclic = False
         self.fill_edge = fill_edge
+        self.workspace = workspace
+        self.scheme = _check_scheme(scheme)
 
         self.dim = dim if dim is not None else self._DIM
         self.coord = coord if coord is not None else self.arr[self._DIM]
 
         deriv_args = [self.pk, self.bk, self.ps]
-        deriv_kwargs = dict(spacing=spacing, order=order, fill_edge=True)
+        deriv_kwargs = dict(spacing=spacing, order=order, fill_edge=True,
+                            workspace=workspace)
+        _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
+
+    def _reconstructed_derivs(self):
+        deriv_obj = self._deriv_bwd_obj
+        pfull = deriv_obj.pfull_from_ps(self.ps)
+        return self._reconstruct(deriv_obj.arr,
+                                 broadcastable(pfull, deriv_obj.arr))
+
+
+class PressureUpwind(PhysUpwind):
+    """Vertical upwind advection on fixed pressure levels.
+
+    The differencing weights at each level are computed once, and no surface
+    pressure is needed.
+    """
+    _DERIV_BWD_CLS = PressureBwdDeriv
+    _DERIV_FWD_CLS = PressureFwdDeriv
+
+    def __init__(self, flow, arr, dim, p=None, spacing=1, order=2,
+                 fill_edge=True, workspace=None):
+        self.flow = flow
+        self.arr = arr
+        self.dim = dim
+        self.p = p
+        self.spacing = spacing
+        self.order = order
+        self.cyclic = False
+        self.fill_edge = fill_edge
+        self.workspace = workspace
+
+        deriv_args = [dim]
+        deriv_kwargs = dict(p=p, spacing=spacing, order=order,
+                            fill_edge=True, workspace=workspace)
+        _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
+
+
+class SigmaUpwind(PhysUpwind):
+    """Vertical upwind advection in pressure on sigma levels.
+
+    The flow is that in pressure, e.g. omega.  See `SigmaDeriv`.
+    """
+    _DERIV_BWD_CLS = SigmaBwdDeriv
+    _DERIV_FWD_CLS = SigmaFwdDeriv
+
+    def __init__(self, flow, arr, ps, dim, sigma=None, spacing=1, order=2,
+                 fill_edge=True, workspace=None):
+        self.flow = flow
+        self.arr = arr
+        self.ps = ps
+        self.dim = dim
+        self.sigma = sigma
+        self.spacing = spacing
+        self.order = order
+        self.cyclic = False
+        self.fill_edge = fill_edge
+        self.workspace = workspace
+
+        deriv_args = [ps, dim]
+        deriv_kwargs = dict(sigma=sigma, spacing=spacing, order=order,
+                            fill_edge=True, workspace=workspace)
         _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
 
 
@@ -150,7 +282,12 @@ class LonUpwindConstP(PhysUpwind):
     _DERIV_METHOD = 'd_dx_const_p'
 
     def __init__(self, flow, arr, pk, bk, ps, dim=None, coord=None, spacing=1,
-                 order=2, cyclic=True, fill_edge=False):
+                 order=2, cyclic=True, fill_edge=False, workspace=None,
+                 lazy=False):
+        """
+        :param bool lazy: If True, `advec` returns an unevaluated
+            `indiff.lazy.Expr`.
+        """
         self.flow = flow
         self.arr = arr
         self.pk = pk
@@ -160,13 +297,16 @@ class LonUpwindConstP(PhysUpwind):
         self.order = order
         self.cyclic = cyclic
         self.fill_edge = fill_edge
+        self.workspace = workspace
+        self.lazy = lazy
 
         self.dim = dim if dim is not None else self._DIM
         self.coord = coord if coord is not None else self.arr[self._DIM]
 
         deriv_args = [self.pk, self.bk, self.ps]
         deriv_kwargs = dict(spacing=spacing, order=order, cyclic_lon=cyclic,
-                            fill_edge_lon=fill_edge)
+                            fill_edge_lon=fill_edge, workspace=workspace,
+                            lazy=lazy)
         _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
 
 
@@ -178,7 +318,11 @@ class LatUpwindConstP(PhysUpwind):
     _DERIV_METHOD = 'd_dy_const_p'
 
     def __init__(self, flow, arr, pk, bk, ps, dim=None, coord=None, spacing=1,
-                 order=2, fill_edge=True):
+                 order=2, fill_edge=True, workspace=None, lazy=False):
+        """
+        :param bool lazy: If True, `advec` returns an unevaluated
+            `indiff.lazy.Expr`.
+        """
         self.flow = flow
         self.arr = arr
         self.pk = pk
@@ -187,13 +331,16 @@ class LatUpwindConstP(PhysUpwind):
         self.spacing = spacing
         self.order = order
         self.fill_edge = fill_edge
+        self.workspace = workspace
+        self.lazy = lazy
 
         self.dim = dim if dim is not None else self._DIM
         self.coord = coord if coord is not None else self.arr[self._DIM]
 
         deriv_args = [self.pk, self.bk, self.ps]
         deriv_kwargs = dict(spacing=spacing, order=order,
-                            fill_edge_lat=fill_edge)
+                            fill_edge_lat=fill_edge, workspace=workspace,
+                            lazy=lazy)
         _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
 
 
@@ -201,9 +348,10 @@ class SphereUpwind(PhysUpwind):
     """Upwind horizontal advection in longitude and latitude."""
     _X_ADVEC_CLS = LonUpwind
     _Y_ADVEC_CLS = LatUpwind
+    _DIFF_DIMS = (LON_STR, LAT_STR)
 
     def __init__(self, arr, spacing=1, order=2, cyclic_lon=True,
-                 fill_edge_lon=False, fill_edge_lat=True):
+                 fill_edge_lon=False, fill_edge_lat=True, workspace=None):
         self.arr = arr
         self.lat = arr[LAT_STR]
         self.spacing = spacing
@@ -211,10 +359,12 @@ class SphereUpwind(PhysUpwind):
         self.cyclic_lon = cyclic_lon
         self.fill_edge_lon = fill_edge_lon
         self.fill_edge_lat = fill_edge_lat
+        self.workspace = workspace
         self._advec_args = []
 
         advec_kwargs = dict(spacing=spacing, order=order,
-                            fill_edge=fill_edge_lon, cyclic=cyclic_lon)
+                            fill_edge=fill_edge_lon, cyclic=cyclic_lon,
+                            workspace=workspace)
         self._advec_x_kwargs = advec_kwargs
 
         advec_kwargs.pop('cyclic')
@@ -235,15 +385,35 @@ class SphereUpwind(PhysUpwind):
         return self.advec_x(u) + self.advec_y(v)
 
 
-class SphereEtaUpwind(object):
+class SphereEtaUpwind(LightPickle):
     """Advection in lat-lon and hybrid sigma/pressure vertical coordinates."""
     _X_ADVEC_CLS = LonUpwindConstP
     _Y_ADVEC_CLS = LatUpwindConstP
     _Z_ADVEC_CLS = EtaUpwind
+    _DIFF_DIMS = (LON_STR, LAT_STR, PFULL_STR)
 
     def __init__(self, arr, pk, bk, ps, spacing=1, order=2,
                  cyclic_lon=True, fill_edge_lon=False, fill_edge_lat=True,
-                 fill_edge_vert=True):
+                 fill_edge_vert=True, workspace=None, region=None, lazy=False):
+        """
+        :param region: Optional `Region`.  If given, advection is computed
+            only over it (plus the halo of points its stencils require) and
+            returned only within it.
+        :param bool lazy: If True, the advection methods return an
+            unevaluated `indiff.lazy.Expr`.  Terms shared between the
+            components, e.g. the vertical derivative of the field and the
+            horizontal surface pressure gradients, are then computed only
+            once when they are evaluated together.
+        """
+        self.region = region
+        self.lazy = lazy
+        self._selection = None
+        if region is not None:
+            self._selection = region.select(arr, spacing*order,
+                                            cyclic_lon=cyclic_lon)
+            arr = self._selection.extract(arr)
+            ps = self._selection.extract(ps)
+            cyclic_lon = self._selection.cyclic_lon
         self.arr = arr
         self.lat = arr[LAT_STR]
         self.pk = pk
@@ -255,10 +425,12 @@ class SphereEtaUpwind(object):
         self.fill_edge_lon = fill_edge_lon
         self.fill_edge_lat = fill_edge_lat
         self.fill_edge_vert = fill_edge_vert
+        self.workspace = workspace
         self._advec_args = [self.pk, self.bk, self.ps]
 
         advec_kwargs = dict(spacing=spacing, order=order,
-                            fill_edge=fill_edge_lon, cyclic=cyclic_lon)
+                            fill_edge=fill_edge_lon, cyclic=cyclic_lon,
+                            workspace=workspace)
         self._advec_x_kwargs = advec_kwargs
 
         advec_kwargs.pop('cyclic')
@@ -268,25 +440,157 @@ class SphereEtaUpwind(object):
         advec_kwargs.update(dict(fill_edge=fill_edge_vert))
         self._advec_z_kwargs = advec_kwargs
 
+        if self._selection is not None:
+            # The subset's longitudes are no longer cyclic if the region
+            # doesn't span the globe.
+            self._advec_x_kwargs = dict(self._advec_x_kwargs,
+                                        cyclic=cyclic_lon)
+
+    def _extract(self, flow):
+        if self._selection is None:
+            return flow
+        return self._selection.extract(flow)
+
+    def _trim(self, arr):
+        if self._selection is None:
+            return arr
+        if isinstance(arr, Expr):
+            return Term(self._selection.trim, [arr])
+        return self._selection.trim(arr)
+
     def advec_x_const_p(self, u):
-        return self._X_ADVEC_CLS(u, self.arr,
-                                 *self._advec_args,
-                                 **self._advec_x_kwargs).advec()
+        kwargs = dict(self._advec_x_kwargs)
+        if self.lazy:
+            kwargs['lazy'] = True
+        return self._trim(self._X_ADVEC_CLS(
+            self._extract(u), self.arr, *self._advec_args, **kwargs
+        ).advec())
 
     def advec_y_const_p(self, v):
-        return self._Y_ADVEC_CLS(v, self.arr,
-                                 *self._advec_args,
-                                 **self._advec_y_kwargs).advec(oper='grad')
+        kwargs = dict(self._advec_y_kwargs)
+        if self.lazy:
+            kwargs['lazy'] = True
+        return self._trim(self._Y_ADVEC_CLS(
+            self._extract(v), self.arr, *self._advec_args, **kwargs
+        ).advec(oper='grad'))
 
     def advec_horiz_const_p(self, u, v):
         return self.advec_x_const_p(u) + self.advec_y_const_p(v)
 
     def advec_z(self, omega):
-        return self._Z_ADVEC_CLS(omega, self.arr,
-                                 *self._advec_args,
-                                 **self._advec_z_kwargs).advec()
+        advec_obj = self._Z_ADVEC_CLS(
+            self._extract(omega), self.arr, *self._advec_args,
+            **self._advec_z_kwargs
+        )
+        if self.lazy:
+            return self._trim(advec_obj._advec_expr())
+        return self._trim(advec_obj.advec())
 
     advec_p = advec_z
 
     def advec_3d(self, u, v, omega):
         return self.advec_horiz_const_p(u, v) + self.advec_p(omega)
+
+
+class LonSigmaUpwindConstP(PhysUpwind):
+    """Upwind advection in longitude at constant pressure, on sigma levels."""
+    _DERIV_BWD_CLS = SphereSigmaBwdDeriv
+    _DERIV_FWD_CLS = SphereSigmaFwdDeriv
+    _DIM = LON_STR
+    _DERIV_METHOD = 'd_dx_const_p'
+
+    def __init__(self, flow, arr, ps, vert_dim, sigma=None, dim=None,
+                 spacing=1, order=2, cyclic=True, fill_edge=False,
+                 workspace=None):
+        """
+        :param str vert_dim: Name of the sigma dimension.
+        """
+        self.flow = flow
+        self.arr = arr
+        self.ps = ps
+        self.vert_dim = vert_dim
+        self.sigma = sigma
+        self.spacing = spacing
+        self.order = order
+        self.cyclic = cyclic
+        self.fill_edge = fill_edge
+        self.workspace = workspace
+        self.dim = dim if dim is not None else self._DIM
+
+        deriv_args = [ps, vert_dim]
+        deriv_kwargs = dict(sigma=sigma, spacing=spacing, order=order,
+                            cyclic_lon=cyclic, fill_edge_lon=fill_edge,
+                            workspace=workspace)
+        _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
+
+
+class LatSigmaUpwindConstP(PhysUpwind):
+    """Upwind advection in latitude at constant pressure, on sigma levels."""
+    _DERIV_BWD_CLS = SphereSigmaBwdDeriv
+    _DERIV_FWD_CLS = SphereSigmaFwdDeriv
+    _DIM = LAT_STR
+    _DERIV_METHOD = 'd_dy_const_p'
+
+    def __init__(self, flow, arr, ps, vert_dim, sigma=None, dim=None,
+                 spacing=1, order=2, fill_edge=True, workspace=None):
+        """
+        :param str vert_dim: Name of the sigma dimension.
+        """
+        self.flow = flow
+        self.arr = arr
+        self.ps = ps
+        self.vert_dim = vert_dim
+        self.sigma = sigma
+        self.spacing = spacing
+        self.order = order
+        self.fill_edge = fill_edge
+        self.workspace = workspace
+        self.dim = dim if dim is not None else self._DIM
+
+        deriv_args = [ps, vert_dim]
+        deriv_kwargs = dict(sigma=sigma, spacing=spacing, order=order,
+                            fill_edge_lat=fill_edge, workspace=workspace)
+        _make_derivs(self, arr, *deriv_args, **deriv_kwargs)
+
+
+class SphereSigmaUpwind(SphereEtaUpwind):
+    """Advection in lat-lon and sigma vertical coordinates.
+
+    Neither the horizontal nor the vertical advection requires the full
+    pressure field; see `SphereSigmaDeriv`.
+    """
+    _X_ADVEC_CLS = LonSigmaUpwindConstP
+    _Y_ADVEC_CLS = LatSigmaUpwindConstP
+    _Z_ADVEC_CLS = SigmaUpwind
+    _DIFF_DIMS = (LON_STR, LAT_STR)
+
+    def __init__(self, arr, ps, dim, sigma=None, spacing=1, order=2,
+                 cyclic_lon=True, fill_edge_lon=False, fill_edge_lat=True,
+                 fill_edge_vert=True, workspace=None):
+        """
+        :param str dim: Name of the sigma dimension.
+        :param sigma: Sigma at the levels.  If not given, arr[dim] is used.
+        """
+        self.region = None
+        self.lazy = False
+        self._selection = None
+        self.arr = arr
+        self.lat = arr[LAT_STR]
+        self.ps = ps
+        self.dim = dim
+        self.sigma = sigma
+        self.spacing = spacing
+        self.order = order
+        self.cyclic_lon = cyclic_lon
+        self.fill_edge_lon = fill_edge_lon
+        self.fill_edge_lat = fill_edge_lat
+        self.fill_edge_vert = fill_edge_vert
+        self.workspace = workspace
+        self._advec_args = [ps, dim]
+
+        advec_kwargs = dict(sigma=sigma, spacing=spacing, order=order,
+                            workspace=workspace)
+        self._advec_x_kwargs = dict(advec_kwargs, cyclic=cyclic_lon,
+                                    fill_edge=fill_edge_lon)
+        self._advec_y_kwargs = dict(advec_kwargs, fill_edge=fill_edge_lat)
+        self._advec_z_kwargs = dict(advec_kwargs, fill_edge=fill_edge_vert)
@@ -0,0 +1,206 @@
+"""Semi-Lagrangian advection on the sphere with hybrid levels.
+
+Rather than differencing the tracer at the gridpoints, the tracer at each
+gridpoint after a timestep is that at the point from which the flow carried
+it, which is found by integrating back along the trajectory and
+interpolating.  The timestep is therefore not limited by the CFL condition.
+"""
+import numpy as np
+
+from .._constants import LON_STR, LAT_STR, PFULL_STR, _RADEARTH
+from ..coord import Eta
+from ..kernels import lagrange_weights, stencil_start
+from ..pickling import LightPickle
+from ..utils import to_radians
+
+_INTERP_SIZES = {'linear': 2, 'cubic': 4}
+_DIMS = (PFULL_STR, LAT_STR, LON_STR)
+
+
+def _lon_stencil(lon, target, size):
+    """Longitude indices and weights, wrapping around the cyclic dim.
+
+    The longitudes need not be in increasing order.
+    """
+    num_lon = len(lon)
+    order = np.argsort(lon)
+    lon = lon[order]
+    target = lon[0] + np.mod(target - lon[0], 2*np.pi)
+    extended = np.concatenate([lon[-size:] - 2*np.pi, lon,
+                               lon[:size] + 2*np.pi])
+    indices = (stencil_start(extended, target, size) +
+               np.arange(size).reshape((size,) + (1,)*target.ndim))
+    weights = lagrange_weights(target, extended[indices])
+    return order[(indices - size) % num_lon], weights
+
+
+def _lat_stencil(lat, target, size, across_pole):
+    """Latitude indices and weights, and whether each point is across a pole.
+
+    If `across_pole`, the latitudes are extended beyond each pole by the
+    points on the opposite meridian, so that stencils near the poles span
+    them.  Otherwise the targets are limited to the range of latitudes.
+    The latitudes need not be in increasing order.
+    """
+    order = np.argsort(lat)
+    lat = lat[order]
+    sources = np.arange(len(lat))
+    flips = np.zeros(len(lat), dtype=bool)
+    extended = lat
+    if across_pole:
+        south = sources[lat > -0.5*np.pi][:size][::-1]
+        north = sources[lat < 0.5*np.pi][-size:][::-1]
+        extended = np.concatenate([-np.pi - lat[south], lat,
+                                   np.pi - lat[north]])
+        sources = np.concatenate([south, sources, north])
+        flips = np.concatenate([np.ones(len(south), dtype=bool), flips,
+                                np.ones(len(north), dtype=bool)])
+    target = np.clip(target, extended[0], extended[-1])
+    indices = (stencil_start(extended, target, size) +
+               np.arange(size).reshape((size,) + (1,)*target.ndim))
+    weights = lagrange_weights(target, extended[indices])
+    return order[sources[indices]], flips[indices], weights
+
+
+def _column_stencil(p, target, size):
+    """Level indices and weights, within each column of the pressure.
+
+    The targets are limited to the range of pressure in their column, as
+    there is no flow through the top or the surface.
+    """
+    target = np.clip(target, p[:1], p[-1:])
+    # Counted a level at a time, rather than comparing all pairs of levels
+    # at once, to keep the memory linear in the number of levels.
+    num_below = np.zeros(target.shape, dtype=int)
+    for level in p:
+        num_below += level <= target
+    start = np.clip(num_below - size // 2, 0, len(p) - size)
+    indices = [start + offset for offset in range(size)]
+    nodes = [np.take_along_axis(p, index, axis=0) for index in indices]
+    return np.stack(indices), lagrange_weights(target, nodes)
+
+
+def _gather(values, stencils):
+    """Interpolate the values, indexed by (..., level, lat, lon), with the
+    product of the stencils in each dimension."""
+    (level_inds, level_weights), (lat_inds, flips, lat_weights), (
+        lon_inds, lon_weights) = stencils
+    num_lon = values.shape[-1]
+    result = np.zeros(values.shape[:-3] + level_inds.shape[1:])
+    for level_ind, level_weight in zip(level_inds, level_weights):
+        for lat_ind, flip, lat_weight in zip(lat_inds, flips, lat_weights):
+            weight = level_weight*lat_weight
+            opposite = np.mod(lon_inds + num_lon // 2, num_lon)
+            for lon_ind, lon_weight in zip(np.where(flip, opposite,
+                                                    lon_inds),
+                                           lon_weights):
+                result += weight*lon_weight*values[..., level_ind, lat_ind,
+                                                   lon_ind]
+    return result
+
+
+class SphereEtaSemiLagrangian(LightPickle):
+    """Semi-Lagrangian advection in lat-lon and hybrid sigma-pressure
+    coordinates.
+
+    The departure points, and the interpolation weights there, depend only
+    on the flow and the timestep, and are computed once, at construction.
+    Any number of tracers can then be advected with them.
+    """
+    _DATA_ARGS = LightPickle._DATA_ARGS + ('u', 'v', 'omega')
+    _DIFF_DIMS = (LON_STR, LAT_STR, PFULL_STR)
+
+    def __init__(self, u, v, omega, pk, bk, ps, dt, interp='cubic',
+                 num_iters=2, radius=_RADEARTH):
+        """
+        :param u: Zonal flow, with dims pfull, lat, and lon.
+        :param v: Meridional flow.
+        :param omega: Flow in pressure.
+        :param float dt: Timestep, in seconds.
+        :param str interp: 'linear' or 'cubic' interpolation to the
+            departure points.
+        :param int num_iters: Number of iterations for the midpoints of the
+            trajectories.
+        """
+        if interp not in _INTERP_SIZES:
+            raise ValueError("Interpolation must be one of {}: "
+                             "'{}'".format(sorted(_INTERP_SIZES), interp))
+        self.u = u
+        self.v = v
+        self.omega = omega
+        self.pk = pk
+        self.bk = bk
+        self.ps = ps
+        self.dt = dt
+        self.interp = interp
+        self.num_iters = num_iters
+        self.radius = radius
+
+        self.lon = np.asarray(to_radians(u[LON_STR]).values, dtype=float)
+        self.lat = np.asarray(to_radians(u[LAT_STR]).values, dtype=float)
+        self.p = np.asarray(Eta(pk, bk, u[PFULL_STR]).pfull_from_ps(
+            ps
+        ).transpose(*_DIMS).values)
+        # The stencils across a pole need the opposite meridian on the grid.
+        num_lon = len(self.lon)
+        self._across_pole = (num_lon % 2 == 0 and np.allclose(
+            np.diff(np.sort(self.lon)), 2*np.pi / num_lon
+        ))
+        self.lon_departure, self.lat_departure, self.p_departure = (
+            self._departure_points()
+        )
+        self._stencils = self._interp_stencils(
+            self.lon_departure, self.lat_departure, self.p_departure,
+            _INTERP_SIZES[interp], self._across_pole
+        )
+
+    def _interp_stencils(self, lon, lat, p, size, across_pole):
+        return (_column_stencil(self.p, p, size),
+                _lat_stencil(self.lat, lat, size, across_pole),
+                _lon_stencil(self.lon, lon, size))
+
+    def _displacements(self, u, v, omega, lat):
+        dlon = self.dt*u / (self.radius*np.cos(lat))
+        return dlon, self.dt*v / self.radius, self.dt*omega
+
+    def _departure_points(self):
+        """Longitude, latitude, and pressure of the departure points.
+
+        Each trajectory's displacement is that of the flow at its midpoint,
+        found iteratively and interpolated linearly.  Departure points beyond
+        a pole are moved to the opposite meridian.
+        """
+        flows = [np.asarray(flow.transpose(*_DIMS).values)
+                 for flow in (self.u, self.v, self.omega)]
+        lon = self.lon[np.newaxis, np.newaxis]
+        lat = self.lat[np.newaxis, :, np.newaxis]
+        dlon, dlat, dp = self._displacements(*(flows + [lat]))
+        for _ in range(self.num_iters):
+            lat_mid = np.clip(lat - 0.5*dlat, self.lat.min(),
+                              self.lat.max())
+            stencils = self._interp_stencils(lon - 0.5*dlon, lat_mid,
+                                             self.p - 0.5*dp, 2, False)
+            dlon, dlat, dp = self._displacements(
+                *([_gather(flow, stencils) for flow in flows] + [lat_mid])
+            )
+        lon_dep = lon - dlon
+        lat_dep = lat - dlat
+        for pole in [0.5*np.pi, -0.5*np.pi]:
+            beyond = np.abs(lat_dep) > 0.5*np.pi
+            beyond &= np.sign(lat_dep) == np.sign(pole)
+            lat_dep = np.where(beyond, 2*pole - lat_dep, lat_dep)
+            lon_dep = np.where(beyond, lon_dep + np.pi, lon_dep)
+        return lon_dep, lat_dep, self.p - dp
+
+    def step(self, arr):
+        """The tracer after one timestep.
+
+        :param arr: Tracer, with dims pfull, lat, and lon, and any others.
+        """
+        arr_trans = arr.transpose(*((Ellipsis,) + _DIMS))
+        values = _gather(np.asarray(arr_trans.values), self._stencils)
+        return arr_trans.copy(data=values).transpose(*arr.dims)
+
+    def advec(self, arr):
+        """Advection of the tracer, averaged over the timestep."""
+        return (arr - self.step(arr)) / self.dt
@@ -0,0 +1,125 @@
+"""Flux-limited upwind advection.
+
+These schemes are total variation diminishing (TVD): the value at each face
+is reconstructed from upstream, with the second-order correction limited
+according to the ratio of successive jumps in the tracer.  Where the tracer
+is smooth they are second-order accurate, and near sharp fronts they revert
+to first-order upwinding rather than overshooting.  See
+https://en.wikipedia.org/wiki/Flux_limiter for the limiters.
+"""
+import numpy as np
+
+from .._constants import LON_STR, LAT_STR, PFULL_STR, _RADEARTH
+from ..coord import Lon, Lat, Eta
+from ..kernels import LIMITERS, tvd_derivs
+from ..utils import broadcastable, to_radians
+from . import Upwind
+
+
+class TVDUpwind(Upwind):
+    """Flux-limited upwind advection."""
+    def __init__(self, flow, arr, dim, coord=None, limiter='minmod',
+                 cyclic=False, circumf=0., workspace=None):
+        """
+        :param flow: Flow that is advecting the field.
+        :param arr: Field being advected.
+        :param str dim: Dimension along which to advect.
+        :param coord: Coordinate; arr[dim] if not given.
+        :param str limiter: One of 'minmod', 'van_leer', 'superbee', or
+            'mc'.
+        :param bool cyclic: Whether the dimension is cyclic.
+        :param float circumf: Span of the coordinate, if cyclic.
+        """
+        if limiter not in LIMITERS:
+            raise ValueError("Limiter must be one of {}: "
+                             "'{}'".format(sorted(LIMITERS), limiter))
+        self.flow = flow
+        self.arr = arr
+        self.dim = dim
+        self.coord = coord if coord is not None else arr[dim]
+        self.limiter = limiter
+        self.cyclic = cyclic
+        self.circumf = circumf
+        self.fill_edge = True
+        self.workspace = workspace
+
+    def _coord_values(self):
+        """Values of the coordinate, broadcastable against the array."""
+        return broadcastable(self.coord, self.arr)
+
+    def _prefactor(self):
+        return 1.
+
+    def _derivs_bwd_fwd(self):
+        """Limited derivatives for positive and negative flow."""
+        bwd, fwd = tvd_derivs(np.asarray(self.arr.values),
+                              self._coord_values(),
+                              axis=self.arr.get_axis_num(self.dim),
+                              limiter=self.limiter, cyclic=self.cyclic,
+                              circumf=self.circumf)
+        prefactor = self._prefactor()
+        return (self.arr.copy(data=bwd)*prefactor,
+                self.arr.copy(data=fwd)*prefactor)
+
+
+class LonTVDUpwind(TVDUpwind):
+    """Flux-limited upwind advection in longitude."""
+    def __init__(self, flow, arr, dim=None, coord=None, limiter='minmod',
+                 cyclic=True, radius=_RADEARTH, workspace=None):
+        dim = dim if dim is not None else LON_STR
+        super(LonTVDUpwind, self).__init__(flow, arr, dim, coord=coord,
+                                           limiter=limiter, cyclic=cyclic,
+                                           circumf=2*np.pi,
+                                           workspace=workspace)
+        self.radius = radius
+        self._coord_obj = Lon(self.coord, dim=dim, cyclic=cyclic,
+                              radius=radius)
+
+    def _coord_values(self):
+        return broadcastable(to_radians(self.coord), self.arr)
+
+    def _prefactor(self):
+        return self._coord_obj.deriv_prefactor(self.arr[LAT_STR])
+
+
+class LatTVDUpwind(TVDUpwind):
+    """Flux-limited upwind advection in latitude."""
+    def __init__(self, flow, arr, dim=None, coord=None, limiter='minmod',
+                 radius=_RADEARTH, workspace=None):
+        dim = dim if dim is not None else LAT_STR
+        super(LatTVDUpwind, self).__init__(flow, arr, dim, coord=coord,
+                                           limiter=limiter,
+                                           workspace=workspace)
+        self.radius = radius
+        self._coord_obj = Lat(self.coord, dim=dim, radius=radius)
+
+    def _coord_values(self):
+        return broadcastable(to_radians(self.coord), self.arr)
+
+    def _prefactor(self):
+        return self._coord_obj.deriv_prefactor()
+
+
+class EtaTVDUpwind(TVDUpwind):
+    """Flux-limited vertical advection in pressure on hybrid levels.
+
+    The pressure at each level is computed from the surface pressure, so the
+    limited derivatives are taken column by column.
+    """
+    def __init__(self, flow, arr, pk, bk, ps, dim=None, limiter='minmod',
+                 workspace=None):
+        """
+        :param flow: Flow in pressure, i.e. omega, on the full levels.
+        """
+        dim = dim if dim is not None else PFULL_STR
+        super(EtaTVDUpwind, self).__init__(flow, arr, dim,
+                                           coord=arr[dim], limiter=limiter,
+                                           workspace=workspace)
+        self.pk = pk
+        self.bk = bk
+        self.ps = ps
+        self._coord_obj = Eta(pk, bk, arr[dim], dim=dim)
+
+    def _coord_values(self):
+        return broadcastable(self._coord_obj.pfull_from_ps(self.ps),
+                             self.arr)
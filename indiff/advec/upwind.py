@@ -3,12 +3,25 @@
 Upwind advection uses one-sided differencing in the upstream direction of the
 flow to compute the tracer field derivative.  See
 https://en.wikipedia.org/wiki/Upwind_scheme for formulae of upwind schemes of
-first, second, and third order accuracy.
+first, second, and third order accuracy.  The third-order scheme, and the
+fifth-order weighted essentially non-oscillatory (WENO5) scheme, are available
+via the `scheme` argument, rather than the order of the finite differences.
 """
+import numpy as np
+
 from ..deriv import FwdDeriv, BwdDeriv
+from ..kernels import RECONSTRUCTIONS, reconstructed_derivs
+from ..utils import broadcastable
 from . import Advec
 
 
+def _check_scheme(scheme):
+    if scheme is not None and scheme not in RECONSTRUCTIONS:
+        raise ValueError("Scheme must be None or one of {}: "
+                         "'{}'".format(sorted(RECONSTRUCTIONS), scheme))
+    return scheme
+
+
 class Upwind(Advec):
     """Upwind advection."""
     _DERIV_BWD_CLS = BwdDeriv
@@ -16,17 +29,23 @@ class Upwind(Advec):
     _DERIV_METHOD = 'deriv'
 
     def __init__(self, flow, arr, dim, coord=None, spacing=1, order=2,
-                 fill_edge=True):
+                 fill_edge=True, workspace=None, scheme=None):
+        """
+        :param str scheme: If given, the derivatives are instead from the
+            'upwind3' (third-order upwind) or 'weno5' reconstruction of the
+            field at the faces between points; see `indiff.kernels`.
+        """
         super(Upwind, self).__init__(flow, arr, dim, coord=coord,
                                      spacing=spacing, order=order,
-                                     fill_edge=fill_edge)
+                                     fill_edge=fill_edge, workspace=workspace)
+        self.scheme = _check_scheme(scheme)
         self._deriv_bwd_obj = self._DERIV_BWD_CLS(
             self.arr, self.dim, coord=self.coord, spacing=self.spacing,
-            order=self.order, fill_edge=True
+            order=self.order, fill_edge=True, workspace=self.workspace
         )
         self._deriv_fwd_obj = self._DERIV_FWD_CLS(
             self.arr, self.dim, coord=self.coord, spacing=self.spacing,
-            order=self.order, fill_edge=True
+            order=self.order, fill_edge=True, workspace=self.workspace
         )
         self._deriv_bwd = getattr(self._deriv_bwd_obj, self._DERIV_METHOD)
         self._deriv_fwd = getattr(self._deriv_fwd_obj, self._DERIV_METHOD)
@@ -37,12 +56,22 @@ class Upwind(Advec):
         :out: flow_neg, flow_pos xarray.DataArrays with shape and coords
             identical to `flow1, but with, respectively, all positive and
             negative values set to 0 (or the reverse if `reverse_dim` is
-            `True`).
+            `True`).  If a workspace is in use, their data are buffers owned
+            by the workspace.
         """
-        flow_neg = self.flow.copy()
-        flow_neg.values[self.flow.values >= 0] = 0.
-        flow_pos = self.flow.copy()
-        flow_pos.values[self.flow.values < 0] = 0.
+        if self.workspace is None:
+            flow_neg = self.flow.copy()
+            flow_neg.values[self.flow.values >= 0] = 0.
+            flow_pos = self.flow.copy()
+            flow_pos.values[self.flow.values < 0] = 0.
+        else:
+            values = np.asarray(self.flow.values)
+            neg = self.workspace.empty('flow_neg', values.shape, values.dtype)
+            pos = self.workspace.empty('flow_pos', values.shape, values.dtype)
+            flow_neg = self.flow.copy(deep=False,
+                                      data=np.minimum(values, 0, out=neg))
+            flow_pos = self.flow.copy(deep=False,
+                                      data=np.maximum(values, 0, out=pos))
         if not reverse_dim:
             return flow_neg, flow_pos
         return flow_pos, flow_neg
@@ -55,6 +84,30 @@ class Upwind(Advec):
         fwd[edge_right] = bwd[edge_right]
         return bwd, fwd
 
+    def _weight_by_flow(self, bwd, fwd):
+        """Combine the derivs weighted by the positive and negative flow.
+
+        If a workspace is in use, the combination is done in place in `bwd`
+        and `fwd`, which must therefore not be referenced elsewhere.
+        """
+        neg, pos = self._flow_neg_pos()
+        if self.workspace is None or not set(pos.dims) <= set(bwd.dims):
+            return pos*bwd + neg*fwd
+        bwd *= pos
+        fwd *= neg
+        bwd += fwd
+        return bwd
+
+    def _reconstruct(self, arr, coord, cyclic=False, circumf=0.,
+                     prefactor=1.):
+        """Derivs for positive and negative flow from the scheme's face
+        values, all computed in one vectorized pass."""
+        bwd, fwd = reconstructed_derivs(
+            np.asarray(arr.values), coord, axis=arr.get_axis_num(self.dim),
+            scheme=self.scheme, cyclic=cyclic, circumf=circumf
+        )
+        return arr.copy(data=bwd)*prefactor, arr.copy(data=fwd)*prefactor
+
     def _derivs_bwd_fwd(self):
         """Generate forward and backward differencing derivs for upwind.
 
@@ -64,6 +117,12 @@ class Upwind(Advec):
         differencing is used with the same order of accuracy as in the
         interior.
         """
+        if self.scheme is not None:
+            coord = self.coord
+            if coord is None:
+                coord = self.arr[self.dim]
+            return self._reconstruct(self.arr,
+                                     broadcastable(coord, self.arr))
         bwd = self._deriv_bwd()
         fwd = self._deriv_fwd()
         # Forward diff on left edge; backward diff on right edge.
@@ -80,8 +139,7 @@ class Upwind(Advec):
         :param flow: Flow that is advecting the field.
         """
         bwd, fwd = self._derivs_bwd_fwd()
-        neg, pos = self._flow_neg_pos()
-        advec_arr = pos*bwd + neg*fwd
+        advec_arr = self._weight_by_flow(bwd, fwd)
         if not self.fill_edge:
             slice_middle = {self.dim: slice(self.order, -self.order)}
             advec_arr = advec_arr[slice_middle]
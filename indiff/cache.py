@@ -0,0 +1,170 @@
+"""Content-addressed on-disk caching of operator results."""
+import os
+import pickle
+import shutil
+
+import numpy as np
+import xarray as xr
+
+from .incremental import fingerprint
+
+
+class ResultCache(object):
+    """Results of operators stored on disk, keyed by the hash of the inputs.
+
+    The key combines the operator class, the method called, and all the
+    arguments, hashed by value: data and coordinates alike, and parameters
+    such as spacing, order, fill_edge, cyclic, and radius.  Scripts sharing
+    a cache directory therefore reuse each other's results for identical
+    computations.
+
+    Each result is stored in its own directory, its values split along the
+    first axis into chunks saved as .npy files, with the metadata pickled
+    alongside.  Once the total size exceeds the budget, the least recently
+    used results are removed.
+    """
+    _META = 'meta.pkl'
+
+    def __init__(self, path, max_bytes=2**30, chunk_bytes=2**26):
+        """
+        :param str path: Cache directory.  Created if it doesn't exist.
+        :param int max_bytes: Size budget of the cache on disk.
+        :param int chunk_bytes: Approximate maximum size of each chunk file.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.chunk_bytes = chunk_bytes
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def key(self, cls, args=(), kwargs=None, method='deriv', method_args=(),
+            method_kwargs=None):
+        """Cache key of the given computation; see `run`."""
+        return fingerprint(cls.__module__, cls.__name__, method, list(args),
+                           kwargs or {}, list(method_args),
+                           method_kwargs or {})
+
+    def _entry(self, key):
+        return os.path.join(self.path, key)
+
+    def __contains__(self, key):
+        return os.path.exists(os.path.join(self._entry(key), self._META))
+
+    def _entries(self):
+        return [name for name in os.listdir(self.path)
+                if '.tmp-' not in name and name in self]
+
+    def _entry_bytes(self, key):
+        entry = self._entry(key)
+        return sum(os.path.getsize(os.path.join(entry, name))
+                   for name in os.listdir(entry))
+
+    @property
+    def nbytes(self):
+        """Total size of the stored results."""
+        return sum(self._entry_bytes(key) for key in self._entries())
+
+    def get(self, key):
+        """The stored result, or None if there is none."""
+        if key not in self:
+            return None
+        entry = self._entry(key)
+        meta_path = os.path.join(entry, self._META)
+        with open(meta_path, 'rb') as f:
+            meta = pickle.load(f)
+        # Mark as recently used.
+        os.utime(meta_path, None)
+        if meta['chunks'] is None:
+            return meta['result']
+        values = np.concatenate(
+            [np.load(os.path.join(entry, name)) for name in meta['chunks']]
+        ).reshape(meta['shape'])
+        return xr.DataArray(values, dims=meta['dims'],
+                            coords=meta['coords'].coords,
+                            name=meta['name'], attrs=meta['attrs'])
+
+    def _chunks(self, values):
+        """Split the values into chunks along their first axis."""
+        if values.ndim == 0 or not values.size:
+            return [values.reshape(-1)]
+        row_bytes = values.nbytes // values.shape[0] or 1
+        rows = max(self.chunk_bytes // row_bytes, 1)
+        return [values[start:start + rows]
+                for start in range(0, values.shape[0], rows)]
+
+    def put(self, key, result):
+        """Store the result, then evict to within the size budget."""
+        if key in self:
+            return
+        entry = self._entry(key)
+        tmp = '{}.tmp-{}'.format(entry, os.getpid())
+        os.makedirs(tmp)
+        if isinstance(result, xr.DataArray):
+            values = np.asarray(result.values)
+            chunks = []
+            for i, chunk in enumerate(self._chunks(values)):
+                name = 'chunk-{:05d}.npy'.format(i)
+                np.save(os.path.join(tmp, name), chunk)
+                chunks.append(name)
+            meta = dict(chunks=chunks, shape=values.shape, dims=result.dims,
+                        coords=result.coords.to_dataset(), name=result.name,
+                        attrs=result.attrs)
+        else:
+            meta = dict(chunks=None, result=result)
+        with open(os.path.join(tmp, self._META), 'wb') as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Stored concurrently by another process.
+            shutil.rmtree(tmp)
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """Remove least recently used results until within the budget.
+
+        :param keep: Key of a result to remove only if it alone exceeds the
+            budget.
+        """
+        sizes = {key: self._entry_bytes(key) for key in self._entries()}
+        total = sum(sizes.values())
+        last_used = sorted(
+            sizes, key=lambda key: os.path.getmtime(
+                os.path.join(self._entry(key), self._META)
+            )
+        )
+        if keep in sizes:
+            last_used.remove(keep)
+            last_used.append(keep)
+        for key in last_used:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= sizes[key]
+
+    def clear(self):
+        """Remove all stored results."""
+        for key in self._entries():
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+
+    def run(self, cls, args=(), kwargs=None, method='deriv', method_args=(),
+            method_kwargs=None):
+        """Result of the operator's method, computed only if not cached.
+
+        :param cls: Operator class, e.g. `CenDeriv` or `SphereEtaUpwind`.
+        :param args: Positional arguments to create the operator with.
+        :param kwargs: Keyword arguments to create the operator with.
+        :param str method: Name of the operator's method to call, e.g.
+            'deriv' or 'advec_3d'.
+        :param method_args: Positional arguments to the method.
+        :param method_kwargs: Keyword arguments to the method.
+        """
+        kwargs = kwargs or {}
+        method_kwargs = method_kwargs or {}
+        key = self.key(cls, args, kwargs, method, method_args, method_kwargs)
+        result = self.get(key)
+        if result is None:
+            result = getattr(cls(*args, **kwargs), method)(*method_args,
+                                                         **method_kwargs)
+            self.put(key, result)
+        return result
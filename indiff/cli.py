@@ -0,0 +1,277 @@
+"""Command-line tool applying derivative and advection operators to files.
+
+Example, computing 3D advection of temperature and humidity::
+
+    indiff atmos.nc -v temp sphum -p SphereEtaUpwind.advec_3d \\
+        --pk pk --bk bk --ps ps --method-args ucomp vcomp omega \\
+        -o out --chunk-size 4 --workers 8
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import ast
+import importlib
+import inspect
+import os
+
+import cloudpickle
+import xarray as xr
+
+
+def _is_zarr(path):
+    return path.rstrip(os.sep).endswith('.zarr')
+
+
+def _open(path):
+    if _is_zarr(path):
+        return xr.open_zarr(path)
+    return xr.open_dataset(path)
+
+
+def _literal(value):
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def operator_from_spec(spec):
+    """The operator class and method given as e.g. 'SphereCenDeriv.d_dx'.
+
+    If no method is given, it defaults to 'deriv' or 'advec'.
+    """
+    cls_name, _, method = spec.partition('.')
+    for module in ['deriv', 'advec']:
+        cls = getattr(importlib.import_module('indiff.' + module), cls_name,
+                      None)
+        if isinstance(cls, type):
+            break
+    else:
+        raise ValueError("No operator named '{}'".format(cls_name))
+    if not method:
+        method = 'deriv' if hasattr(cls, 'deriv') else 'advec'
+    if not callable(getattr(cls, method, None)):
+        raise ValueError("Operator '{}' has no method '{}'".format(cls_name,
+                                                                  method))
+    return cls, method
+
+
+class Job(object):
+    """An operator applied to variables of datasets, chunk by chunk.
+
+    The operator's field argument `arr` is each variable in turn.  Its
+    arguments `flow`, `pk`, `bk`, `ps`, and `dim`, where it has them, are
+    taken from the dataset variables or dim so named.
+    """
+    def __init__(self, operator, variables, dim=None, flow=None, pk=None,
+                 bk=None, ps=None, method_args=(), options=None,
+                 chunk_dim='time', chunk_size=1):
+        """
+        :param str operator: Operator class and method, e.g.
+            'SphereEtaUpwind.advec_3d'.
+        :param variables: Names of the variables to apply it to.
+        :param str dim: Dim to difference over, for operators taking one.
+        :param str flow: Name of the flow variable, for operators taking one.
+        :param str pk: Name of the pk variable of hybrid levels.
+        :param str bk: Name of the bk variable of hybrid levels.
+        :param str ps: Name of the surface pressure variable.
+        :param method_args: Names of variables passed to the method, e.g.
+            the winds for 'advec_3d'.
+        :param dict options: Other keyword arguments of the operator.
+        :param str chunk_dim: Dim along which to stream through the data.
+        :param int chunk_size: Length of each chunk along `chunk_dim`.
+        """
+        self.operator = operator
+        self.cls, self.method = operator_from_spec(operator)
+        self.variables = list(variables)
+        self.dim = dim
+        self.flow = flow
+        self.pk = pk
+        self.bk = bk
+        self.ps = ps
+        self.method_args = list(method_args)
+        self.options = options or {}
+        self.chunk_dim = chunk_dim
+        self.chunk_size = chunk_size
+
+    def _args(self, ds, var):
+        """Positional arguments of the operator."""
+        args = []
+        params = list(
+            inspect.signature(self.cls.__init__).parameters.values()
+        )[1:]
+        for param in params:
+            name = param.name
+            if name == 'arr':
+                args.append(ds[var])
+            elif name == 'dim':
+                if self.dim is not None:
+                    args.append(self.dim)
+                elif param.default is param.empty:
+                    raise ValueError("Operator '{}' requires the '{}' "
+                                     "option".format(self.operator, name))
+                else:
+                    break
+            elif name in ['flow', 'pk', 'bk', 'ps']:
+                if getattr(self, name) is None:
+                    raise ValueError("Operator '{}' requires the '{}' "
+                                     "variable".format(self.operator, name))
+                args.append(ds[getattr(self, name)])
+            else:
+                break
+        return args
+
+    def needed(self):
+        """Names of the dataset variables used."""
+        return (self.variables + self.method_args +
+                [name for name in [self.flow, self.pk, self.bk, self.ps]
+                 if name is not None])
+
+    def compute(self, ds):
+        """Results for all the variables, as a Dataset."""
+        ds = ds[self.needed()].load()
+        method_args = [ds[name] for name in self.method_args]
+        results = {}
+        for var in self.variables:
+            operator = self.cls(*self._args(ds, var), **self.options)
+            results['{}_{}'.format(var, self.method)] = getattr(
+                operator, self.method
+            )(*method_args)
+        return xr.Dataset(results)
+
+    def chunks(self, ds):
+        """Indexers of the chunks to stream through."""
+        if self.chunk_dim not in ds.dims:
+            return [{}]
+        size = ds.sizes[self.chunk_dim]
+        return [{self.chunk_dim: slice(start, start + self.chunk_size)}
+                for start in range(0, size, self.chunk_size)]
+
+
+def _compute_chunk(payload, path, chunk):
+    job = cloudpickle.loads(payload)
+    with _open(path) as ds:
+        return job.compute(ds.isel(**chunk))
+
+
+def _output_path(job, path, output_dir):
+    name = os.path.basename(path.rstrip(os.sep))
+    stem, ext = os.path.splitext(name)
+    return os.path.join(output_dir, '{}.{}{}'.format(
+        stem, job.operator.replace('.', '_'), ext or '.nc'
+    ))
+
+
+def _write(result, path, index, job):
+    """Write a chunk of the results.
+
+    Zarr stores are appended to along the chunk dim.  With netCDF, each
+    chunk beyond the first is written to a file of its own.
+
+    :out: Path written to.
+    """
+    if _is_zarr(path):
+        if index == 0:
+            result.to_zarr(path, mode='w')
+        else:
+            result.to_zarr(path, append_dim=job.chunk_dim)
+        return path
+    if index:
+        stem, ext = os.path.splitext(path)
+        path = '{}.{:04d}{}'.format(stem, index, ext)
+    result.to_netcdf(path)
+    return path
+
+
+def run(job, paths, output_dir, workers=1):
+    """Apply the job to each file, writing the results chunk by chunk.
+
+    :param int workers: Number of processes computing chunks in parallel.
+        Each opens the file itself and loads only its chunk.
+    :out: Paths of the outputs: each zarr store, or each netCDF file of a
+        chunk, in order.
+    """
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    outputs = []
+
+    def write(result, out_path, index):
+        written = _write(result, out_path, index, job)
+        if written not in outputs:
+            outputs.append(written)
+
+    payload = cloudpickle.dumps(job)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for path in paths:
+            with _open(path) as ds:
+                chunks = job.chunks(ds)
+            out_path = _output_path(job, path, output_dir)
+            # At most as many chunks are in flight as there are workers.
+            pending = []
+            for index, chunk in enumerate(chunks):
+                if pool is None:
+                    write(_compute_chunk(payload, path, chunk), out_path,
+                          index)
+                    continue
+                pending.append((index, pool.submit(_compute_chunk, payload,
+                                                   path, chunk)))
+                if len(pending) >= workers:
+                    done, future = pending.pop(0)
+                    write(future.result(), out_path, done)
+            for done, future in pending:
+                write(future.result(), out_path, done)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return outputs
+
+
+def parser():
+    """The command-line argument parser."""
+    parser = argparse.ArgumentParser(
+        prog='indiff',
+        description='Apply a derivative or advection operator to variables '
+                    'of netCDF files or zarr stores, chunk by chunk.'
+    )
+    parser.add_argument('inputs', nargs='+', help='netCDF or zarr paths')
+    parser.add_argument('-v', '--variables', nargs='+', required=True)
+    parser.add_argument('-p', '--operator', required=True,
+                        help="e.g. 'SphereCenDeriv.d_dx' or "
+                             "'SphereEtaUpwind.advec_3d'")
+    parser.add_argument('-o', '--output-dir', default='.')
+    parser.add_argument('--dim', help='dim to difference over')
+    parser.add_argument('--flow', help='flow variable')
+    parser.add_argument('--pk', help='pk variable of hybrid levels')
+    parser.add_argument('--bk', help='bk variable of hybrid levels')
+    parser.add_argument('--ps', help='surface pressure variable')
+    parser.add_argument('--method-args', nargs='+', default=[],
+                        help='variables passed to the method')
+    parser.add_argument('--option', action='append', default=[],
+                        metavar='KEY=VALUE',
+                        help='other operator argument, e.g. order=4')
+    parser.add_argument('--chunk-dim', default='time')
+    parser.add_argument('--chunk-size', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1)
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    options = {}
+    for option in args.option:
+        key, sep, value = option.partition('=')
+        if not sep:
+            raise SystemExit("Options must be KEY=VALUE, not "
+                             "'{}'".format(option))
+        options[key] = _literal(value)
+    job = Job(args.operator, args.variables, dim=args.dim, flow=args.flow,
+              pk=args.pk, bk=args.bk, ps=args.ps,
+              method_args=args.method_args, options=options,
+              chunk_dim=args.chunk_dim, chunk_size=args.chunk_size)
+    for path in run(job, args.inputs, args.output_dir,
+                    workers=args.workers):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
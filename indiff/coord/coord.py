@@ -11,7 +11,7 @@ class Coord(object):
         if dim in self.arr.dims:
             return dim
         if dim is None:
-            if self.arr.shape == 1:
+            if self.arr.ndim == 1:
                 return self.arr.dims[0]
         raise ValueError(msg)
 
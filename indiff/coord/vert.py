@@ -32,7 +32,7 @@ class Sigma(VertCoord):
 
     def pressure(self, ps):
         """Get pressure from sigma levels and surface pressure."""
-        return ps * self.sigma
+        return ps * self.arr
 
 
 class Eta(VertCoord):
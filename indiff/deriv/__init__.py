@@ -3,6 +3,8 @@
 See https://en.wikipedia.org/wiki/Finite_difference_coefficient for formulae
 for forward, backward, and centered differencing stencils of various orders.
 """
+from . import masked
+from .masked import StencilMap
 from . import finite
 from .finite import FiniteDeriv
 from . import one_sided
@@ -14,6 +16,18 @@ from .phys import PhysDeriv, LonDeriv, LatDeriv, EtaDeriv, SphereDeriv
 from .phys import LonFwdDeriv, LonBwdDeriv, LonCenDeriv
 from .phys import LatFwdDeriv, LatBwdDeriv, LatCenDeriv
 from .phys import EtaFwdDeriv, EtaBwdDeriv, EtaCenDeriv
-from .phys import SphereFwdDeriv, SphereBwdDeriv
+from .phys import ZDeriv, ZFwdDeriv, ZBwdDeriv, ZCenDeriv
+from .phys import (SigmaDeriv, SigmaFwdDeriv, SigmaBwdDeriv,
+                   SigmaCenDeriv)
+from .phys import (PressureDeriv, PressureFwdDeriv, PressureBwdDeriv,
+                   PressureCenDeriv)
+from .phys import SphereFwdDeriv, SphereBwdDeriv, SphereCenDeriv
 from .phys import (SphereEtaDeriv, SphereEtaBwdDeriv, SphereEtaFwdDeriv,
                    SphereEtaCenDeriv)
+from .phys import (SpherePressureDeriv, SpherePressureFwdDeriv,
+                   SpherePressureBwdDeriv, SpherePressureCenDeriv)
+from .phys import (SphereSigmaDeriv, SphereSigmaFwdDeriv,
+                   SphereSigmaBwdDeriv, SphereSigmaCenDeriv)
+from . import compact
+from .compact import (CompactDeriv, LonCompactDeriv, LatCompactDeriv,
+                      EtaCompactDeriv)
@@ -1,18 +1,22 @@
 from __future__ import division
 
+import numpy as np
 import xarray as xr
 
 from .. import CenDiff
+from ..kernels import cen_deriv, cen_deriv_at
 from . import FiniteDeriv, FwdDeriv, BwdDeriv
+from .finite import _point_indexers
 
 
 class CenDeriv(FiniteDeriv):
     _DIFF_CLS = CenDiff
-    _VALID_ORDERS = [2, 4]
+    _VALID_ORDERS = range(2, 13, 2)
+    _SCHEME = 'centered'
 
     """Derivatives computed via centered finite differencing."""
     def __init__(self, arr, dim, coord=None, spacing=1, order=2,
-                 fill_edge=True):
+                 fill_edge=True, workspace=None, mask=None):
         """
         :param arr: Data to be center-differenced.
         :type arr: `xarray.DataArray` or `xarray.Dataset`
@@ -21,13 +25,16 @@ class CenDeriv(FiniteDeriv):
             denominator.  If not given or None, arr[dim] is used.
         """
         super(CenDeriv, self).__init__(arr, dim, coord=coord, spacing=spacing,
-                                       order=order, fill_edge=fill_edge)
+                                       order=order, fill_edge=fill_edge,
+                                       workspace=workspace, mask=mask)
         self._deriv_fwd_obj = FwdDeriv(arr, dim, coord=self.coord,
                                        spacing=self.spacing, order=2,
-                                       fill_edge=self.fill_edge)
+                                       fill_edge=self.fill_edge,
+                                       workspace=self.workspace)
         self._deriv_bwd_obj = BwdDeriv(arr, dim, coord=self.coord,
                                        spacing=self.spacing, order=2,
-                                       fill_edge=self.fill_edge)
+                                       fill_edge=self.fill_edge,
+                                       workspace=self.workspace)
 
     def _edge_deriv(self):
         left = self._deriv_bwd_obj._edge_deriv_rev()
@@ -39,6 +46,46 @@ class CenDeriv(FiniteDeriv):
     def _concat(self, left, interior, right):
         return xr.concat([left, interior, right], dim=self.dim)
 
+    def _slice_interior(self, arr):
+        pad = self.spacing*(self.order // 2)
+        return arr[{self.dim: slice(pad, -pad)}]
+
+    def _kernel(self, values, coord, axis):
+        return cen_deriv(values, coord, axis=axis, spacing=self.spacing,
+                         order=self.order, fill_edge=self.fill_edge,
+                         workspace=self.workspace)
+
+    def _deriv_at(self, indexers, period=None, factor=None):
+        coord = self._kernel_coord()
+        if coord is None:
+            raise ValueError("Point-sampled derivatives require a DataArray "
+                             "and a coordinate spanning only its dims.")
+        index, dims, coords = self._point_index(indexers)
+        values = cen_deriv_at(
+            np.asarray(self.arr.values), coord, index,
+            axis=self.arr.get_axis_num(self.dim), spacing=self.spacing,
+            order=self.order, fill_edge=self.fill_edge, period=period,
+            factor=factor
+        )
+        return xr.DataArray(values, dims=dims, coords=coords)
+
+    def deriv_at(self, indexers, point_dim='point'):
+        """Derivative evaluated only at the given points.
+
+        Equivalent to `deriv` followed by pointwise indexing, but only the
+        neighbors of the points are accessed, so that the cost scales with
+        the number of points rather than with the size of the data.  Points
+        whose stencil doesn't fit when `fill_edge` is False are NaN.
+
+        :param dict indexers: Maps dims of the data, which must include the
+            derivative's dim, to integer positions of the points along them.
+            Each is a DataArray, or a 1-D array-like of positions along
+            `point_dim`.  Dims without an indexer are retained in full.
+        :param str point_dim: Name of the dim of the points when not given
+            by DataArray indexers.
+        """
+        return self._deriv_at(_point_indexers(indexers, point_dim))
+
     def _deriv(self):
         """Lowest possible order derivative with this scheme."""
         interior = self._arr_diff_obj.diff() / self._coord_diff_obj.diff()
@@ -60,6 +107,10 @@ class CenDeriv(FiniteDeriv):
             If `False`, the outputted array has a length in the computed axis
             reduced by `order`.
         """
+        if self.stencil_map is not None:
+            return self._deriv_masked()
+        if self._use_kernel():
+            return self._deriv_kernel()
         if self.order == 2:
             return self._deriv()
         if self.order == 4:
@@ -75,5 +126,6 @@ class CenDeriv(FiniteDeriv):
             left = single_space[{self.dim: slice(0, self.spacing*2)}]
             right = single_space[{self.dim: slice(-self.spacing*2, None)}]
             return self._concat(left, interior, right)
-        raise NotImplementedError("Centered differencing only "
-                                  "supported for 2nd and 4th order.")
+        raise NotImplementedError("Centered differencing of order {} "
+                                  "requires a DataArray and a coordinate "
+                                  "spanning only its dims.".format(self.order))
@@ -0,0 +1,120 @@
+"""Derivatives via compact (Pade) finite differencing.
+
+Compact schemes couple the derivatives at neighboring points, so each
+derivative requires a tridiagonal solve along its axis.  In return they are
+far more accurate than explicit stencils of the same width, particularly
+for the shortest resolved wavelengths.  See `indiff.kernels.compact_deriv`.
+"""
+import numpy as np
+import xarray as xr
+
+from .._constants import LON_STR, LAT_STR, PFULL_STR, _RADEARTH
+from ..coord import Lon, Lat, Eta
+from ..kernels import compact_deriv
+from ..pickling import LightPickle
+from ..utils import to_radians
+
+
+class CompactDeriv(LightPickle):
+    """Derivatives via compact finite differencing."""
+    _VALID_ORDERS = (4, 6)
+
+    def __init__(self, arr, dim, coord=None, order=4, cyclic=False,
+                 circumf=0.):
+        """
+        :param arr: Field to take the derivative of.
+        :param str dim: Dimension over which to take the derivative.
+        :param xarray.DataArray coord: Coordinate to use for the
+            denominator, either along `dim` or with dims among those of
+            `arr`.  If not given, arr[dim] is used.
+        :param int order: Order of accuracy in the interior: 4 or 6.  The
+            edges are third order, unless cyclic.
+        :param bool cyclic: Whether `dim` is cyclic.
+        :param float circumf: If cyclic, the period of the coordinate.
+        """
+        if order not in self._VALID_ORDERS:
+            raise ValueError("Order must be one of {}: "
+                             "{}".format(self._VALID_ORDERS, order))
+        self.arr = arr
+        self.dim = dim
+        self.coord = coord if coord is not None else arr[dim]
+        self.order = order
+        self.cyclic = cyclic
+        self.circumf = circumf
+
+    def _coord_values(self, coord):
+        """Values of the coordinate, broadcastable against those of `arr`."""
+        if coord.dims == (self.dim,):
+            return np.asarray(coord.values)
+        coord = coord.transpose(*[dim for dim in self.arr.dims
+                                  if dim in coord.dims])
+        return np.asarray(coord.values).reshape(
+            [self.arr.sizes[dim] if dim in coord.dims else 1
+             for dim in self.arr.dims]
+        )
+
+    def _deriv(self, arr, coord):
+        values = compact_deriv(np.asarray(arr.values),
+                               self._coord_values(coord),
+                               axis=arr.get_axis_num(self.dim),
+                               order=self.order, cyclic=self.cyclic,
+                               circumf=self.circumf)
+        return xr.DataArray(values, dims=arr.dims, coords=arr.coords)
+
+    def deriv(self):
+        return self._deriv(self.arr, self.coord)
+
+
+class LonCompactDeriv(CompactDeriv):
+    """Compact derivatives in longitude, cyclic by default."""
+    def __init__(self, arr, dim=None, coord=None, order=4, cyclic=True,
+                 radius=_RADEARTH):
+        dim = dim if dim is not None else LON_STR
+        coord = coord if coord is not None else arr[dim]
+        super(LonCompactDeriv, self).__init__(
+            arr, dim, coord=to_radians(coord), order=order, cyclic=cyclic,
+            circumf=2*np.pi
+        )
+        self._coord_obj = Lon(coord, dim=dim, cyclic=cyclic, radius=radius)
+
+    def deriv(self, lat):
+        """Zonal derivative, in physical distance.
+
+        :param lat: Latitude, for the zonal distance between points.
+        """
+        return (super(LonCompactDeriv, self).deriv() *
+                self._coord_obj.deriv_prefactor(lat))
+
+
+class LatCompactDeriv(CompactDeriv):
+    """Compact derivatives in latitude."""
+    def __init__(self, arr, dim=None, coord=None, order=4, radius=_RADEARTH):
+        dim = dim if dim is not None else LAT_STR
+        coord = coord if coord is not None else arr[dim]
+        super(LatCompactDeriv, self).__init__(arr, dim,
+                                              coord=to_radians(coord),
+                                              order=order)
+        self._coord_obj = Lat(coord, dim=dim, radius=radius)
+
+    def deriv(self, oper='grad'):
+        """Meridional derivative, in physical distance.
+
+        :param str oper: 'grad' for the gradient or 'divg' for the
+            divergence, i.e. including the cosine of latitude.
+        """
+        arr = self.arr*self._coord_obj.deriv_factor(oper)
+        return (self._deriv(arr, self.coord) *
+                self._coord_obj.deriv_prefactor(oper))
+
+
+class EtaCompactDeriv(CompactDeriv):
+    """Compact derivatives in pressure on hybrid sigma-pressure levels."""
+    def __init__(self, arr, pk, bk, ps, order=4):
+        self.pk = pk
+        self.bk = bk
+        self.ps = ps
+        self._coord_obj = Eta(pk, bk, arr[PFULL_STR])
+        super(EtaCompactDeriv, self).__init__(
+            arr, PFULL_STR, coord=self._coord_obj.pfull_from_ps(ps),
+            order=order
+        )
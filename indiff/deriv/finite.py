@@ -1,10 +1,40 @@
+import numpy as np
+import xarray as xr
+
 from ..diff import FiniteDiff
+from ..kernels import masked_deriv
+from ..pickling import LightPickle
+from ..utils import broadcastable
+from .masked import as_stencil_map
+
+
+def _point_indexers(indexers, point_dim='point'):
+    """Indexers selecting individual points, as DataArrays with common dims.
+
+    :param dict indexers: Maps dims to integer positions along them.  Each
+        is either a DataArray or a 1-D array-like, the latter taken to lie
+        along `point_dim`.
+    """
+    indexers = {dim: (ind if isinstance(ind, xr.DataArray) else
+                      xr.DataArray(np.asarray(ind), dims=[point_dim]))
+                for dim, ind in indexers.items()}
+    dims = list(indexers)
+    return dict(zip(dims, xr.broadcast(*[indexers[dim] for dim in dims])))
+
+
+def _at_points(arr, indexers):
+    """The array at the points, or itself if it doesn't vary across them."""
+    if not isinstance(arr, (xr.DataArray, xr.Dataset)):
+        return arr
+    return arr.isel(**{dim: ind for dim, ind in indexers.items()
+                       if dim in arr.dims})
 
 
-class FiniteDeriv(object):
+class FiniteDeriv(LightPickle):
     """Base class for finite-diff based derivative classes."""
     _DIFF_CLS = FiniteDiff
     _VALID_ORDERS = range(1, 5)
+    _SCHEME = None
 
     def _arr_coord(self, coord):
         """Get the coord to be used as the denominator for a derivative."""
@@ -13,12 +43,22 @@ class FiniteDeriv(object):
         return coord
 
     def __init__(self, arr, dim, coord=None, spacing=1, order=1,
-                 fill_edge=True):
+                 fill_edge=True, workspace=None, mask=None):
         """
         :param arr: Field to take derivative of.
         :param str dim: Name of dimension over which to take the derivative.
         :param xarray.DataArray coord: Coordinate array to use for the
             denominator.  If not given, arr[dim] is used.
+        :param workspace: `indiff.Workspace` holding scratch arrays that are
+            reused across calls.  If given, and if `arr` is a DataArray and
+            `coord` spans only dims of `arr`, the derivative is computed on
+            the underlying numpy arrays without allocating any intermediates.
+        :param mask: Enables masked differencing, in which stencils that
+            would reach into masked points fall back to lower order or
+            one-sided stencils, and masked points are NaN in the output.
+            Either a boolean DataArray that is True where data is missing,
+            True to mask wherever `arr` is NaN, or a `StencilMap` computed
+            previously for the same mask.
         """
         self.arr = arr
         self.dim = dim
@@ -27,6 +67,15 @@ class FiniteDeriv(object):
         assert order in self._VALID_ORDERS
         self.order = order
         self.fill_edge = fill_edge
+        self.workspace = workspace
+        self.stencil_map = None
+        if mask is not None:
+            if self._SCHEME is None:
+                raise NotImplementedError("Masked differencing not supported "
+                                          "by {}".format(type(self).__name__))
+            self.stencil_map = as_stencil_map(mask, arr, dim, spacing=spacing,
+                                              order=order,
+                                              scheme=self._SCHEME)
 
         self._arr_diff_obj = self._DIFF_CLS(self.arr, self.dim,
                                             spacing=self.spacing)
@@ -40,6 +89,95 @@ class FiniteDeriv(object):
     def _slice_edge(self, arr):
         raise NotImplementedError
 
+    def _slice_interior(self, arr):
+        """Portion of the array retained when edges are not filled."""
+        raise NotImplementedError
+
+    def _kernel_coord(self):
+        """Coordinate values broadcastable against those of `arr`.
+
+        None if the data or coordinate cannot be handled by `indiff.kernels`.
+        """
+        if not isinstance(self.arr, xr.DataArray):
+            return None
+        coord_dims = self.coord.dims
+        if (self.dim not in coord_dims or
+                not set(coord_dims) <= set(self.arr.dims) or
+                any(self.coord.sizes[dim] != self.arr.sizes[dim]
+                    for dim in coord_dims)):
+            return None
+        if coord_dims == (self.dim,):
+            return np.asarray(self.coord.values)
+        return broadcastable(self.coord, self.arr)
+
+    def _use_kernel(self):
+        """Whether the derivative can be computed by `indiff.kernels`, in a
+        single pass rather than by combining lower-order derivatives."""
+        return self._kernel_coord() is not None
+
+    def _kernel(self, values, coord, axis):
+        raise NotImplementedError
+
+    def _from_kernel(self, values):
+        template = (self.arr if self.fill_edge else
+                    self._slice_interior(self.arr))
+        return xr.DataArray(values, dims=template.dims,
+                            coords=template.coords, attrs=template.attrs)
+
+    def _deriv_kernel(self):
+        """Derivative computed on the numpy arrays underlying the data."""
+        values = self._kernel(np.asarray(self.arr.values),
+                              self._kernel_coord(),
+                              self.arr.get_axis_num(self.dim))
+        return self._from_kernel(values)
+
+    def _deriv_masked(self):
+        """Derivative with the stencil at each point chosen by the mask."""
+        coord = self._kernel_coord()
+        if coord is None:
+            raise ValueError("Masked differencing requires a DataArray and a "
+                             "coordinate spanning only its dims.")
+        values = masked_deriv(
+            np.asarray(self.arr.values), coord,
+            self.stencil_map.selectors(self.arr.dims),
+            axis=self.arr.get_axis_num(self.dim), spacing=self.spacing,
+            workspace=self.workspace
+        )
+        result = xr.DataArray(values, dims=self.arr.dims,
+                              coords=self.arr.coords)
+        if self.fill_edge:
+            return result
+        return self._slice_interior(result)
+
+    def _point_index(self, indexers):
+        """Numpy index gathering the points, and the result's dims and coords.
+
+        Dims of `arr` without an indexer are retained in full and come
+        first, followed by the dims of the indexers.
+        """
+        if self.dim not in indexers:
+            raise ValueError("Indexers must include the dim '{}' over which "
+                             "the derivative is taken".format(self.dim))
+        unknown = set(indexers) - set(self.arr.dims)
+        if unknown:
+            raise ValueError("Indexer dims {} not in the data's dims "
+                             "{}".format(unknown, self.arr.dims))
+        point_dims = list(indexers[self.dim].dims)
+        other_dims = [dim for dim in self.arr.dims if dim not in indexers]
+        ndim = len(other_dims) + len(point_dims)
+        index = []
+        for dim in self.arr.dims:
+            if dim in indexers:
+                ind = indexers[dim].transpose(*point_dims).values
+                index.append(ind.reshape((1,)*len(other_dims) + ind.shape))
+            else:
+                shape = [1]*ndim
+                shape[other_dims.index(dim)] = self.arr.sizes[dim]
+                index.append(np.arange(self.arr.sizes[dim]).reshape(shape))
+        coords = self.arr.coords.to_dataset()
+        coords = _at_points(coords, indexers).coords
+        return tuple(index), other_dims + point_dims, coords
+
     def _concat(self):
         raise NotImplementedError
 
@@ -0,0 +1,96 @@
+"""Choice of differencing stencil in the presence of masked data."""
+import numpy as np
+import xarray as xr
+
+from ..kernels import STENCIL_NAMES, stencil_codes, stencil_preference
+
+
+class StencilMap(object):
+    """The differencing stencil to use at each point, given a mask.
+
+    Near a masked point (e.g. below ground or over land), the preferred
+    stencil would reach into missing data, so the highest order stencil that
+    does not is used instead: first a lower order centered stencil (for
+    centered schemes), then one-sided stencils pointing away from the masked
+    point.  The same map can be reused for any number of fields and times
+    that share the mask.
+    """
+    def __init__(self, mask, dim, spacing=1, order=2, scheme='centered'):
+        """
+        :param xarray.DataArray mask: True where data is missing.  Must
+            include `dim`; any of its other dims are broadcast against the
+            data being differenced.
+        :param str dim: Dimension over which derivatives are taken.
+        :param int spacing: How many gridpoints over the stencils use.
+        :param int order: Order of accuracy of the preferred stencil.
+        :param str scheme: 'centered', 'forward', or 'backward'.
+        """
+        self.dim = dim
+        self.spacing = spacing
+        self.order = order
+        self.scheme = scheme
+        codes = stencil_codes(mask.values, mask.get_axis_num(dim), spacing,
+                              stencil_preference(scheme, order))
+        self.codes = xr.DataArray(codes, dims=mask.dims, coords=mask.coords)
+        self._selectors = {}
+
+    @classmethod
+    def from_nan(cls, arr, dim, **kwargs):
+        """Create a map treating all NaN values in the array as masked."""
+        return cls(arr.isnull(), dim, **kwargs)
+
+    def counts(self):
+        """Number of points using each stencil."""
+        counts = np.bincount(self.codes.values.ravel(),
+                             minlength=len(STENCIL_NAMES))
+        return dict(zip(STENCIL_NAMES, counts))
+
+    def selectors(self, dims):
+        """Boolean arrays marking where each stencil is used.
+
+        :param dims: Dimensions of the data to be differenced.  The arrays
+            have the same number of dimensions, in the same order, and are
+            broadcastable against that data.
+        :out: dict mapping the name of each stencil in use to its array.
+        """
+        dims = tuple(dims)
+        if dims not in self._selectors:
+            missing = set(self.codes.dims) - set(dims)
+            if missing:
+                raise ValueError("Mask dims {} not in the differenced data's "
+                                 "dims {}".format(missing, dims))
+            codes = self.codes.transpose(
+                *[dim for dim in dims if dim in self.codes.dims]
+            ).values
+            codes = codes.reshape([self.codes.sizes[dim] if dim in
+                                   self.codes.dims else 1 for dim in dims])
+            self._selectors[dims] = {
+                name: codes == code for code, name in enumerate(STENCIL_NAMES)
+                if code and np.any(codes == code)
+            }
+        return self._selectors[dims]
+
+    def matches(self, dim, spacing, order, scheme):
+        """Whether the map was made for the given differencing."""
+        return ((self.dim, self.spacing, self.order, self.scheme) ==
+                (dim, spacing, order, scheme))
+
+
+def as_stencil_map(mask, arr, dim, spacing=1, order=2, scheme='centered'):
+    """Get the StencilMap corresponding to the given mask.
+
+    :param mask: An existing `StencilMap`, which is checked for consistency
+        and returned; a boolean DataArray that is True where data is
+        missing; or True, to mask wherever `arr` is NaN.
+    """
+    if isinstance(mask, StencilMap):
+        if not mask.matches(dim, spacing, order, scheme):
+            raise ValueError("StencilMap was made for dim={}, spacing={}, "
+                             "order={}, scheme={}".format(
+                                 mask.dim, mask.spacing, mask.order,
+                                 mask.scheme))
+        return mask
+    if mask is True:
+        return StencilMap.from_nan(arr, dim, spacing=spacing, order=order,
+                                   scheme=scheme)
+    return StencilMap(mask, dim, spacing=spacing, order=order, scheme=scheme)
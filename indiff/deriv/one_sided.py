@@ -2,6 +2,7 @@
 import xarray as xr
 
 from .. import OneSidedDiff, FwdDiff, BwdDiff
+from ..kernels import one_sided_deriv
 from . import FiniteDeriv
 
 
@@ -9,13 +10,15 @@ class OneSidedDeriv(FiniteDeriv):
     """Base class for one-sided differencing derivative approximations."""
     _DIFF_CLS = OneSidedDiff
     _DIFF_REV_CLS = OneSidedDiff
-    _VALID_ORDERS = range(1, 3)
+    _VALID_ORDERS = range(1, 13)
+    _IS_BWD = None
 
     def __init__(self, arr, dim, coord=None, spacing=1, order=1,
-                 fill_edge=True):
+                 fill_edge=True, workspace=None, mask=None):
         super(OneSidedDeriv, self).__init__(arr, dim, coord=coord,
                                             spacing=spacing, order=order,
-                                            fill_edge=fill_edge)
+                                            fill_edge=fill_edge,
+                                            workspace=workspace, mask=mask)
 
     def _edge_deriv_rev(self):
         edge_arr = (self._DIFF_REV_CLS(self.arr, self.dim,
@@ -32,11 +35,22 @@ class OneSidedDeriv(FiniteDeriv):
         edge_arr = self._edge_deriv_rev()
         return self._concat(interior, edge_arr)
 
+    def _kernel(self, values, coord, axis):
+        if self._IS_BWD is None:
+            raise NotImplementedError
+        return one_sided_deriv(values, coord, axis=axis, spacing=self.spacing,
+                               order=self.order, fill_edge=self.fill_edge,
+                               is_bwd=self._IS_BWD, workspace=self.workspace)
+
     def deriv(self):
         """One-sided differencing approximation of derivative.
 
         :out: Array containing the derivative approximation
         """
+        if self.stencil_map is not None:
+            return self._deriv_masked()
+        if self._use_kernel():
+            return self._deriv_kernel()
         if self.order == 1:
             return self._deriv()
         if self.order == 2:
@@ -51,23 +65,30 @@ class OneSidedDeriv(FiniteDeriv):
                 return interior
             edge_arr = self._slice_edge(single_space)
             return self._concat(interior, edge_arr)
-        raise NotImplementedError("Forward differencing derivative only "
-                                  "supported for 1st and 2nd order currently")
+        raise NotImplementedError("One-sided differencing of order {} "
+                                  "requires a DataArray and a coordinate "
+                                  "spanning only its dims.".format(self.order))
 
 
 class FwdDeriv(OneSidedDeriv):
     """Derivatives using forward differencing."""
     _DIFF_CLS = FwdDiff
     _DIFF_REV_CLS = BwdDiff
+    _IS_BWD = False
+    _SCHEME = 'forward'
 
     def __init__(self, arr, dim, coord=None, spacing=1, order=1,
-                 fill_edge=True):
+                 fill_edge=True, workspace=None, mask=None):
         super(FwdDeriv, self).__init__(arr, dim, coord=coord, spacing=spacing,
-                                       order=order, fill_edge=fill_edge)
+                                       order=order, fill_edge=fill_edge,
+                                       workspace=workspace, mask=mask)
 
     def _slice_edge(self, arr):
         return arr[{self.dim: slice(-self.spacing*self.order, None)}]
 
+    def _slice_interior(self, arr):
+        return arr[{self.dim: slice(None, -self.spacing*self.order)}]
+
     def _concat(self, interior, edge):
         return xr.concat([interior, edge], dim=self.dim)
 
@@ -76,14 +97,20 @@ class BwdDeriv(OneSidedDeriv):
     """Derivatives using backward differencing."""
     _DIFF_CLS = BwdDiff
     _DIFF_REV_CLS = FwdDiff
+    _IS_BWD = True
+    _SCHEME = 'backward'
 
     def __init__(self, arr, dim, coord=None, spacing=1, order=1,
-                 fill_edge=True):
+                 fill_edge=True, workspace=None, mask=None):
         super(BwdDeriv, self).__init__(arr, dim, coord=coord, spacing=spacing,
-                                       order=order, fill_edge=fill_edge)
+                                       order=order, fill_edge=fill_edge,
+                                       workspace=workspace, mask=mask)
 
     def _slice_edge(self, arr):
         return arr[{self.dim: slice(None, self.spacing*self.order)}]
 
+    def _slice_interior(self, arr):
+        return arr[{self.dim: slice(self.spacing*self.order, None)}]
+
     def _concat(self, interior, edge):
         return xr.concat([edge, interior], dim=self.dim)
@@ -1,12 +1,22 @@
+import functools
 import warnings
 
+import numpy as np
+import xarray as xr
+
 from .._constants import LON_STR, LAT_STR, PFULL_STR, _RADEARTH
-from ..utils import to_radians, wraparound
-from ..coord import Coord, Lon, Lat, Eta
+from ..utils import broadcastable, to_radians, wraparound
+from ..coord import (Coord, Lon, Lat, VertCoord, ZCoord, Pressure, Sigma,
+                     Eta)
+from ..kernels import level_weights, column_weights, apply_level_weights
+from ..lazy import Term
+from ..pickling import LightPickle
 from . import FiniteDeriv, FwdDeriv, BwdDeriv, CenDeriv
+from .finite import _point_indexers, _at_points
+from .masked import StencilMap, as_stencil_map
 
 
-class PhysDeriv(object):
+class PhysDeriv(LightPickle):
     """Derivatives in physical space."""
     _COORD_CLS = Coord
     _DERIV_CLS = FiniteDeriv
@@ -20,13 +30,14 @@ class PhysDeriv(object):
         return coord
 
     def __init__(self, arr, dim, coord=None, spacing=1, order=2,
-                 fill_edge=True, **coord_kwargs):
+                 fill_edge=True, workspace=None, mask=None, **coord_kwargs):
         self.arr = arr.copy(deep=True)
         self.dim = dim
         self.coord = self._get_coord(coord)
         self._orig_coord_values = self.coord.values
         self.spacing = spacing
         self.order = order
+        self.workspace = workspace
         self.cyclic = coord_kwargs.get('cyclic', False)
 
         self._coord_obj = self._COORD_CLS(self.coord, dim=self.dim,
@@ -38,6 +49,20 @@ class PhysDeriv(object):
             warnings.warn("Overriding 'fill_edge' value of True, because "
                           "coord is cyclic")
         self.fill_edge = False if self.cyclic else fill_edge
+        self.stencil_map = self._prep_stencil_map(mask)
+
+    def _prep_stencil_map(self, mask):
+        """Stencil map for the data as differenced, i.e. after any wrapping.
+
+        A `StencilMap` given directly must already account for the wrapping.
+        """
+        if mask is None or isinstance(mask, StencilMap):
+            return mask
+        if mask is True:
+            mask = self.arr.isnull()
+        return as_stencil_map(self._wrap(mask), self.arr, self.dim,
+                              spacing=self.spacing, order=self.order,
+                              scheme=self._DERIV_CLS._SCHEME)
 
     def _wrap(self, arr):
         if self.cyclic:
@@ -60,10 +85,43 @@ class PhysDeriv(object):
         darr = (self._DERIV_CLS(arr.copy(deep=True), self.dim,
                                 coord=coord.copy(deep=True),
                                 spacing=self.spacing, order=self.order,
-                                fill_edge=self.fill_edge).deriv() *
+                                fill_edge=self.fill_edge,
+                                workspace=self.workspace,
+                                mask=self.stencil_map).deriv() *
                 self._coord_obj.deriv_prefactor(*args, **kwargs))
         return darr
 
+    def deriv_at(self, indexers, *args, **kwargs):
+        """Derivative evaluated only at the given points.
+
+        :param indexers: As for `CenDeriv.deriv_at`.  The name of the
+            points' dim can be given as the `point_dim` keyword argument.
+
+        Other arguments are as for `deriv`.
+        """
+        point_dim = kwargs.pop('point_dim', 'point')
+        if not hasattr(self._DERIV_CLS, 'deriv_at'):
+            raise NotImplementedError("Point-sampled derivatives not "
+                                      "supported by {}".format(
+                                          self._DERIV_CLS.__name__))
+        indexers = _point_indexers(indexers, point_dim)
+        coord = self._prep_coord(self.arr[self.dim].copy(deep=True))
+        deriv_obj = self._DERIV_CLS(self.arr, self.dim, coord=coord,
+                                    spacing=self.spacing, order=self.order,
+                                    fill_edge=self.fill_edge)
+        factor = self.deriv_factor(*args, **kwargs)
+        if isinstance(factor, xr.DataArray):
+            factor = broadcastable(factor, deriv_obj.arr)
+        period = None
+        if self.cyclic and self._WRAP_CIRCUMF:
+            # Rather than wrapping the data, index it modulo its length.
+            period = float(self._prep_coord(
+                xr.DataArray(float(self._WRAP_CIRCUMF))
+            ))
+        darr = deriv_obj._deriv_at(indexers, period=period, factor=factor)
+        prefactor = self._coord_obj.deriv_prefactor(*args, **kwargs)
+        return darr * _at_points(prefactor, indexers)
+
 
 class LonDeriv(PhysDeriv):
     _COORD_CLS = Lon
@@ -108,18 +166,19 @@ class LatCenDeriv(LatDeriv):
     _DERIV_CLS = CenDeriv
 
 
-class EtaDeriv(object):
+class EtaDeriv(LightPickle):
     _DERIV_CLS = FiniteDeriv
     _COORD_CLS = Eta
 
     def __init__(self, arr, pk, bk, ps, spacing=1, order=2, fill_edge=True,
-                 **coord_kwargs):
+                 workspace=None, mask=None, **coord_kwargs):
         self.arr = arr.copy(deep=True)
         self.dim = PFULL_STR
         self.ps = ps
         self.spacing = spacing
         self.order = order
         self.fill_edge = fill_edge
+        self.workspace = workspace
 
         self._coord_obj = self._COORD_CLS(pk, bk, self.arr[self.dim],
                                           **coord_kwargs)
@@ -131,12 +190,47 @@ class EtaDeriv(object):
                        'd_deta_from_pfull',
                        'dp_from_ps']:
             setattr(self, method, getattr(self._coord_obj, method))
+        self.stencil_map = None
+        if mask is not None:
+            self.stencil_map = as_stencil_map(
+                mask, self.arr, self.dim, spacing=spacing, order=order,
+                scheme=self._DERIV_CLS._SCHEME
+            )
 
     def deriv(self):
         pfull = self.pfull_from_ps(self.ps)
         return self._DERIV_CLS(self.arr.copy(deep=True), self.dim, coord=pfull,
                                spacing=self.spacing, order=self.order,
-                               fill_edge=self.fill_edge).deriv()
+                               fill_edge=self.fill_edge,
+                               workspace=self.workspace,
+                               mask=self.stencil_map).deriv()
+
+    def deriv_at(self, indexers, point_dim='point'):
+        """Derivative evaluated only at the given points.
+
+        Only the columns containing the points are extracted from the data
+        and surface pressure.
+
+        :param indexers: As for `CenDeriv.deriv_at`.
+        """
+        if not hasattr(self._DERIV_CLS, 'deriv_at'):
+            raise NotImplementedError("Point-sampled derivatives not "
+                                      "supported by {}".format(
+                                          self._DERIV_CLS.__name__))
+        indexers = _point_indexers(indexers, point_dim)
+        columns = {dim: ind for dim, ind in indexers.items()
+                   if dim != self.dim}
+        arr = _at_points(self.arr, columns)
+        pfull = self.pfull_from_ps(_at_points(self.ps, columns))
+        levels = {self.dim: indexers[self.dim]}
+        for dim in indexers[self.dim].dims:
+            if dim in arr.dims:
+                levels[dim] = xr.DataArray(np.arange(arr.sizes[dim]),
+                                           dims=[dim])
+        deriv_obj = self._DERIV_CLS(arr, self.dim, coord=pfull,
+                                    spacing=self.spacing, order=self.order,
+                                    fill_edge=self.fill_edge)
+        return deriv_obj._deriv_at(levels)
 
 
 class EtaFwdDeriv(EtaDeriv):
@@ -151,7 +245,238 @@ class EtaCenDeriv(EtaDeriv):
     _DERIV_CLS = CenDeriv
 
 
-class HorizPhysDeriv(object):
+@functools.lru_cache(maxsize=32)
+def _level_weights(levels, scheme, spacing, order, fill_edge):
+    # Keyed on the level values, so objects on the same levels share them.
+    return level_weights(np.array(levels), scheme=scheme, spacing=spacing,
+                         order=order, fill_edge=fill_edge)
+
+
+class LevelDeriv(LightPickle):
+    """Derivatives along fixed 1-D vertical levels.
+
+    The levels are the same at every point and time, so the weights of the
+    differencing stencil at each level are computed once, and shared by all
+    objects on the same levels.
+    """
+    _DERIV_CLS = FiniteDeriv
+    _COORD_CLS = VertCoord
+
+    def __init__(self, arr, dim, levels=None, spacing=1, order=2,
+                 fill_edge=True, workspace=None, mask=None):
+        """
+        :param arr: Field to take derivative of.
+        :param str dim: Name of the vertical dimension.
+        :param levels: Coordinate values at the levels.  If not given,
+            arr[dim] is used.
+        :param mask: As for `FiniteDeriv`.  If given, the derivative is
+            computed by the `_DERIV_CLS` rather than with the cached weights.
+        """
+        self.arr = arr
+        self.dim = dim
+        self.levels = levels if levels is not None else arr[dim]
+        self.spacing = spacing
+        self.order = order
+        self.fill_edge = fill_edge
+        self.workspace = workspace
+        self._coord_obj = self._COORD_CLS(self.levels, dim=dim)
+
+        self.stencil_map = None
+        if mask is not None:
+            self.stencil_map = as_stencil_map(
+                mask, self.arr, self.dim, spacing=spacing, order=order,
+                scheme=self._DERIV_CLS._SCHEME
+            )
+
+    @property
+    def weights(self):
+        """Offsets and weights of the stencil, and the first output level."""
+        if self._DERIV_CLS._SCHEME is None:
+            raise NotImplementedError
+        return _level_weights(
+            tuple(np.asarray(self.levels.values, dtype=float)),
+            self._DERIV_CLS._SCHEME, self.spacing, self.order, self.fill_edge
+        )
+
+    def deriv(self, arr=None):
+        """Derivative with respect to the level coordinate.
+
+        :param arr: Optional other field on the same levels to take the
+            derivative of instead, reusing the weights.
+        """
+        arr = self.arr if arr is None else arr
+        if self.stencil_map is not None:
+            return self._DERIV_CLS(arr, self.dim, coord=self.levels,
+                                   spacing=self.spacing, order=self.order,
+                                   fill_edge=self.fill_edge,
+                                   workspace=self.workspace,
+                                   mask=self.stencil_map).deriv()
+        offsets, weights, start = self.weights
+        axis = arr.get_axis_num(self.dim)
+        values = apply_level_weights(
+            np.asarray(arr.values), offsets, weights, start=start, axis=axis,
+            workspace=self.workspace
+        )
+        template = arr[{self.dim: slice(start, start + values.shape[axis])}]
+        return xr.DataArray(values, dims=template.dims,
+                            coords=template.coords)
+
+
+class PressureDeriv(LevelDeriv):
+    """Derivatives in pressure, on fixed pressure levels.
+
+    Unlike with hybrid levels, no surface pressure is needed.
+    """
+    _COORD_CLS = Pressure
+
+    def __init__(self, arr, dim, p=None, spacing=1, order=2, fill_edge=True,
+                 workspace=None, mask=None):
+        """
+        :param str dim: Name of the pressure dimension.
+        :param p: Pressure at the levels.  If not given, arr[dim] is used.
+            The derivative is per unit of `p`.
+        :param mask: As for `FiniteDeriv`, e.g. to exclude levels below the
+            surface.
+        """
+        super(PressureDeriv, self).__init__(
+            arr, dim, levels=p, spacing=spacing, order=order,
+            fill_edge=fill_edge, workspace=workspace, mask=mask
+        )
+        self.p = self.levels
+
+
+class PressureFwdDeriv(PressureDeriv):
+    _DERIV_CLS = FwdDeriv
+
+
+class PressureBwdDeriv(PressureDeriv):
+    _DERIV_CLS = BwdDeriv
+
+
+class PressureCenDeriv(PressureDeriv):
+    _DERIV_CLS = CenDeriv
+
+
+class ZDeriv(LevelDeriv):
+    """Derivatives in height, with the height of the levels varying in
+    space and time, e.g. geopotential height in a nonhydrostatic model.
+
+    The non-uniform stencil weights of every column are computed together,
+    in a single vectorized pass, the first time they're needed.  They are
+    then reused, including for other fields on the same heights.
+    """
+    _COORD_CLS = ZCoord
+
+    def __init__(self, arr, z, dim, spacing=1, order=2, fill_edge=True,
+                 workspace=None, mask=None):
+        """
+        :param arr: Field to take derivative of.
+        :param z: Height of the levels.  Its dims must include `dim` and be
+            a subset of those of `arr`.
+        :param str dim: Name of the vertical dimension.
+        """
+        super(ZDeriv, self).__init__(
+            arr, dim, levels=z, spacing=spacing, order=order,
+            fill_edge=fill_edge, workspace=workspace, mask=mask
+        )
+        self.z = self.levels
+        self._weights = None
+
+    @property
+    def weights(self):
+        """Offsets and weights of the stencil, and the first output level.
+
+        The weights have a dim of length 1 for each dim of `arr` that the
+        height doesn't vary along.
+        """
+        if self._DERIV_CLS._SCHEME is None:
+            raise NotImplementedError
+        if self._weights is None:
+            z = self.z.transpose(*[dim for dim in self.arr.dims
+                                   if dim in self.z.dims])
+            z = np.asarray(z.values, dtype=float).reshape(
+                [self.arr.sizes[dim] if dim in self.z.dims else 1
+                 for dim in self.arr.dims]
+            )
+            self._weights = column_weights(
+                z, axis=self.arr.get_axis_num(self.dim),
+                scheme=self._DERIV_CLS._SCHEME, spacing=self.spacing,
+                order=self.order, fill_edge=self.fill_edge
+            )
+        return self._weights
+
+    def deriv(self, arr=None):
+        """Derivative in height.
+
+        :param arr: Optional other field on the same heights to take the
+            derivative of instead, reusing the weights.
+        """
+        if arr is not None:
+            arr = arr.transpose(*self.arr.dims)
+        return super(ZDeriv, self).deriv(arr)
+
+
+class ZFwdDeriv(ZDeriv):
+    _DERIV_CLS = FwdDeriv
+
+
+class ZBwdDeriv(ZDeriv):
+    _DERIV_CLS = BwdDeriv
+
+
+class ZCenDeriv(ZDeriv):
+    _DERIV_CLS = CenDeriv
+
+
+class SigmaDeriv(LevelDeriv):
+    """Derivatives in pressure, on sigma levels.
+
+    As pressure is the product of the surface pressure and the 1-D sigma
+    levels, the derivative in pressure is that in sigma, whose stencil
+    weights are cached, divided by the surface pressure.  The pressure
+    itself is never computed, so that memory scales with the surface
+    pressure rather than with the full field.
+    """
+    _COORD_CLS = Sigma
+
+    def __init__(self, arr, ps, dim, sigma=None, spacing=1, order=2,
+                 fill_edge=True, workspace=None, mask=None):
+        """
+        :param ps: Surface pressure.  Its dims must be a subset of those of
+            `arr`.
+        :param str dim: Name of the sigma dimension.
+        :param sigma: Sigma at the levels.  If not given, arr[dim] is used.
+        """
+        super(SigmaDeriv, self).__init__(
+            arr, dim, levels=sigma, spacing=spacing, order=order,
+            fill_edge=fill_edge, workspace=workspace, mask=mask
+        )
+        self.ps = ps
+        self.sigma = self.levels
+
+    def d_dsigma(self, arr=None):
+        return super(SigmaDeriv, self).deriv(arr)
+
+    def deriv(self, arr=None):
+        """Derivative in pressure."""
+        deriv = self.d_dsigma(arr)
+        deriv /= self.ps
+        return deriv
+
+
+class SigmaFwdDeriv(SigmaDeriv):
+    _DERIV_CLS = FwdDeriv
+
+
+class SigmaBwdDeriv(SigmaDeriv):
+    _DERIV_CLS = BwdDeriv
+
+
+class SigmaCenDeriv(SigmaDeriv):
+    _DERIV_CLS = CenDeriv
+
+
+class HorizPhysDeriv(LightPickle):
     """Horizontal derivatives."""
     _X_DERIV_CLS = PhysDeriv
     _Y_DERIV_CLS = PhysDeriv
@@ -179,7 +504,25 @@ class SphereDeriv(HorizPhysDeriv):
     _Y_DERIV_CLS = LatDeriv
 
     def __init__(self, arr, x_coord=None, y_coord=None, cyclic_lon=True,
-                 fill_edge_lon=False, fill_edge_lat=True, **kwargs):
+                 fill_edge_lon=False, fill_edge_lat=True, region=None,
+                 lazy=False, **kwargs):
+        """
+        :param region: Optional `Region`.  If given, derivatives are computed
+            only over it (plus the halo of points its stencils require) and
+            returned only within it.
+        :param bool lazy: If True, `horiz_grad` returns an unevaluated
+            `indiff.lazy.Expr`.
+        """
+        self.region = region
+        self.lazy = lazy
+        self._selection = None
+        if region is not None:
+            halo = kwargs.get('spacing', 1)*kwargs.get('order', 2)
+            self._selection = region.select(arr, halo, cyclic_lon=cyclic_lon)
+            arr = self._selection.extract(arr)
+            x_coord = self._selection.extract(x_coord)
+            y_coord = self._selection.extract(y_coord)
+            cyclic_lon = self._selection.cyclic_lon
         self.arr = arr.copy(deep=True)
         self.cyclic_lon = cyclic_lon
         self._x_deriv_obj = self._X_DERIV_CLS(
@@ -190,12 +533,21 @@ class SphereDeriv(HorizPhysDeriv):
             arr.copy(deep=True), LAT_STR, coord=y_coord,
             fill_edge=fill_edge_lat, **kwargs
         )
-        self.d_dy = self._y_deriv_obj.deriv
+
+    def _trim(self, arr):
+        if self._selection is None:
+            return arr
+        return self._selection.trim(arr)
 
     def d_dx(self):
-        return self._x_deriv_obj.deriv(self.arr.copy(deep=True))
+        return self._trim(self._x_deriv_obj.deriv(self.arr[LAT_STR]))
+
+    def d_dy(self, *args, **kwargs):
+        return self._trim(self._y_deriv_obj.deriv(*args, **kwargs))
 
     def horiz_grad(self):
+        if self.lazy:
+            return Term(self.d_dx) + Term(self.d_dy, kwargs=dict(oper='grad'))
         return self.d_dx() + self.d_dy(oper='grad')
 
 
@@ -217,15 +569,24 @@ class SphereCenDeriv(SphereDeriv):
     _Y_DERIV_CLS = LatCenDeriv
 
 
-class SphereEtaDeriv(object):
+class SphereEtaDeriv(LightPickle):
     """Derivatives on the sphere with hybrid sigma-pressure in the vertical."""
     _HORIZ_DERIV_CLS = SphereDeriv
     _VERT_DERIV_CLS = EtaDeriv
 
     def __init__(self, arr, pk, bk, ps, spacing=1, order=2, cyclic_lon=True,
                  fill_edge_lon=False, fill_edge_lat=True, fill_edge_vert=True,
-                 radius=_RADEARTH):
-        self.arr = arr.copy(deep=True)
+                 radius=_RADEARTH, workspace=None, lazy=False):
+        """
+        :param bool lazy: If True, the composite derivatives, e.g.
+            `horiz_grad_const_p` and `grad_3d`, return an unevaluated
+            `indiff.lazy.Expr`.  Evaluating several of them together, even
+            from different objects created from the same arrays, computes
+            their shared terms only once.
+        """
+        # When lazy, the data is only read, and keeping the original object
+        # lets terms of different objects be identified as the same.
+        self.arr = arr if lazy else arr.copy(deep=True)
         self.pk = pk
         self.bk = bk
         self.ps = ps
@@ -236,11 +597,13 @@ class SphereEtaDeriv(object):
         self.fill_edge_lat = fill_edge_lat
         self.fill_edge_vert = fill_edge_vert
         self.radius = radius
+        self.workspace = workspace
+        self.lazy = lazy
 
         horiz_deriv_kwargs = dict(
             spacing=spacing, order=order, cyclic_lon=cyclic_lon,
             fill_edge_lon=fill_edge_lon, fill_edge_lat=fill_edge_lat,
-            radius=radius
+            radius=radius, workspace=workspace, lazy=lazy
         )
         self._horiz_deriv_obj = self._HORIZ_DERIV_CLS(arr.copy(deep=True),
                                                       **horiz_deriv_kwargs)
@@ -250,7 +613,7 @@ class SphereEtaDeriv(object):
             setattr(self, method, getattr(self._horiz_deriv_obj, method))
 
         vert_deriv_kwargs = dict(spacing=spacing, order=order,
-                                 fill_edge=fill_edge_vert)
+                                 fill_edge=fill_edge_vert, workspace=workspace)
         self._vert_deriv_obj = self._VERT_DERIV_CLS(
             arr.copy(deep=True), pk, bk, ps, **vert_deriv_kwargs
         )
@@ -262,20 +625,38 @@ class SphereEtaDeriv(object):
 
     def _horiz_deriv_const_p(self, arr, arr_deriv, ps, ps_deriv):
         """Horizontal derivative in single direction at constant pressure."""
-        darr_deta = self.d_deta_from_pfull(arr.copy(deep=True))
-        bk_at_pfull = self.to_pfull_from_phalf(self.bk)
-        da_deta = self.d_deta_from_phalf(self.pk)
-        db_deta = self.d_deta_from_phalf(self.bk)
+        if self.lazy:
+            # These depend only on the grid and data, so are shared by all
+            # the terms and objects on them.
+            darr_deta = Term(self.d_deta_from_pfull, [arr], pure=True)
+            bk_at_pfull = Term(self.to_pfull_from_phalf, [self.bk], pure=True)
+            da_deta = Term(self.d_deta_from_phalf, [self.pk], pure=True)
+            db_deta = Term(self.d_deta_from_phalf, [self.bk], pure=True)
+        else:
+            darr_deta = self.d_deta_from_pfull(arr.copy(deep=True))
+            bk_at_pfull = self.to_pfull_from_phalf(self.bk)
+            da_deta = self.d_deta_from_phalf(self.pk)
+            db_deta = self.d_deta_from_phalf(self.bk)
         return arr_deriv + (darr_deta * bk_at_pfull * ps_deriv /
                             (da_deta + db_deta*ps))
 
     def d_dx_const_p(self):
+        if self.lazy:
+            return self._horiz_deriv_const_p(
+                self.arr, Term(self.d_dx), self.ps,
+                Term(self._ps_horiz_deriv_obj.d_dx)
+            )
         return self._horiz_deriv_const_p(
             self.arr.copy(deep=True), self.d_dx(), self.ps,
             self._ps_horiz_deriv_obj.d_dx()
         )
 
     def d_dy_const_p(self, oper='grad'):
+        if self.lazy:
+            return self._horiz_deriv_const_p(
+                self.arr, Term(self.d_dy, kwargs=dict(oper=oper)), self.ps,
+                Term(self._ps_horiz_deriv_obj.d_dy, kwargs=dict(oper=oper))
+            )
         return self._horiz_deriv_const_p(
             self.arr.copy(deep=True), self.d_dy(oper=oper), self.ps,
             self._ps_horiz_deriv_obj.d_dy(oper=oper)
@@ -285,7 +666,9 @@ class SphereEtaDeriv(object):
         return self.d_dx_const_p() + self.d_dy_const_p(oper='grad')
 
     def grad_3d(self):
-        return self.horiz_grad_const_p(oper='grad') + self.d_dp()
+        if self.lazy:
+            return self.horiz_grad_const_p() + Term(self.d_dp)
+        return self.horiz_grad_const_p() + self.d_dp()
 
 
 class SphereEtaFwdDeriv(SphereEtaDeriv):
@@ -304,3 +687,167 @@ class SphereEtaCenDeriv(SphereEtaDeriv):
     """Derivatives on the sphere with hybrid sigma-pressure in the vertical."""
     _HORIZ_DERIV_CLS = SphereCenDeriv
     _VERT_DERIV_CLS = EtaCenDeriv
+
+
+class SpherePressureDeriv(LightPickle):
+    """Derivatives on the sphere with pressure in the vertical.
+
+    Horizontal derivatives are already at constant pressure, so no surface
+    pressure is needed.
+    """
+    _HORIZ_DERIV_CLS = SphereDeriv
+    _VERT_DERIV_CLS = PressureDeriv
+
+    def __init__(self, arr, dim, p=None, spacing=1, order=2, cyclic_lon=True,
+                 fill_edge_lon=False, fill_edge_lat=True, fill_edge_vert=True,
+                 radius=_RADEARTH, workspace=None):
+        """
+        :param str dim: Name of the pressure dimension.
+        :param p: Pressure at the levels.  If not given, arr[dim] is used.
+        """
+        self.arr = arr
+        self.dim = dim
+        self.p = p
+        self.spacing = spacing
+        self.order = order
+        self.cyclic_lon = cyclic_lon
+        self.fill_edge_lon = fill_edge_lon
+        self.fill_edge_lat = fill_edge_lat
+        self.fill_edge_vert = fill_edge_vert
+        self.radius = radius
+        self.workspace = workspace
+
+        self._horiz_deriv_obj = self._HORIZ_DERIV_CLS(
+            arr, spacing=spacing, order=order, cyclic_lon=cyclic_lon,
+            fill_edge_lon=fill_edge_lon, fill_edge_lat=fill_edge_lat,
+            radius=radius, workspace=workspace
+        )
+        for method in ['d_dx', 'd_dy', 'horiz_grad']:
+            setattr(self, method, getattr(self._horiz_deriv_obj, method))
+        # On pressure levels these are already at constant pressure.
+        self.d_dx_const_p = self.d_dx
+        self.d_dy_const_p = self.d_dy
+        self.horiz_grad_const_p = self.horiz_grad
+
+        self._vert_deriv_obj = self._VERT_DERIV_CLS(
+            arr, dim, p=p, spacing=spacing, order=order,
+            fill_edge=fill_edge_vert, workspace=workspace
+        )
+        self.d_dp = self._vert_deriv_obj.deriv
+
+    def grad_3d(self):
+        return self.horiz_grad_const_p() + self.d_dp()
+
+
+class SpherePressureFwdDeriv(SpherePressureDeriv):
+    """Derivatives on the sphere with pressure in the vertical."""
+    _HORIZ_DERIV_CLS = SphereFwdDeriv
+    _VERT_DERIV_CLS = PressureFwdDeriv
+
+
+class SpherePressureBwdDeriv(SpherePressureDeriv):
+    """Derivatives on the sphere with pressure in the vertical."""
+    _HORIZ_DERIV_CLS = SphereBwdDeriv
+    _VERT_DERIV_CLS = PressureBwdDeriv
+
+
+class SpherePressureCenDeriv(SpherePressureDeriv):
+    """Derivatives on the sphere with pressure in the vertical."""
+    _HORIZ_DERIV_CLS = SphereCenDeriv
+    _VERT_DERIV_CLS = PressureCenDeriv
+
+
+class SphereSigmaDeriv(LightPickle):
+    """Derivatives on the sphere with sigma in the vertical.
+
+    Horizontal derivatives at constant pressure are those along the sigma
+    levels less the vertical derivative times the slope of the levels,
+    which for sigma is `sigma*d(ps)/dx`.  Both are computed from the 1-D
+    sigma levels and the surface pressure, without the full pressure field.
+    """
+    _HORIZ_DERIV_CLS = SphereDeriv
+    _VERT_DERIV_CLS = SigmaDeriv
+
+    def __init__(self, arr, ps, dim, sigma=None, spacing=1, order=2,
+                 cyclic_lon=True, fill_edge_lon=False, fill_edge_lat=True,
+                 fill_edge_vert=True, radius=_RADEARTH, workspace=None):
+        """
+        :param str dim: Name of the sigma dimension.
+        :param sigma: Sigma at the levels.  If not given, arr[dim] is used.
+        """
+        self.arr = arr
+        self.ps = ps
+        self.dim = dim
+        self.spacing = spacing
+        self.order = order
+        self.cyclic_lon = cyclic_lon
+        self.fill_edge_lon = fill_edge_lon
+        self.fill_edge_lat = fill_edge_lat
+        self.fill_edge_vert = fill_edge_vert
+        self.radius = radius
+        self.workspace = workspace
+
+        horiz_deriv_kwargs = dict(
+            spacing=spacing, order=order, cyclic_lon=cyclic_lon,
+            fill_edge_lon=fill_edge_lon, fill_edge_lat=fill_edge_lat,
+            radius=radius, workspace=workspace
+        )
+        self._horiz_deriv_obj = self._HORIZ_DERIV_CLS(arr,
+                                                      **horiz_deriv_kwargs)
+        self._ps_horiz_deriv_obj = self._HORIZ_DERIV_CLS(ps,
+                                                         **horiz_deriv_kwargs)
+        for method in ['d_dx', 'd_dy', 'horiz_grad']:
+            setattr(self, method, getattr(self._horiz_deriv_obj, method))
+
+        self._vert_deriv_obj = self._VERT_DERIV_CLS(
+            arr, ps, dim, sigma=sigma, spacing=spacing, order=order,
+            fill_edge=fill_edge_vert, workspace=workspace
+        )
+        self.sigma = self._vert_deriv_obj.sigma
+        self.d_dsigma = self._vert_deriv_obj.d_dsigma
+        self.d_dp = self._vert_deriv_obj.deriv
+
+    def _horiz_deriv_const_p(self, arr_deriv, ps_deriv, darr_dsigma=None):
+        """Horizontal derivative in single direction at constant pressure."""
+        if darr_dsigma is None:
+            darr_dsigma = self.d_dsigma()
+        return arr_deriv - darr_dsigma*self.sigma*(ps_deriv / self.ps)
+
+    def d_dx_const_p(self, darr_dsigma=None):
+        return self._horiz_deriv_const_p(
+            self.d_dx(), self._ps_horiz_deriv_obj.d_dx(), darr_dsigma
+        )
+
+    def d_dy_const_p(self, oper='grad', darr_dsigma=None):
+        # The slope of the levels is the gradient of pressure, whichever
+        # operator is applied to the data.
+        return self._horiz_deriv_const_p(
+            self.d_dy(oper=oper), self._ps_horiz_deriv_obj.d_dy(oper='grad'),
+            darr_dsigma
+        )
+
+    def horiz_grad_const_p(self):
+        darr_dsigma = self.d_dsigma()
+        return (self.d_dx_const_p(darr_dsigma) +
+                self.d_dy_const_p(oper='grad', darr_dsigma=darr_dsigma))
+
+    def grad_3d(self):
+        return self.horiz_grad_const_p() + self.d_dp()
+
+
+class SphereSigmaFwdDeriv(SphereSigmaDeriv):
+    """Derivatives on the sphere with sigma in the vertical."""
+    _HORIZ_DERIV_CLS = SphereFwdDeriv
+    _VERT_DERIV_CLS = SigmaFwdDeriv
+
+
+class SphereSigmaBwdDeriv(SphereSigmaDeriv):
+    """Derivatives on the sphere with sigma in the vertical."""
+    _HORIZ_DERIV_CLS = SphereBwdDeriv
+    _VERT_DERIV_CLS = SigmaBwdDeriv
+
+
+class SphereSigmaCenDeriv(SphereSigmaDeriv):
+    """Derivatives on the sphere with sigma in the vertical."""
+    _HORIZ_DERIV_CLS = SphereCenDeriv
+    _VERT_DERIV_CLS = SigmaCenDeriv
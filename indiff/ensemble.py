@@ -0,0 +1,165 @@
+"""Running operators over ensemble members in parallel processes."""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import os
+
+import cloudpickle
+import xarray as xr
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _limit_memory(max_bytes):
+    """Cap the address space of the current (worker) process."""
+    if max_bytes is None or resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        max_bytes = min(max_bytes, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (max_bytes, hard))
+
+
+def _run_payload(payload):
+    return cloudpickle.loads(payload)()
+
+
+def _open(path):
+    with xr.open_dataarray(path) as arr:
+        return arr.load()
+
+
+class _MemberTask(object):
+    """The operator applied to a single member, as run by a worker."""
+    def __init__(self, cls, member, args, kwargs, method, method_args,
+                 method_kwargs, load):
+        self.cls = cls
+        self.member = member
+        self.args = args
+        self.kwargs = kwargs
+        self.method = method
+        self.method_args = method_args
+        self.method_kwargs = method_kwargs
+        self.load = load
+
+    def __call__(self):
+        member = self.member
+        if isinstance(member, str):
+            member = (self.load or _open)(member)
+        operator = self.cls(member, *self.args, **self.kwargs)
+        return getattr(operator, self.method)(*self.method_args,
+                                              **self.method_kwargs)
+
+
+class EnsembleRunner(object):
+    """Applies an operator to each of many inputs across a process pool.
+
+    Each task, i.e. the operator class, its arguments, and one member, is
+    serialized with cloudpickle, so that operators and loaders defined
+    interactively or in scripts can be used.  Tasks that fail, including by
+    exceeding the memory limit or by crashing their worker, are retried in
+    a fresh pool, without rerunning the members already completed.  A
+    crashed worker breaks the whole pool, so the members still pending then
+    are rerun each in a pool of its own, and only the one that crashes
+    again is counted as having failed.
+    """
+    def __init__(self, processes=None, max_bytes_per_worker=None,
+                 retries=2):
+        """
+        :param int processes: Number of worker processes.  Defaults to the
+            number of CPUs.
+        :param int max_bytes_per_worker: Limit on the memory, specifically
+            the address space, of each worker.  Not enforced on platforms
+            without the `resource` module.  If None, there is no limit.
+        :param int retries: Number of times a failed member is retried
+            before giving up.
+        """
+        self.processes = processes
+        self.max_bytes_per_worker = max_bytes_per_worker
+        self.retries = retries
+
+    def _pool(self, processes=None):
+        return ProcessPoolExecutor(max_workers=processes or self.processes,
+                                   initializer=_limit_memory,
+                                   initargs=(self.max_bytes_per_worker,))
+
+    def _collect(self, futures, results, attempts, suspects, isolated):
+        """Store the results of the futures, each of the member it maps to.
+
+        Members that fail are charged an attempt, except those merely
+        pending when another member's crash broke their shared pool, which
+        become suspects instead.
+        """
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except BrokenProcessPool as err:
+                if not isolated:
+                    suspects.add(i)
+                    continue
+                self._charge(i, attempts, err)
+            except Exception as err:
+                self._charge(i, attempts, err)
+            else:
+                del attempts[i]
+
+    def _charge(self, i, attempts, err):
+        attempts[i] += 1
+        if attempts[i] > self.retries:
+            raise RuntimeError("Ensemble member {} failed after {} "
+                               "attempts: {!r}".format(i, attempts[i], err))
+
+    def run(self, cls, members, args=(), kwargs=None, method='deriv',
+            method_args=(), method_kwargs=None, load=None, concat_dim=None):
+        """Results of the operator's method for each member.
+
+        :param cls: Operator class, e.g. `CenDeriv` or `SphereEtaUpwind`.
+        :param members: Sequence of the inputs, each passed as the first
+            argument to create the operator with.  Each is either an array,
+            or the path of a file from which to load it in the worker.
+        :param args: Remaining positional arguments to create the operator
+            with, shared by all members.
+        :param kwargs: Keyword arguments to create the operator with.
+        :param str method: Name of the operator's method to call, e.g.
+            'deriv' or 'advec_3d'.
+        :param method_args: Positional arguments to the method.
+        :param method_kwargs: Keyword arguments to the method.
+        :param load: Function loading a member from its path.  Defaults to
+            `xarray.open_dataarray`.
+        :param str concat_dim: If given, the results are concatenated along
+            a new dimension of this name rather than returned as a list.
+        :out: Results in the same order as `members`.
+        """
+        payloads = [cloudpickle.dumps(_MemberTask(
+            cls, member, tuple(args), kwargs or {}, method,
+            tuple(method_args), method_kwargs or {}, load
+        )) for member in members]
+        results = [None]*len(payloads)
+        attempts = {i: 0 for i in range(len(payloads))}
+        suspects = set()
+        while attempts:
+            if not suspects:
+                with self._pool() as pool:
+                    futures = {pool.submit(_run_payload, payloads[i]): i
+                               for i in sorted(attempts)}
+                    self._collect(futures, results, attempts, suspects,
+                                  isolated=False)
+                continue
+            # Rerun the suspects apart, so a crash is charged to its cause.
+            batch = sorted(suspects)[:self.processes or os.cpu_count() or 1]
+            suspects.difference_update(batch)
+            pools = [self._pool(processes=1) for _ in batch]
+            try:
+                futures = {pool.submit(_run_payload, payloads[i]): i
+                           for pool, i in zip(pools, batch)}
+                self._collect(futures, results, attempts, suspects,
+                              isolated=True)
+            finally:
+                for pool in pools:
+                    pool.shutdown()
+        if concat_dim is not None:
+            return xr.concat(results, dim=concat_dim)
+        return results
@@ -1,4 +1,5 @@
 from . import horiz
 from .horiz import HorizGeom, HorizCartesian, HorizSphere
 from . import horiz_vert
-from .horiz_vert import HorizVertGeom, SphereEtaGeom
+from .horiz_vert import (HorizVertGeom, Cartesian3D, SpherePressureGeom,
+                         SphereEtaGeom)
@@ -1,24 +1,219 @@
 """Horizontal geometries."""
+import numpy as np
+import xarray as xr
+
+from .._constants import _RADEARTH
 from ..coord import HorizCoord, XCoord, YCoord, Lon, Lat
+from ..kernels import cen_deriv, one_sided_deriv
+from ..utils import to_radians
+
+
+def _along(values, arr, dim):
+    """Reshape 1-D values along `dim` to broadcast against the array."""
+    if np.ndim(values) == 0:
+        return values
+    shape = [1]*arr.ndim
+    shape[arr.get_axis_num(dim)] = np.size(values)
+    return np.reshape(values, shape)
+
+
+def _take_axis(values, start, stop, axis):
+    index = [slice(None)]*values.ndim
+    index[axis] = slice(start, stop)
+    return values[tuple(index)]
+
+
+def _set_edge(arr, other, edge, axis):
+    index = [slice(None)]*arr.ndim
+    index[axis] = edge
+    arr[tuple(index)] = other[tuple(index)]
+
+
+def _upwind(flow, bwd, fwd):
+    """Backward differencing for positive flow, forward for negative."""
+    return np.maximum(flow, 0)*bwd + np.minimum(flow, 0)*fwd
 
 
 class HorizGeom(object):
-    """Generic base class for horizontal geometries."""
+    """Generic base class for horizontal geometries.
+
+    The metric terms, and for cyclic coordinates the index maps of the
+    halos, are computed once at construction and shared by all of the
+    derivatives and advection computed with the geometry.  These use
+    centered (derivatives) or one-sided (upwind advection) differencing.
+    """
     _X_COORD_CLS = HorizCoord
     _Y_COORD_CLS = HorizCoord
     _X_DIM_NAME = 'x'
     _Y_DIM_NAME = 'y'
+    _X_CIRCUMF = 0.
 
     def _prep_coord(self, coord, coord_cls, dim):
         if isinstance(coord, coord_cls):
             return coord
         return coord_cls(coord, dim)
 
-    def __init__(self, x, y):
+    def _coord_values(self, arr):
+        """Values of the coordinate as used in the differencing."""
+        return np.asarray(arr, dtype=float)
+
+    def __init__(self, x, y, spacing=1, order=2):
+        """
+        :param x: x coordinate, or array of its values.
+        :param y: y coordinate, or array of its values.
+        :param int spacing: Gridpoints spanned by the differencing.
+        :param int order: Order of accuracy of the differencing.
+        """
         self.x = self._prep_coord(x, self._X_COORD_CLS, self._X_DIM_NAME)
         self.y = self._prep_coord(y, self._Y_COORD_CLS, self._Y_DIM_NAME)
         self._x_arr = self.x.arr
         self._y_arr = self.y.arr
+        self.spacing = spacing
+        self.order = order
+        self.halo = spacing*order
+
+        self.x_values = self._coord_values(self._x_arr)
+        self.y_values = self._coord_values(self._y_arr)
+        self.x_halo_map = None
+        if self.x.cyclic:
+            self.x_halo_map, self._x_values_halo = self._halo(
+                self.x_values, self._x_arr.get_axis_num(self.x.dim)
+            )
+        self._init_metrics()
+        self.x_prefactor = self._x_prefactor()
+        self.y_factors = {oper: self._y_factor(oper)
+                          for oper in ['grad', 'divg']}
+        self.y_prefactors = {oper: self._y_prefactor(oper)
+                             for oper in ['grad', 'divg']}
+
+    def _halo(self, values, axis):
+        """Indices, and coordinate values, of the cyclically padded x."""
+        n = values.shape[axis]
+        positions = np.arange(-self.halo, n + self.halo)
+        halo_map = positions % n
+        wraps = positions // n
+        shape = [1]*values.ndim
+        shape[axis] = wraps.size
+        padded = (np.take(values, halo_map, axis=axis) +
+                  self._X_CIRCUMF*wraps.reshape(shape))
+        return halo_map, padded
+
+    def _init_metrics(self):
+        """Compute any quantities shared by the metric factors."""
+        pass
+
+    def _x_prefactor(self):
+        """Factor multiplying derivatives in x, along y."""
+        return 1.
+
+    def _y_factor(self, oper):
+        """Factor multiplying the data within derivatives in y, along y."""
+        return 1.
+
+    def _y_prefactor(self, oper):
+        """Factor multiplying derivatives in y, along y."""
+        return 1.
+
+    def _wrap(self, values, axis):
+        """Cyclically pad the data along x, using the halo map."""
+        return np.take(values, self.x_halo_map, axis=axis)
+
+    def _result(self, values, arr):
+        return xr.DataArray(values, dims=arr.dims, coords=arr.coords)
+
+    def d_dx(self, arr):
+        """Derivative in x, via centered differencing."""
+        axis = arr.get_axis_num(self.x.dim)
+        values = np.asarray(arr.values)
+        if self.x_halo_map is None:
+            deriv = cen_deriv(values, self.x_values, axis=axis,
+                              spacing=self.spacing, order=self.order)
+        else:
+            # Only half of the halo is needed by centered stencils.
+            n = values.shape[axis]
+            start = self.halo - self.halo // 2
+            stop = self.halo + n + self.halo // 2
+            deriv = cen_deriv(
+                _take_axis(self._wrap(values, axis), start, stop, axis),
+                self._x_values_halo[start:stop], axis=axis,
+                spacing=self.spacing, order=self.order, fill_edge=False
+            )
+        return self._result(
+            deriv*_along(self.x_prefactor, arr, self.y.dim), arr
+        )
+
+    def d_dy(self, arr, oper='grad'):
+        """Derivative in y, via centered differencing.
+
+        :param str oper: 'grad' or 'divg', for gradient or divergence.
+        """
+        axis = arr.get_axis_num(self.y.dim)
+        values = (np.asarray(arr.values) *
+                  _along(self.y_factors[oper], arr, self.y.dim))
+        deriv = cen_deriv(values, self.y_values, axis=axis,
+                          spacing=self.spacing, order=self.order)
+        return self._result(
+            deriv*_along(self.y_prefactors[oper], arr, self.y.dim), arr
+        )
+
+    def horiz_grad(self, arr):
+        return self.d_dx(arr) + self.d_dy(arr, oper='grad')
+
+    def _derivs_bwd_fwd(self, values, coord, axis, halo_map=None):
+        """Backward and forward derivatives for upwind advection.
+
+        If not cyclic, at each edge the derivative of the opposite direction
+        is used.
+        """
+        kwargs = dict(axis=axis, spacing=self.spacing, order=self.order)
+        if halo_map is None:
+            bwd = one_sided_deriv(values, coord, is_bwd=True, **kwargs)
+            fwd = one_sided_deriv(values, coord, **kwargs)
+            _set_edge(bwd, fwd, 0, axis)
+            _set_edge(fwd, bwd, -1, axis)
+            return bwd, fwd
+        n = values.shape[axis]
+        padded = self._wrap(values, axis)
+        bwd = one_sided_deriv(padded, coord, is_bwd=True, fill_edge=False,
+                              **kwargs)
+        fwd = one_sided_deriv(padded, coord, fill_edge=False, **kwargs)
+        return (_take_axis(bwd, 0, n, axis),
+                _take_axis(fwd, self.halo, self.halo + n, axis))
+
+    def _flow_values(self, flow, arr):
+        return np.asarray(flow.transpose(*arr.dims).values)
+
+    def advec_x(self, arr, u):
+        """Upwind advection in x of the array by the flow.
+
+        :param u: Flow in x, with the same dims as the array.
+        """
+        axis = arr.get_axis_num(self.x.dim)
+        values = np.asarray(arr.values)
+        if self.x_halo_map is None:
+            bwd, fwd = self._derivs_bwd_fwd(values, self.x_values, axis)
+        else:
+            bwd, fwd = self._derivs_bwd_fwd(values, self._x_values_halo, axis,
+                                            halo_map=self.x_halo_map)
+        advec = _upwind(self._flow_values(u, arr), bwd, fwd)
+        return self._result(advec*_along(self.x_prefactor, arr, self.y.dim),
+                            arr)
+
+    def advec_y(self, arr, v):
+        """Upwind advection in y of the array by the flow.
+
+        :param v: Flow in y, with the same dims as the array.
+        """
+        axis = arr.get_axis_num(self.y.dim)
+        bwd, fwd = self._derivs_bwd_fwd(np.asarray(arr.values),
+                                        self.y_values, axis)
+        advec = _upwind(self._flow_values(v, arr), bwd, fwd)
+        return self._result(
+            advec*_along(self.y_prefactors['grad'], arr, self.y.dim), arr
+        )
+
+    def advec_horiz(self, arr, u, v):
+        return self.advec_x(arr, u) + self.advec_y(arr, v)
 
 
 class HorizCartesian(HorizGeom):
@@ -26,16 +221,52 @@ class HorizCartesian(HorizGeom):
     _X_COORD_CLS = XCoord
     _Y_COORD_CLS = YCoord
 
-    def __init__(self, x, y):
-        super(HorizCartesian, self).__init__(x, y)
+    def __init__(self, x, y, spacing=1, order=2):
+        super(HorizCartesian, self).__init__(x, y, spacing=spacing,
+                                             order=order)
 
 
 class HorizSphere(HorizGeom):
-    """Spherical horizontal geometry."""
+    """Spherical horizontal geometry.
+
+    The cosine of latitude and the resulting metric factors are computed
+    once, at construction.
+    """
     _X_COORD_CLS = Lon
     _Y_COORD_CLS = Lat
     _X_DIM_NAME = 'lon'
     _Y_DIM_NAME = 'lat'
+    _X_CIRCUMF = 2*np.pi
+
+    def __init__(self, lon, lat, spacing=1, order=2, cyclic_lon=True,
+                 radius=_RADEARTH):
+        """
+        :param bool cyclic_lon: Whether longitude spans the globe.  Only
+            used if `lon` isn't already a `Lon` object.
+        :param float radius: Radius of the sphere.
+        """
+        self.radius = radius
+        if not isinstance(lon, Lon):
+            lon = Lon(lon, self._X_DIM_NAME, cyclic=cyclic_lon,
+                      radius=radius)
+        super(HorizSphere, self).__init__(lon, lat, spacing=spacing,
+                                          order=order)
+
+    def _coord_values(self, arr):
+        return np.asarray(to_radians(arr), dtype=float)
+
+    def _init_metrics(self):
+        self.cos_lat = np.cos(self.y_values)
+
+    def _x_prefactor(self):
+        return 1. / (self.radius*self.cos_lat)
+
+    def _y_factor(self, oper):
+        if oper == 'grad':
+            return 1.
+        return self.cos_lat
 
-    def __init__(self, lon, lat):
-        super(HorizSphere, self).__init__(lon, lat)
+    def _y_prefactor(self, oper):
+        if oper == 'grad':
+            return 1. / self.radius
+        return 1. / (self.radius*self.cos_lat)
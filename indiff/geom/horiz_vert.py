@@ -1,36 +1,124 @@
 """Combined horizontal geometries with vertical coordinates."""
-from .. import _RADEARTH
+import numpy as np
+
+from .._constants import _RADEARTH
 from ..coord import ZCoord, Pressure, Eta
+from ..kernels import cen_deriv
+from ..utils import broadcastable
 from . import HorizCartesian, HorizSphere
+from .horiz import _upwind
 
 
 class HorizVertGeom(object):
+    """Horizontal geometry combined with a vertical coordinate.
+
+    Vertical derivatives and advection use the vertical coordinate's values
+    as given, via centered and one-sided differencing, respectively.
+    """
     def __init__(self, horiz_geom, vert_coord):
         self._horiz_geom = horiz_geom
         self._vert_coord = vert_coord
         self.x = self._horiz_geom.x
         self.y = self._horiz_geom.y
         self.z = self._vert_coord
-        self.d_dx = self._horiz.d_dx
-        self.d_dy = self._horiz.d_dy
-        self.horiz_grad = self._horiz_geom.grad
+        self.spacing = self._horiz_geom.spacing
+        self.order = self._horiz_geom.order
+        for method in ['d_dx', 'd_dy', 'horiz_grad', 'advec_x', 'advec_y',
+                       'advec_horiz']:
+            setattr(self, method, getattr(self._horiz_geom, method))
+
+    def _vert_coord_values(self, arr, *args):
+        """Values of the vertical coordinate, broadcastable against the
+        array."""
+        return broadcastable(self.z.arr, arr)
+
+    def d_dz(self, arr, *args):
+        """Vertical derivative, via centered differencing."""
+        values = cen_deriv(np.asarray(arr.values),
+                           self._vert_coord_values(arr, *args),
+                           axis=arr.get_axis_num(self.z.dim),
+                           spacing=self.spacing, order=self.order)
+        return self._horiz_geom._result(values, arr)
+
+    def advec_z(self, arr, flow, *args):
+        """Upwind vertical advection of the array by the flow."""
+        bwd, fwd = self._horiz_geom._derivs_bwd_fwd(
+            np.asarray(arr.values), self._vert_coord_values(arr, *args),
+            arr.get_axis_num(self.z.dim)
+        )
+        advec = _upwind(self._horiz_geom._flow_values(flow, arr), bwd, fwd)
+        return self._horiz_geom._result(advec, arr)
 
 
 class Cartesian3D(HorizVertGeom):
-    def __init__(self, x, y, z):
+    def __init__(self, x, y, z, spacing=1, order=2):
         self._x = x
         self._y = y
         self._z = z
-        super(Cartesian3D, self).__init__(HorizCartesian(x, y), ZCoord(z))
+        super(Cartesian3D, self).__init__(
+            HorizCartesian(x, y, spacing=spacing, order=order),
+            ZCoord(z, dim=z.dims[0])
+        )
 
 
 class SpherePressureGeom(HorizVertGeom):
-    def __init__(self, lon, lat, p, radius=_RADEARTH):
-        super(SphereEtaGeom, self).__init__(HorizSphere(lon, lat),
-                                            Pressure(p))
+    def __init__(self, lon, lat, p, spacing=1, order=2, cyclic_lon=True,
+                 radius=_RADEARTH):
+        super(SpherePressureGeom, self).__init__(
+            HorizSphere(lon, lat, spacing=spacing, order=order,
+                        cyclic_lon=cyclic_lon, radius=radius),
+            Pressure(p, dim=p.dims[0])
+        )
+        self.d_dp = self.d_dz
+        self.advec_p = self.advec_z
+
+    def advec_3d(self, arr, u, v, omega):
+        return self.advec_horiz(arr, u, v) + self.advec_p(arr, omega)
 
 
 class SphereEtaGeom(HorizVertGeom):
-    def __init__(self, lon, lat, pk, bk, radius=_RADEARTH):
-        super(SphereEtaGeom, self).__init__(HorizSphere(lon, lat),
-                                            Eta(pk, bk))
+    """Sphere with hybrid sigma-pressure levels.
+
+    The terms of the transformation to constant pressure that depend only
+    on the levels are computed once, at construction.
+    """
+    def __init__(self, lon, lat, pk, bk, pfull, spacing=1, order=2,
+                 cyclic_lon=True, radius=_RADEARTH):
+        super(SphereEtaGeom, self).__init__(
+            HorizSphere(lon, lat, spacing=spacing, order=order,
+                        cyclic_lon=cyclic_lon, radius=radius),
+            Eta(pk, bk, pfull, dim=pfull.dims[0])
+        )
+        self.bk_at_pfull = self.z.to_pfull_from_phalf(self.z.bk)
+        self.da_deta = self.z.d_deta_from_phalf(self.z.pk)
+        self.db_deta = self.z.d_deta_from_phalf(self.z.bk)
+        self.d_deta = self.z.d_deta_from_pfull
+
+    def _vert_coord_values(self, arr, ps):
+        return broadcastable(self.z.pfull_from_ps(ps), arr)
+
+    def d_dp(self, arr, ps):
+        """Derivative in pressure, given the surface pressure."""
+        return self.d_dz(arr, ps)
+
+    def advec_p(self, arr, omega, ps):
+        """Upwind advection in pressure, given the surface pressure."""
+        return self.advec_z(arr, omega, ps)
+
+    def _const_p(self, arr, arr_deriv, ps, ps_deriv):
+        """Transform a horizontal derivative to constant pressure."""
+        return arr_deriv + (self.d_deta(arr) * self.bk_at_pfull * ps_deriv /
+                            (self.da_deta + self.db_deta*ps))
+
+    def d_dx_const_p(self, arr, ps):
+        return self._const_p(arr, self.d_dx(arr), ps, self.d_dx(ps))
+
+    def d_dy_const_p(self, arr, ps, oper='grad'):
+        return self._const_p(arr, self.d_dy(arr, oper=oper), ps,
+                             self.d_dy(ps, oper=oper))
+
+    def horiz_grad_const_p(self, arr, ps):
+        return self.d_dx_const_p(arr, ps) + self.d_dy_const_p(arr, ps)
+
+    def grad_3d(self, arr, ps):
+        return self.horiz_grad_const_p(arr, ps) + self.d_dp(arr, ps)
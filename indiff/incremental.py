@@ -0,0 +1,231 @@
+"""Incremental computation of operators over growing time series."""
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+import xarray as xr
+
+from .workspace import Workspace
+
+
+def _update_hash(hasher, obj):
+    """Feed an operator argument into the hash, by value.
+
+    The name and attrs of DataArrays and Datasets are included, as results
+    carry them over.
+    """
+    if isinstance(obj, (xr.DataArray, xr.Dataset)):
+        hasher.update(type(obj).__name__.encode())
+        if isinstance(obj, xr.DataArray):
+            hasher.update(repr((obj.dims, obj.name)).encode())
+            _update_hash(hasher, obj.values)
+        else:
+            _update_hash(hasher, {name: obj[name] for name in obj.data_vars})
+        _update_hash(hasher, {name: obj[name].values for name in obj.coords})
+        _update_hash(hasher, dict(obj.attrs))
+    elif isinstance(obj, np.ndarray):
+        hasher.update('{}{}'.format(obj.dtype, obj.shape).encode())
+        if obj.dtype.hasobject:
+            hasher.update(repr(obj.tolist()).encode())
+        else:
+            hasher.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            hasher.update(repr(key).encode())
+            _update_hash(hasher, obj[key])
+    elif isinstance(obj, (list, tuple)):
+        hasher.update('{}{}'.format(type(obj).__name__, len(obj)).encode())
+        for item in obj:
+            _update_hash(hasher, item)
+    elif isinstance(obj, Workspace):
+        # Scratch space only; doesn't affect the results.
+        hasher.update(b'Workspace')
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        hasher.update(type(obj).__name__.encode())
+        _update_hash(hasher, {key: val for key, val in vars(obj).items()
+                              if not key.startswith('_')})
+    else:
+        hasher.update(repr(obj).encode())
+
+
+def fingerprint(*objs):
+    """Hash of the given objects' contents, as a hex string."""
+    hasher = hashlib.sha1()
+    for obj in objs:
+        _update_hash(hasher, obj)
+    return hasher.hexdigest()
+
+
+def _time_strings(times):
+    return [str(time) for time in np.asarray(times).astype(str)]
+
+
+class IncrementalStore(object):
+    """Results of an operator, persisted on disk as time records are added.
+
+    None of the operators couple different times, so when new records are
+    appended to the input data, only they need to be computed.  The results
+    are stored in a directory, one file per run, alongside a manifest
+    recording the operator, its parameters, the grid, and the times
+    processed so far.  Runs with a different operator, parameters, or grid
+    than those recorded are rejected.
+    """
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, path, time_dim='time'):
+        """
+        :param str path: Directory in which the results are stored.  Created
+            if it doesn't exist.
+        :param str time_dim: Name of the time dimension.
+        """
+        self.path = path
+        self.time_dim = time_dim
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.path, self.MANIFEST)
+
+    def manifest(self):
+        """The manifest of the stored results, or None if there are none."""
+        if not os.path.exists(self._manifest_path):
+            return None
+        with open(self._manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest):
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path)
+
+    def times(self):
+        """Times, as strings, for which results are stored."""
+        manifest = self.manifest()
+        if manifest is None:
+            return []
+        return [time for part in manifest['parts'] for time in part['times']]
+
+    def load(self):
+        """All stored results, concatenated over time and sorted by it.
+
+        Earlier times may be added in later runs, so the parts aren't
+        necessarily in order.
+        """
+        manifest = self.manifest()
+        if manifest is None or not manifest['parts']:
+            return None
+        parts = []
+        for part in manifest['parts']:
+            with open(os.path.join(self.path, part['file']), 'rb') as f:
+                parts.append(pickle.load(f))
+        result = xr.concat(parts, dim=self.time_dim)
+        if self.time_dim in result.coords:
+            result = result.sortby(self.time_dim)
+        return result
+
+    def _time_varying(self, args):
+        return [arg for arg in args if isinstance(arg, xr.DataArray) and
+                self.time_dim in arg.dims]
+
+    def _grid(self, arrs):
+        """Hash of the inputs' grids, excluding time."""
+        return fingerprint([
+            ({dim: size for dim, size in arr.sizes.items()
+              if dim != self.time_dim},
+             {name: arr[name].values for name in arr.coords
+              if self.time_dim not in arr[name].dims})
+            for arr in arrs
+        ])
+
+    def _params(self, cls, method, args, kwargs, method_args, method_kwargs):
+        """Hash of the operator and its arguments, excluding time-varying
+        arrays."""
+        def static(arg):
+            if isinstance(arg, xr.DataArray) and self.time_dim in arg.dims:
+                return 'time-varying'
+            return arg
+        return fingerprint(
+            cls.__module__, cls.__name__, method,
+            [static(arg) for arg in args],
+            {key: static(val) for key, val in kwargs.items()},
+            [static(arg) for arg in method_args],
+            {key: static(val) for key, val in method_kwargs.items()}
+        )
+
+    def _at_times(self, arg, positions):
+        if isinstance(arg, xr.DataArray) and self.time_dim in arg.dims:
+            return arg.isel(**{self.time_dim: positions})
+        return arg
+
+    def run(self, cls, args=(), kwargs=None, method='deriv', method_args=(),
+            method_kwargs=None):
+        """Compute the operator at any new times, and return all results.
+
+        Arguments of the operator and its method that are DataArrays with
+        the time dimension are treated as the time-varying inputs and
+        subset to the new times; all must share the same times.  All other
+        arguments are treated as fixed parameters.
+
+        :param cls: Operator class, e.g. `CenDeriv` or `SphereEtaUpwind`.
+        :param args: Positional arguments to create the operator with.
+        :param kwargs: Keyword arguments to create the operator with.
+        :param str method: Name of the operator's method to call, e.g.
+            'deriv' or 'advec_3d'.
+        :param method_args: Positional arguments to the method.
+        :param method_kwargs: Keyword arguments to the method.
+        :out: Results at all times processed so far, including earlier runs.
+        """
+        kwargs = kwargs or {}
+        method_kwargs = method_kwargs or {}
+        inputs = self._time_varying(list(args) + list(kwargs.values()) +
+                                    list(method_args) +
+                                    list(method_kwargs.values()))
+        if not inputs:
+            raise ValueError("No inputs have the time dim "
+                             "'{}'".format(self.time_dim))
+        times = _time_strings(inputs[0][self.time_dim].values)
+        for arr in inputs[1:]:
+            if _time_strings(arr[self.time_dim].values) != times:
+                raise ValueError("Time-varying inputs must share the same "
+                                 "times")
+
+        grid = self._grid(inputs)
+        params = self._params(cls, method, args, kwargs, method_args,
+                              method_kwargs)
+        manifest = self.manifest()
+        if manifest is None:
+            manifest = dict(operator='{}.{}'.format(cls.__module__,
+                                                    cls.__name__),
+                            method=method, time_dim=self.time_dim,
+                            grid=grid, params=params, parts=[])
+        elif manifest['grid'] != grid:
+            raise ValueError("Grid differs from that of the stored results "
+                             "in {}".format(self.path))
+        elif (manifest['params'] != params or
+              manifest['time_dim'] != self.time_dim):
+            raise ValueError("Operator or parameters differ from those of "
+                             "the stored results in {}".format(self.path))
+
+        done = set(self.times())
+        positions = [i for i, time in enumerate(times) if time not in done]
+        if positions:
+            result = getattr(
+                cls(*[self._at_times(arg, positions) for arg in args],
+                    **{key: self._at_times(val, positions)
+                       for key, val in kwargs.items()}),
+                method
+            )(*[self._at_times(arg, positions) for arg in method_args],
+              **{key: self._at_times(val, positions)
+                 for key, val in method_kwargs.items()})
+            filename = 'part-{:05d}.pkl'.format(len(manifest['parts']))
+            with open(os.path.join(self.path, filename), 'wb') as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            manifest['parts'].append(
+                dict(file=filename, times=[times[i] for i in positions])
+            )
+            self._write_manifest(manifest)
+        return self.load()
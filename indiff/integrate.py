@@ -0,0 +1,145 @@
+"""Time integration of tracers advected by a possibly time-varying flow.
+
+The integrators are the strong-stability-preserving (SSP) Runge-Kutta
+schemes in Shu-Osher form, of which forward Euler is the first-order case.
+Each stage is a convex combination of the state at the start of the step and
+a forward-Euler step from the previous stage, so that they inherit the
+monotonicity of forward Euler with upwind advection under the same CFL
+limit.  The state, the current stage, and the scaled tendency are held in
+buffers of a `Workspace`, so that memory use doesn't grow with the number of
+steps.
+"""
+import numpy as np
+
+from .workspace import Workspace
+
+
+def interp_flow(start, end, frac):
+    """Flow a fraction of the way from `start` to `end`, linearly.
+
+    The flows can be arrays, or tuples, lists, or dicts of them, e.g. (u,
+    v, omega, ps).  If `end` is None, the flow is `start`.
+    """
+    if end is None or frac == 0:
+        return start
+    if frac == 1:
+        return end
+    if isinstance(start, dict):
+        return {key: interp_flow(start[key], end[key], frac)
+                for key in start}
+    if isinstance(start, (tuple, list)):
+        return type(start)(interp_flow(start_val, end_val, frac)
+                           for start_val, end_val in zip(start, end))
+    return (1 - frac)*start + frac*end
+
+
+class TimeIntegrator(object):
+    """Base class for time integration of advection.
+
+    Each entry of `_STAGES` is (a, b, c) for a stage that is `a` times the
+    state at the start of the step plus `b` times a forward-Euler step from
+    the previous stage, with the flow at the fraction `c` of the step.
+    """
+    _STAGES = ()
+
+    def __init__(self, advec, dt, workspace=None):
+        """
+        :param advec: Function of the tracer and the flow returning the
+            advection of the tracer by the flow, e.g.
+            ``lambda arr, flow: SphereEtaBatchUpwind(*flow).advec_3d(arr)``,
+            where `flow` is (u, v, omega, pk, bk, ps).  The tracer
+            tendency is minus the advection.
+        :param float dt: Timestep.
+        :param workspace: Optional `Workspace` holding the state and stage
+            buffers.  One is created if not given.
+        """
+        self.advec = advec
+        self.dt = dt
+        self.workspace = workspace if workspace is not None else Workspace()
+
+    def _buffers(self, arr):
+        values = np.asarray(arr.values)
+        dtype = np.result_type(values, float)
+        return [self.workspace.empty(name, values.shape, dtype)
+                for name in ['integrator_state', 'integrator_stage',
+                             'integrator_tendency']]
+
+    def _step_values(self, arr, state, stage, tendency, flow_start,
+                     flow_end):
+        """Advance the values in `state` by one step, in place."""
+        np.copyto(stage, state)
+        for state_coeff, stage_coeff, frac in self._STAGES:
+            advec = self.advec(arr.copy(data=stage),
+                               interp_flow(flow_start, flow_end, frac))
+            np.multiply(np.asarray(advec.transpose(*arr.dims).values),
+                        self.dt, out=tendency)
+            stage -= tendency
+            if stage_coeff != 1:
+                stage *= stage_coeff
+            if state_coeff:
+                np.multiply(state, state_coeff, out=tendency)
+                stage += tendency
+        np.copyto(state, stage)
+
+    def step(self, arr, flow_start, flow_end=None):
+        """The tracer after one timestep.
+
+        :param arr: Tracer at the start of the step.
+        :param flow_start: Flow at the start of the step.
+        :param flow_end: Flow at the end of the step.  If not given, the
+            flow is held fixed over the step.
+        :out: Tracer at the end of the step.  Its data is a buffer of the
+            workspace, and is overwritten by later steps.
+        """
+        state, stage, tendency = self._buffers(arr)
+        np.copyto(state, np.asarray(arr.values))
+        self._step_values(arr, state, stage, tendency, flow_start, flow_end)
+        return arr.copy(data=state)
+
+    def integrate(self, arr, flows):
+        """Step the tracer through a series of flows.
+
+        The flows are read one at a time, so they can be streamed, e.g. from
+        a generator reading them from disk, and only two are held at once.
+
+        :param arr: Tracer at the time of the first flow.
+        :param flows: Iterable of the flows at successive times, `dt` apart.
+        :out: Generator of the tracer at the time of each flow after the
+            first.  Each is a view of the same buffer, so is overwritten by
+            the next; copy any that are to be kept.
+        """
+        state, stage, tendency = self._buffers(arr)
+        np.copyto(state, np.asarray(arr.values))
+        result = arr.copy(data=state)
+        flows = iter(flows)
+        flow_start = next(flows, None)
+        for flow_end in flows:
+            self._step_values(arr, state, stage, tendency, flow_start,
+                              flow_end)
+            yield result
+            flow_start = flow_end
+
+    def run(self, arr, flows):
+        """The tracer after stepping through all of the flows.
+
+        :out: As for `step`.
+        """
+        result = arr
+        for result in self.integrate(arr, flows):
+            pass
+        return result
+
+
+class ForwardEuler(TimeIntegrator):
+    """Forward Euler: first order."""
+    _STAGES = ((0., 1., 0.),)
+
+
+class SSPRK2(TimeIntegrator):
+    """Two-stage, second-order SSP Runge-Kutta (Heun's method)."""
+    _STAGES = ((0., 1., 0.), (0.5, 0.5, 1.))
+
+
+class SSPRK3(TimeIntegrator):
+    """Three-stage, third-order SSP Runge-Kutta of Shu and Osher (1988)."""
+    _STAGES = ((0., 1., 0.), (0.75, 0.25, 1.), (1/3., 2/3., 0.5))
@@ -0,0 +1,1275 @@
+"""Finite-difference derivative stencils on plain numpy arrays.
+
+These compute the same quantities as the xarray-based classes in
+`indiff.deriv`, but operate on `numpy.ndarray` data and a coordinate that is
+either 1-D along the differenced axis or broadcastable against the data.
+Results are written into an optional preallocated output array, and
+intermediate arrays are drawn from an optional
+`indiff.workspace.Workspace`, so that repeated calls on identically shaped
+data need not allocate any memory.
+"""
+from __future__ import division
+
+import functools
+
+import numpy as np
+
+
+def _index(ndim, axis, slice_):
+    """Index tuple selecting `slice_` along `axis` and everything else."""
+    index = [slice(None)] * ndim
+    index[axis] = slice_
+    return tuple(index)
+
+
+def _slice_axis(arr, axis, start=None, stop=None):
+    return arr[_index(arr.ndim, axis, slice(start, stop))]
+
+
+def _scratch(workspace, name, shape, dtype):
+    if workspace is None:
+        return np.empty(shape, dtype=dtype)
+    return workspace.empty(name, shape, dtype)
+
+
+def _out_dtype(values, coord):
+    return np.true_divide(np.ones(1, dtype=values.dtype),
+                          np.ones(1, dtype=coord.dtype)).dtype
+
+
+def _prep_out(out, values, coord, axis, length):
+    shape = list(values.shape)
+    shape[axis] = length
+    if out is None:
+        return np.empty(shape, dtype=_out_dtype(values, coord))
+    if out.shape != tuple(shape):
+        raise ValueError("Output array has shape {}; expected "
+                         "{}".format(out.shape, tuple(shape)))
+    return out
+
+
+def _prep_coord(coord, ndim, axis):
+    """Make the coordinate broadcastable against the values.
+
+    The coordinate is either 1-D along `axis` or has the same number of
+    dimensions as the values, with any non-differenced axes of length 1 or
+    matching those of the values.
+    """
+    coord = np.asarray(coord)
+    if coord.ndim == ndim:
+        return coord
+    if coord.ndim != 1:
+        raise ValueError("Coordinate must be 1-D or have the same number of "
+                         "dimensions as the values: {}".format(coord.shape))
+    shape = [1] * ndim
+    shape[axis] = coord.size
+    return coord.reshape(shape)
+
+
+def _diff(values, axis, spacing, workspace, name):
+    """values[i+spacing] - values[i] along the axis."""
+    n = values.shape[axis]
+    shape = list(values.shape)
+    shape[axis] = n - spacing
+    diff = _scratch(workspace, name, shape, values.dtype)
+    np.subtract(_slice_axis(values, axis, spacing, None),
+                _slice_axis(values, axis, None, n - spacing), out=diff)
+    return diff
+
+
+def _coord_diff(coord, axis, spacing):
+    return (_slice_axis(coord, axis, spacing, None) -
+            _slice_axis(coord, axis, None, -spacing))
+
+
+def _fwd_quotient(values, coord, axis, spacing, out, workspace, name):
+    """Forward difference quotient; length reduced by `spacing`."""
+    diff = _diff(values, axis, spacing, workspace, name)
+    return np.true_divide(diff, _coord_diff(coord, axis, spacing), out=out)
+
+
+def _cen_quotient(values, coord, axis, spacing, out, workspace, name,
+                  diff=None):
+    """Centered difference quotient; length reduced by twice `spacing`."""
+    if diff is None:
+        diff = _diff(values, axis, spacing, workspace, name + '_diff')
+    shape = list(diff.shape)
+    shape[axis] -= spacing
+    total = _scratch(workspace, name + '_sum', shape, diff.dtype)
+    np.add(_slice_axis(diff, axis, spacing, None),
+           _slice_axis(diff, axis, None, -spacing), out=total)
+    dcoord = _coord_diff(coord, axis, spacing)
+    dcoord = (_slice_axis(dcoord, axis, spacing, None) +
+              _slice_axis(dcoord, axis, None, -spacing))
+    return np.true_divide(total, dcoord, out=out)
+
+
+def _one_sided_order1(values, coord, axis, spacing, fill_edge, is_bwd, out,
+                      workspace):
+    n = values.shape[axis]
+    if not fill_edge:
+        return _fwd_quotient(values, coord, axis, spacing, out, workspace,
+                             'num1')
+    if is_bwd:
+        _fwd_quotient(values, coord, axis, spacing,
+                      _slice_axis(out, axis, spacing, None), workspace, 'num1')
+        _slice_axis(out, axis, None, spacing)[...] = _slice_axis(
+            out, axis, spacing, 2*spacing
+        )
+    else:
+        _fwd_quotient(values, coord, axis, spacing,
+                      _slice_axis(out, axis, None, n - spacing), workspace,
+                      'num1')
+        _slice_axis(out, axis, n - spacing, None)[...] = _slice_axis(
+            out, axis, n - 2*spacing, n - spacing
+        )
+    return out
+
+
+# Orders computed by the explicit formulas below, rather than by
+# `stencil_deriv`.
+_EXPLICIT_ORDERS = {'centered': (2, 4), 'forward': (1, 2),
+                    'backward': (1, 2)}
+
+
+def one_sided_deriv(values, coord, axis=-1, spacing=1, order=1,
+                    fill_edge=True, is_bwd=False, out=None, workspace=None):
+    """Derivative via forward or backward differencing.
+
+    Equivalent to `indiff.deriv.FwdDeriv` (or `BwdDeriv` if `is_bwd`).
+
+    :param numpy.ndarray values: Field to take the derivative of.
+    :param numpy.ndarray coord: Coordinate; either 1-D along `axis` or
+        broadcastable against `values`.
+    :param int axis: Axis over which to take the derivative.
+    :param int spacing: How many gridpoints over to use.
+    :param int order: Order of accuracy.  Orders other than 1 and 2 are
+        computed by `stencil_deriv`.
+    :param fill_edge: Whether to fill the edge cells lacking the neighbors
+        needed by the stencil.  If False, the output is shorter than `values`
+        along `axis` by `spacing*order`.
+    :param bool is_bwd: Use backward rather than forward differencing.
+    :param numpy.ndarray out: Optional array in which to place the result.
+    :param workspace: Optional `Workspace` from which scratch arrays are
+        drawn.
+    """
+    scheme = 'backward' if is_bwd else 'forward'
+    if order not in _EXPLICIT_ORDERS[scheme]:
+        return stencil_deriv(values, coord, axis=axis, scheme=scheme,
+                             spacing=spacing, order=order,
+                             fill_edge=fill_edge, out=out,
+                             workspace=workspace)
+    axis = axis % values.ndim
+    coord = _prep_coord(coord, values.ndim, axis)
+    n = values.shape[axis]
+    length = n if fill_edge else n - spacing*order
+    out = _prep_out(out, values, coord, axis, length)
+    if order == 1:
+        return _one_sided_order1(values, coord, axis, spacing, fill_edge,
+                                 is_bwd, out, workspace)
+    if fill_edge:
+        single = _one_sided_order1(values, coord, axis, spacing, True, is_bwd,
+                                   out, workspace)
+    else:
+        shape = list(values.shape)
+        shape[axis] = n - spacing
+        single = _one_sided_order1(
+            values, coord, axis, spacing, False, is_bwd,
+            _scratch(workspace, 'single', shape, out.dtype), workspace
+        )
+    double = _fwd_quotient(
+        values, coord, axis, 2*spacing,
+        _scratch(workspace, 'double',
+                 _slice_axis(values, axis, 2*spacing, None).shape, out.dtype),
+        workspace, 'num2'
+    )
+    if is_bwd and fill_edge:
+        single_interior = _slice_axis(single, axis, 2*spacing, None)
+        interior = _slice_axis(out, axis, 2*spacing, None)
+    elif is_bwd:
+        single_interior = _slice_axis(single, axis, spacing, None)
+        interior = out
+    else:
+        single_interior = _slice_axis(single, axis, None, n - 2*spacing)
+        interior = _slice_axis(out, axis, None, n - 2*spacing)
+    np.multiply(single_interior, 2, out=interior)
+    np.subtract(interior, double, out=interior)
+    return out
+
+
+def _cen_order2(values, coord, axis, spacing, fill_edge, out, workspace):
+    n = values.shape[axis]
+    diff = _diff(values, axis, spacing, workspace, 'num1_diff')
+    if not fill_edge:
+        return _cen_quotient(values, coord, axis, spacing, out, workspace,
+                             'num1', diff=diff)
+    _cen_quotient(values, coord, axis, spacing,
+                  _slice_axis(out, axis, spacing, n - spacing), workspace,
+                  'num1', diff=diff)
+    # Edges use one-sided differencing spanning a single spacing.
+    dcoord = _coord_diff(coord, axis, spacing)
+    np.true_divide(_slice_axis(diff, axis, None, spacing),
+                   _slice_axis(dcoord, axis, None, spacing),
+                   out=_slice_axis(out, axis, None, spacing))
+    np.true_divide(_slice_axis(diff, axis, n - 2*spacing, None),
+                   _slice_axis(dcoord, axis, n - 2*spacing, None),
+                   out=_slice_axis(out, axis, n - spacing, None))
+    return out
+
+
+def cen_deriv(values, coord, axis=-1, spacing=1, order=2, fill_edge=True,
+              out=None, workspace=None):
+    """Derivative via centered differencing.
+
+    Equivalent to `indiff.deriv.CenDeriv`.
+
+    :param numpy.ndarray values: Field to take the derivative of.
+    :param numpy.ndarray coord: Coordinate; either 1-D along `axis` or
+        broadcastable against `values`.
+    :param int axis: Axis over which to take the derivative.
+    :param int spacing: How many gridpoints over to use.
+    :param int order: Order of accuracy.  Even orders other than 2 and 4
+        are computed by `stencil_deriv`.
+    :param fill_edge: Whether to fill the edge cells lacking the neighbors
+        needed by the stencil, using lower order differencing.  If False,
+        the output is shorter than `values` along `axis` by `spacing*order`.
+    :param numpy.ndarray out: Optional array in which to place the result.
+    :param workspace: Optional `Workspace` from which scratch arrays are
+        drawn.
+    """
+    if order not in _EXPLICIT_ORDERS['centered']:
+        return stencil_deriv(values, coord, axis=axis, scheme='centered',
+                             spacing=spacing, order=order,
+                             fill_edge=fill_edge, out=out,
+                             workspace=workspace)
+    axis = axis % values.ndim
+    coord = _prep_coord(coord, values.ndim, axis)
+    n = values.shape[axis]
+    length = n if fill_edge else n - spacing*order
+    out = _prep_out(out, values, coord, axis, length)
+    if order == 2:
+        return _cen_order2(values, coord, axis, spacing, fill_edge, out,
+                           workspace)
+    if fill_edge:
+        single = _cen_order2(values, coord, axis, spacing, True, out,
+                             workspace)
+        single_interior = _slice_axis(single, axis, 2*spacing, n - 2*spacing)
+        interior = _slice_axis(out, axis, 2*spacing, n - 2*spacing)
+    else:
+        shape = list(values.shape)
+        shape[axis] = n - 2*spacing
+        single = _cen_order2(
+            values, coord, axis, spacing, False,
+            _scratch(workspace, 'single_cen', shape, out.dtype), workspace
+        )
+        single_interior = _slice_axis(single, axis, spacing, n - 3*spacing)
+        interior = out
+    double = _cen_quotient(
+        values, coord, axis, 2*spacing,
+        _scratch(workspace, 'double_cen', interior.shape, out.dtype),
+        workspace, 'num2'
+    )
+    np.multiply(single_interior, 4, out=interior)
+    np.subtract(interior, double, out=interior)
+    np.true_divide(interior, 3, out=interior)
+    return out
+
+
+def _gather(arr, index, axis, pos):
+    index = list(index)
+    index[axis] = pos
+    return arr[tuple(index)]
+
+
+def cen_deriv_at(values, coord, index, axis=-1, spacing=1, order=2,
+                 fill_edge=True, period=None, factor=None):
+    """Centered differencing derivative at individual points.
+
+    Equivalent to indexing the output of `cen_deriv` at `index`, but only
+    the neighbors of the requested points are accessed, so the cost scales
+    with the number of points rather than with the size of `values`.
+
+    :param numpy.ndarray values: Field to take the derivative of.
+    :param numpy.ndarray coord: Coordinate; either 1-D along `axis` or
+        broadcastable against `values`.
+    :param index: Tuple of integer arrays, one per axis of `values`, that are
+        broadcast against one another as in numpy advanced indexing.
+    :param int axis: Axis over which to take the derivative.
+    :param int spacing: How many gridpoints over to use.
+    :param int order: Order of accuracy.  Even orders other than 2 and 4
+        use the weights of `stencil_weights`.
+    :param fill_edge: Whether to fill the edge cells lacking the neighbors
+        needed by the stencil, as `cen_deriv` does.  If False, such points
+        are NaN.
+    :param period: If given, the axis is cyclic, with the coordinate
+        increasing by `period` each time around.
+    :param factor: Optional array broadcastable against `values` by which
+        the values are multiplied before differencing.
+    """
+    offsets = _stencil_offsets('centered', spacing, order)
+    axis = axis % values.ndim
+    coord = np.broadcast_to(_prep_coord(coord, values.ndim, axis),
+                            values.shape)
+    if factor is not None:
+        factor = np.broadcast_to(factor, values.shape)
+    n = values.shape[axis]
+    index = tuple(np.asarray(ind) for ind in index)
+    pos = np.where(index[axis] < 0, index[axis] + n, index[axis])
+    if np.any((pos < 0) | (pos >= n)):
+        raise IndexError("Index out of bounds for axis of length "
+                         "{}".format(n))
+
+    def at(offset):
+        shifted = pos + offset
+        if period is None:
+            shifted = np.clip(shifted, 0, n - 1)
+            wraps = None
+        else:
+            wraps = shifted // n
+            shifted = shifted % n
+        vals = _gather(values, index, axis, shifted)
+        if factor is not None:
+            vals = vals * _gather(factor, index, axis, shifted)
+        coords = _gather(coord, index, axis, shifted)
+        if period is not None:
+            coords = coords + period*wraps
+        return vals, coords
+
+    def quotient(lower, upper):
+        vals_lower, coord_lower = at(lower)
+        vals_upper, coord_upper = at(upper)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (vals_upper - vals_lower) / (coord_upper - coord_lower)
+
+    cyclic = period is not None
+    if order not in _EXPLICIT_ORDERS['centered']:
+        if not cyclic and n < spacing*order + 1:
+            raise ValueError("Too few points ({}) for a stencil of order {} "
+                             "and spacing {}".format(n, order, spacing))
+        shift = 0
+        if not cyclic:
+            # Stencils are shifted within the data, as by `stencil_weights`.
+            below = np.maximum(-(pos + offsets[0]), 0)
+            above = np.maximum(pos + offsets[-1] - (n - 1), 0)
+            shift = spacing*(-(-below // spacing) + (-above // spacing))
+        vals, coords = zip(*[at(offset + shift) for offset in offsets])
+        weights = fornberg_weights(np.stack(coords) - at(0)[1])
+        deriv = (weights*np.stack(vals)).sum(axis=0)
+    elif cyclic:
+        deriv = quotient(-spacing, spacing)
+    else:
+        # Edges use one-sided differencing spanning a single spacing.
+        deriv = quotient(np.where(pos < spacing, 0, -spacing),
+                         np.where(pos >= n - spacing, 0, spacing))
+    if order == 4:
+        interior = cyclic | ((pos >= 2*spacing) & (pos < n - 2*spacing))
+        double = quotient(-2*spacing, 2*spacing)
+        deriv = np.where(interior, (4*deriv - double) / 3, deriv)
+    if not (fill_edge or cyclic):
+        pad = spacing*(order // 2)
+        deriv = np.where((pos < pad) | (pos >= n - pad), np.nan, deriv)
+    return deriv
+
+
+def column_weights(coord, axis=-1, scheme='centered', spacing=1, order=2,
+                   fill_edge=True):
+    """Weights of the differencing stencil at each point, for a coordinate
+    that may vary across the other axes, e.g. height in every column.
+
+    Differencing is linear in the data, and its stencils reach at most
+    `reach` points either side, so applying it to data that is 1 at every
+    `2*reach + 1`-th point and 0 elsewhere yields, at each point, the weight
+    of exactly one of its neighbors.  All such residues are differenced at
+    once, by a single call to `cen_deriv` or `one_sided_deriv` over a stacked
+    leading axis, so that the weights of every column are computed in one
+    vectorized pass and match those functions exactly, including at the
+    edges.  For the orders those functions compute by `stencil_deriv`, its
+    weights are returned directly.
+
+    :param numpy.ndarray coord: Coordinate values.
+    :param int axis: Axis of the coordinate over which to difference.
+    :param str scheme: 'centered', 'forward', or 'backward'.
+    :out: Offsets of the stencil's points, an array of shape
+        (len(offsets),) + the output's shape, the coordinate's other axes
+        kept as they are, of their weights at each output point, and the
+        position along the axis of the first output point.  Where an offset
+        reaches beyond the coordinate its weight is zero.
+    """
+    if order not in _EXPLICIT_ORDERS.get(scheme, (order,)):
+        return stencil_weights(coord, axis=axis, scheme=scheme,
+                               spacing=spacing, order=order,
+                               fill_edge=fill_edge)
+    coord = np.asarray(coord, dtype=float)
+    axis = axis % coord.ndim
+    n = coord.shape[axis]
+    kwargs = dict(axis=axis + 1, spacing=spacing, order=order,
+                  fill_edge=fill_edge)
+    if scheme == 'centered':
+        kernel = cen_deriv
+        reach = spacing*(order // 2)
+        start = 0 if fill_edge else reach
+    elif scheme in ('forward', 'backward'):
+        is_bwd = scheme == 'backward'
+        kernel = functools.partial(one_sided_deriv, is_bwd=is_bwd)
+        reach = spacing*order
+        start = reach if (is_bwd and not fill_edge) else 0
+    else:
+        raise ValueError("Unknown differencing scheme '{}'".format(scheme))
+    period = 2*reach + 1
+    shape = [1]*(coord.ndim + 1)
+    shape[0] = period
+    shape[axis + 1] = n
+    positions = np.arange(n) % period
+    indicators = (positions[np.newaxis] ==
+                  np.arange(period)[:, np.newaxis]).astype(float)
+    indicators = np.broadcast_to(indicators.reshape(shape),
+                                 (period,) + coord.shape)
+    by_residue = kernel(indicators, coord[np.newaxis], **kwargs)
+
+    length = by_residue.shape[axis + 1]
+    shape[0] = 1
+    shape[axis + 1] = length
+    offsets, weights = [], []
+    for offset in range(-reach, reach + 1):
+        residues = (np.arange(length) + start + offset) % period
+        weight = np.take_along_axis(by_residue, residues.reshape(shape),
+                                    axis=0)[0]
+        if np.any(weight):
+            offsets.append(offset)
+            weights.append(weight)
+    return tuple(offsets), np.stack(weights), start
+
+
+def level_weights(coord, scheme='centered', spacing=1, order=2,
+                  fill_edge=True):
+    """Weights of the differencing stencil at each point of a fixed 1-D
+    coordinate.
+
+    Differencing is linear in the data, so the derivative along a coordinate
+    that is the same for every call, e.g. pressure levels, is a weighted sum
+    of neighboring values whose weights can be computed once and reused.
+
+    :param numpy.ndarray coord: 1-D coordinate values.
+    :param str scheme: 'centered', 'forward', or 'backward'.
+    :out: As for `column_weights`, the weights being of shape
+        (len(offsets), length).
+    """
+    coord = np.asarray(coord, dtype=float)
+    if coord.ndim != 1:
+        raise ValueError("Levels must be 1-D: {}".format(coord.shape))
+    return column_weights(coord, axis=0, scheme=scheme, spacing=spacing,
+                          order=order, fill_edge=fill_edge)
+
+
+def apply_level_weights(values, offsets, weights, start=0, axis=-1,
+                        out=None, workspace=None):
+    """Derivative as the weighted sum given by `level_weights`.
+
+    :param numpy.ndarray values: Field to take the derivative of.
+    :param offsets: Offsets of the stencil's points.
+    :param numpy.ndarray weights: Their weights at each output point;
+        either 1-D along the axis, or with the same number of dimensions as
+        the values and broadcastable against them.
+    :param int start: Position of the first output point along the axis.
+    :param int axis: Axis over which to take the derivative.
+    :param numpy.ndarray out: Optional array in which to place the result.
+    :param workspace: Optional `Workspace` from which scratch arrays are
+        drawn.
+    """
+    axis = axis % values.ndim
+    n = values.shape[axis]
+    length = weights.shape[axis + 1 if weights.ndim > 2 else 1]
+    if n < start + length:
+        raise ValueError("Data has {} points along the axis; the weights "
+                         "require {}".format(n, start + length))
+    out = _prep_out(out, values, weights, axis, length)
+    out.fill(0)
+    shape = [1] * values.ndim
+    for offset, weight in zip(offsets, weights):
+        first = max(0, -(start + offset))
+        last = min(length, n - (start + offset))
+        if last <= first:
+            continue
+        shape[axis] = last - first
+        region = _slice_axis(out, axis, first, last)
+        if weight.ndim == 1:
+            weight = weight[first:last].reshape(shape)
+        else:
+            weight = _slice_axis(weight, axis, first, last)
+        term = _scratch(workspace, 'level_term', region.shape, out.dtype)
+        np.multiply(_slice_axis(values, axis, start + offset + first,
+                                start + offset + last), weight, out=term)
+        np.add(region, term, out=region)
+    return out
+
+
+def fornberg_weights(nodes, target=0., deriv=1):
+    """Finite-difference weights for arbitrarily spaced points.
+
+    Uses the recursion of Fornberg (1988), which is exact, i.e. the weights
+    differentiate polynomials of degree less than the number of points
+    exactly, and which is stable for stencils of many points.
+
+    :param numpy.ndarray nodes: Positions of the stencil's points, indexed
+        along the first axis, and otherwise broadcastable against `target`,
+        so that the weights of many stencils are computed at once.
+    :param target: Position at which to take the derivative.
+    :param int deriv: Order of the derivative.
+    :out: Weights, indexed like `nodes`.
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    num_points = len(nodes)
+    shape = np.broadcast(nodes[0], target).shape
+    coeffs = np.zeros((deriv + 1, num_points) + shape)
+    coeffs[0, 0] = 1.
+    prod_prev = np.ones(shape)
+    dist = nodes[0] - target
+    for i in range(1, num_points):
+        num_derivs = min(i, deriv)
+        prod = np.ones(shape)
+        dist_prev, dist = dist, nodes[i] - target
+        for j in range(i):
+            gap = nodes[i] - nodes[j]
+            prod = prod*gap
+            if j == i - 1:
+                for k in range(num_derivs, 0, -1):
+                    coeffs[k, i] = prod_prev*(k*coeffs[k - 1, i - 1] -
+                                              dist_prev*coeffs[k, i - 1]
+                                              ) / prod
+                coeffs[0, i] = -prod_prev*dist_prev*coeffs[0, i - 1] / prod
+            for k in range(num_derivs, 0, -1):
+                coeffs[k, j] = (dist*coeffs[k, j] -
+                                k*coeffs[k - 1, j]) / gap
+            coeffs[0, j] = dist*coeffs[0, j] / gap
+        prod_prev = prod
+    return coeffs[deriv]
+
+
+def _stencil_offsets(scheme, spacing, order):
+    if scheme == 'centered':
+        if order < 2 or order % 2:
+            raise ValueError("Centered differencing requires an even order: "
+                             "{}".format(order))
+        return spacing*np.arange(-(order // 2), order // 2 + 1)
+    if order < 1:
+        raise ValueError("Order must be positive: {}".format(order))
+    if scheme == 'forward':
+        return spacing*np.arange(order + 1)
+    if scheme == 'backward':
+        return spacing*np.arange(-order, 1)
+    raise ValueError("Unknown differencing scheme '{}'".format(scheme))
+
+
+def stencil_weights(coord, axis=-1, scheme='centered', spacing=1, order=2,
+                    fill_edge=True):
+    """Weights of the differencing stencil of any order at each point.
+
+    The stencils span `order + 1` points, `spacing` apart, and their weights
+    are exact for the coordinate's actual spacing, however non-uniform.  If
+    `fill_edge`, a stencil that would reach beyond the data is instead
+    shifted to lie within it, or for one-sided differencing reversed, so
+    that the order of accuracy is the same at every point.
+
+    :param numpy.ndarray coord: Coordinate values.
+    :param int axis: Axis of the coordinate over which to difference.
+    :param str scheme: 'centered', 'forward', or 'backward'.
+    :out: As for `column_weights`, to be applied by `apply_level_weights`.
+    """
+    offsets = _stencil_offsets(scheme, spacing, order)
+    coord = np.moveaxis(np.asarray(coord, dtype=float), axis % np.ndim(coord),
+                        0)
+    n = len(coord)
+    reach = -offsets[0] if scheme != 'forward' else 0
+    start = 0 if fill_edge else reach
+    length = n if fill_edge else n - spacing*order
+    positions = start + np.arange(length)
+    offsets = offsets[:, np.newaxis] + np.zeros(length, dtype=int)
+    if fill_edge and scheme == 'centered':
+        below = np.maximum(-(positions + offsets[0]), 0)
+        above = np.maximum(positions + offsets[-1] - (n - 1), 0)
+        # Shift by whole spacings, i.e. ceil(below / spacing) of them.
+        offsets = offsets + spacing*(-(-below // spacing) +
+                                     (-above // spacing))
+    elif fill_edge:
+        beyond = ((positions + offsets.min(axis=0) < 0) |
+                  (positions + offsets.max(axis=0) > n - 1))
+        offsets = np.where(beyond, -offsets[::-1], offsets)
+    points = positions + offsets
+    if length < 1 or points.min() < 0 or points.max() > n - 1:
+        raise ValueError("Too few points ({}) for a stencil of order {} and "
+                         "spacing {}".format(n, order, spacing))
+    weights = fornberg_weights(coord[points] - coord[positions], deriv=1)
+
+    unique = np.unique(offsets)
+    stacked = np.zeros((len(unique),) + weights.shape[1:])
+    for point_offsets, point_weights in zip(offsets, weights):
+        stacked[np.searchsorted(unique, point_offsets),
+                np.arange(length)] = point_weights
+    return (tuple(int(offset) for offset in unique),
+            np.moveaxis(stacked, 1, axis % coord.ndim + 1), start)
+
+
+def stencil_deriv(values, coord, axis=-1, scheme='centered', spacing=1,
+                  order=2, fill_edge=True, out=None, workspace=None):
+    """Derivative of any order of accuracy, in a single weighted sum.
+
+    The weights are from `stencil_weights`, so are exact for a non-uniform
+    coordinate, and the edges, if filled, are of the same order as the
+    interior.
+
+    :param numpy.ndarray values: Field to take the derivative of.
+    :param numpy.ndarray coord: Coordinate; either 1-D along `axis` or
+        broadcastable against `values`.
+    :param str scheme: 'centered', 'forward', or 'backward'.
+    :param int order: Order of accuracy; even if centered.
+
+    Other arguments are as for `cen_deriv`.
+    """
+    axis = axis % values.ndim
+    coord = _prep_coord(coord, values.ndim, axis)
+    offsets, weights, start = stencil_weights(
+        coord, axis=axis, scheme=scheme, spacing=spacing, order=order,
+        fill_edge=fill_edge
+    )
+    return apply_level_weights(values, offsets, weights, start=start,
+                               axis=axis, out=out, workspace=workspace)
+
+
+# Stencils that masked differencing can choose among at each point, keyed by
+# name, with the number of spacings each extends to the left and right.
+STENCIL_NAMES = ('none', 'cen4', 'cen2', 'fwd2', 'bwd2', 'fwd1', 'bwd1')
+_STENCIL_EXTENTS = {
+    'cen4': (2, 2),
+    'cen2': (1, 1),
+    'fwd2': (0, 2),
+    'bwd2': (2, 0),
+    'fwd1': (0, 1),
+    'bwd1': (1, 0),
+}
+_STENCIL_PREFERENCES = {
+    ('centered', 4): ('cen4', 'cen2', 'fwd2', 'bwd2', 'fwd1', 'bwd1'),
+    ('centered', 2): ('cen2', 'fwd2', 'bwd2', 'fwd1', 'bwd1'),
+    ('forward', 2): ('fwd2', 'fwd1', 'bwd2', 'bwd1'),
+    ('forward', 1): ('fwd1', 'bwd1'),
+    ('backward', 2): ('bwd2', 'bwd1', 'fwd2', 'fwd1'),
+    ('backward', 1): ('bwd1', 'fwd1'),
+}
+
+
+def stencil_preference(scheme, order):
+    """Stencils to try, most preferred first, for the given scheme."""
+    try:
+        return _STENCIL_PREFERENCES[(scheme, order)]
+    except KeyError:
+        raise ValueError("No masked stencils for scheme '{}' with order "
+                         "{}".format(scheme, order))
+
+
+def _shifted(valid, axis, offset):
+    """valid[i+offset] along the axis, False beyond the array's edges."""
+    shifted = np.zeros_like(valid)
+    n = valid.shape[axis]
+    if abs(offset) >= n:
+        return shifted
+    if offset > 0:
+        _slice_axis(shifted, axis, None, n - offset)[...] = _slice_axis(
+            valid, axis, offset, None
+        )
+    else:
+        _slice_axis(shifted, axis, -offset, None)[...] = _slice_axis(
+            valid, axis, None, n + offset
+        )
+    return shifted
+
+
+def stencil_codes(mask, axis, spacing, stencils):
+    """Index into `STENCIL_NAMES` of the stencil to use at each point.
+
+    At each unmasked point, the first of `stencils` whose points are all
+    unmasked and within the array is chosen.  Masked points, and points for
+    which no stencil qualifies, get code 0 ('none').
+
+    :param numpy.ndarray mask: Boolean array, True where data is missing.
+    :param int axis: Axis over which the derivative is taken.
+    :param int spacing: How many gridpoints over the stencils use.
+    :param stencils: Names of the stencils, most preferred first.
+    """
+    valid = ~np.asarray(mask, dtype=bool)
+    codes = np.zeros(valid.shape, dtype=np.int8)
+    unassigned = valid.copy()
+    neighbors = {}
+    for name in stencils:
+        left, right = _STENCIL_EXTENTS[name]
+        usable = unassigned.copy()
+        for offset in list(range(-left, 0)) + list(range(1, right + 1)):
+            if offset not in neighbors:
+                neighbors[offset] = _shifted(valid, axis, offset*spacing)
+            usable &= neighbors[offset]
+        codes[usable] = STENCIL_NAMES.index(name)
+        unassigned &= ~usable
+    return codes
+
+
+def _stencil_deriv(name, values, coord, axis, spacing, out, workspace):
+    order = int(name[-1])
+    if name.startswith('cen'):
+        return cen_deriv(values, coord, axis=axis, spacing=spacing,
+                         order=order, fill_edge=False, out=out,
+                         workspace=workspace)
+    return one_sided_deriv(values, coord, axis=axis, spacing=spacing,
+                           order=order, fill_edge=False,
+                           is_bwd=name.startswith('bwd'), out=out,
+                           workspace=workspace)
+
+
+def masked_deriv(values, coord, selectors, axis=-1, spacing=1, out=None,
+                 workspace=None):
+    """Derivative using a different stencil at each point.
+
+    Each stencil in use is evaluated once over the whole array, and its
+    values are copied into the output only at the points it was selected
+    for.  Points not selected by any stencil are NaN.
+
+    :param numpy.ndarray values: Field to take the derivative of.
+    :param numpy.ndarray coord: Coordinate; either 1-D along `axis` or
+        broadcastable against `values`.
+    :param dict selectors: Maps stencil names to boolean arrays, with the
+        same number of dimensions as and broadcastable against `values`,
+        that are True where that stencil is to be used.
+    :param int axis: Axis over which to take the derivative.
+    :param int spacing: How many gridpoints over to use.
+    :param numpy.ndarray out: Optional array in which to place the result.
+    :param workspace: Optional `Workspace` from which scratch arrays are
+        drawn.
+    """
+    axis = axis % values.ndim
+    coord = _prep_coord(coord, values.ndim, axis)
+    n = values.shape[axis]
+    out = _prep_out(out, values, coord, axis, n)
+    out.fill(np.nan)
+    for name, selector in selectors.items():
+        left, right = _STENCIL_EXTENTS[name]
+        start, stop = left*spacing, n - right*spacing
+        region = _slice_axis(out, axis, start, stop)
+        result = _stencil_deriv(
+            name, values, coord, axis, spacing,
+            _scratch(workspace, 'masked_' + name, region.shape, out.dtype),
+            workspace
+        )
+        np.copyto(region, result,
+                  where=_slice_axis(selector, axis, start, stop))
+    return out
+
+
+def flux_div(values, flow, widths, axis=-1, face_factor=None,
+             scheme='upwind', cyclic=False, out=None):
+    """Divergence of the flux of a field by a flow, in finite-volume form.
+
+    Each point is the center of a cell, with faces between neighboring
+    points.  The flow at each face is the mean of that at its two
+    neighbors, and the field there is either that of the upstream neighbor
+    ('upwind') or their mean ('centered').  As each face's flux leaves one
+    cell and enters the next, the sum over the cells of the divergence
+    times their widths is zero to round-off: the flux through the edges of
+    the domain is zero, unless it is cyclic.
+
+    :param numpy.ndarray values: Field being advected.
+    :param numpy.ndarray flow: Flow, with the same shape as `values`.
+    :param numpy.ndarray widths: Sizes of the cells; either 1-D along
+        `axis` or broadcastable against `values`.
+    :param int axis: Axis along which to take the divergence.
+    :param numpy.ndarray face_factor: Optional factor multiplying the flux
+        at each face, e.g. the cosine of latitude.  Either 1-D along `axis`
+        or broadcastable against `values`, with one point per face: one
+        fewer than `values` along `axis`, or as many if cyclic, the last
+        face then joining the last point to the first.
+    :param str scheme: 'upwind' or 'centered'.
+    :param bool cyclic: Whether the axis is cyclic.
+    :param numpy.ndarray out: Optional array in which to place the result.
+    """
+    axis = axis % values.ndim
+    n = values.shape[axis]
+    widths = _prep_coord(widths, values.ndim, axis)
+    if cyclic:
+        lower_values, upper_values = values, np.roll(values, -1, axis=axis)
+        lower_flow, upper_flow = flow, np.roll(flow, -1, axis=axis)
+    else:
+        lower_values = _slice_axis(values, axis, None, n - 1)
+        upper_values = _slice_axis(values, axis, 1, None)
+        lower_flow = _slice_axis(flow, axis, None, n - 1)
+        upper_flow = _slice_axis(flow, axis, 1, None)
+    flux = 0.5*(lower_flow + upper_flow)
+    if scheme == 'upwind':
+        flux *= np.where(flux >= 0, lower_values, upper_values)
+    elif scheme == 'centered':
+        flux *= 0.5*(lower_values + upper_values)
+    else:
+        raise ValueError("Unknown flux scheme '{}'".format(scheme))
+    if face_factor is not None:
+        flux *= _prep_coord(face_factor, values.ndim, axis)
+
+    out = _prep_out(out, values, widths, axis, n)
+    if cyclic:
+        np.subtract(flux, np.roll(flux, 1, axis=axis), out=out)
+    else:
+        out.fill(0)
+        _slice_axis(out, axis, None, n - 1)[...] += flux
+        _slice_axis(out, axis, 1, None)[...] -= flux
+    return np.true_divide(out, widths, out=out)
+
+
+def flux_div_coeffs(flow, widths, axis=-1, scheme='upwind'):
+    """Coefficients of the tridiagonal matrix applying `flux_div`.
+
+    The divergence at each point is `lower` times the field at the point
+    before it, plus `diag` times that at the point, plus `upper` times that
+    at the point after it, along a non-cyclic axis.  `lower` is zero at the
+    first point and `upper` at the last.
+
+    :param numpy.ndarray flow: Flow, with the points along `axis`.
+    :param numpy.ndarray widths: Sizes of the cells, as for `flux_div`.
+    :param int axis: Axis along which the divergence is taken.
+    :param str scheme: 'upwind' or 'centered'.
+    :out: lower, diag, upper, each with the shape of `flow`.
+    """
+    axis = axis % flow.ndim
+    n = flow.shape[axis]
+    face_flow = 0.5*(_slice_axis(flow, axis, None, n - 1) +
+                     _slice_axis(flow, axis, 1, None))
+    # The flux through each face, per unit field at the points either side.
+    if scheme == 'upwind':
+        from_lower = np.maximum(face_flow, 0)
+        from_upper = np.minimum(face_flow, 0)
+    elif scheme == 'centered':
+        from_lower = from_upper = 0.5*face_flow
+    else:
+        raise ValueError("Unknown flux scheme '{}'".format(scheme))
+    lower, diag, upper = [np.zeros(flow.shape, dtype=face_flow.dtype)
+                          for _ in range(3)]
+    _slice_axis(lower, axis, 1, None)[...] = -from_lower
+    _slice_axis(diag, axis, None, n - 1)[...] += from_lower
+    _slice_axis(diag, axis, 1, None)[...] -= from_upper
+    _slice_axis(upper, axis, None, n - 1)[...] = from_upper
+    widths = _prep_coord(widths, flow.ndim, axis)
+    return lower / widths, diag / widths, upper / widths
+
+
+def _minmod(r):
+    return np.maximum(0, np.minimum(1, r))
+
+
+def _van_leer(r):
+    abs_r = np.abs(r)
+    return (r + abs_r) / (1 + abs_r)
+
+
+def _superbee(r):
+    return np.maximum(0, np.maximum(np.minimum(2*r, 1), np.minimum(r, 2)))
+
+
+def _mc(r):
+    return np.maximum(0, np.minimum(np.minimum(2*r, 0.5*(1 + r)), 2))
+
+
+LIMITERS = {'minmod': _minmod, 'van_leer': _van_leer, 'superbee': _superbee,
+            'mc': _mc}
+
+
+def _ratio(num, den):
+    """Ratio of successive jumps, zero where the denominator is."""
+    return np.divide(num, den, out=np.zeros_like(num), where=den != 0)
+
+
+def _face_stencil(values, axis, reach, cyclic):
+    """The field at each of the points around each face.
+
+    :out: List of `2*reach` arrays along `axis`, one per face, the first
+        being the field `reach` points upstream (for positive flow) of each
+        face and the last `reach` points downstream.  Beyond the edges of a
+        non-cyclic axis, the field is extrapolated linearly.
+    """
+    num_faces = values.shape[axis] - (0 if cyclic else 1)
+    pad = [(0, 0)] * values.ndim
+    if cyclic:
+        pad[axis] = (reach - 1, reach)
+        padded = np.pad(values, pad, mode='wrap')
+    else:
+        pad[axis] = (reach - 1, reach - 1)
+        padded = np.pad(values, pad, mode='reflect', reflect_type='odd')
+    return [_slice_axis(padded, axis, start, start + num_faces)
+            for start in range(2*reach)]
+
+
+def _as_float(values):
+    return np.asarray(values, dtype=np.result_type(values, float))
+
+
+def limited_faces(values, axis=-1, limiter='minmod', cyclic=False):
+    """Flux-limited values at the faces between neighboring points.
+
+    Each face's value is reconstructed from the two points upstream of it
+    and the one downstream, as the upstream value plus the limited fraction
+    of the jump across the face.  Beyond the edges of a non-cyclic axis, the
+    field is extrapolated linearly to give the missing upstream points.
+
+    :param numpy.ndarray values: Field being advected.
+    :param int axis: Axis along which to reconstruct.
+    :param str limiter: One of 'minmod', 'van_leer', 'superbee', or 'mc'.
+    :param bool cyclic: Whether the axis is cyclic.
+    :out: The face values for positive flow and for negative flow.  There
+        is one face per point if cyclic, the last joining the last point to
+        the first; otherwise one fewer.
+    """
+    try:
+        phi = LIMITERS[limiter]
+    except KeyError:
+        raise ValueError("Limiter must be one of {}: "
+                         "'{}'".format(sorted(LIMITERS), limiter))
+    values = _as_float(values)
+    q_up2, q_up, q_down, q_down2 = _face_stencil(values, axis % values.ndim,
+                                                 2, cyclic)
+    jump = q_down - q_up
+    pos = q_up + 0.5*phi(_ratio(q_up - q_up2, jump))*jump
+    neg = q_down - 0.5*phi(_ratio(q_down2 - q_down, jump))*jump
+    return pos, neg
+
+
+def _upwind3(q_up2, q_up, q_down):
+    return (2*q_down + 5*q_up - q_up2) / 6.
+
+
+def upwind3_faces(values, axis=-1, cyclic=False):
+    """Third-order upwind-biased values at the faces between points.
+
+    Differencing these across each point gives the third-order upwind
+    derivative.  Arguments and output are as for `limited_faces`.
+    """
+    values = _as_float(values)
+    q_up2, q_up, q_down, q_down2 = _face_stencil(values, axis % values.ndim,
+                                                 2, cyclic)
+    return _upwind3(q_up2, q_up, q_down), _upwind3(q_down2, q_down, q_up)
+
+
+_WENO5_EPS = 1e-6
+
+
+def _weno5(q_up3, q_up2, q_up, q_down, q_down2):
+    """WENO5 reconstruction of Jiang and Shu (1996) from upstream."""
+    smooth_0 = (13/12.*(q_up3 - 2*q_up2 + q_up)**2 +
+                0.25*(q_up3 - 4*q_up2 + 3*q_up)**2)
+    smooth_1 = (13/12.*(q_up2 - 2*q_up + q_down)**2 +
+                0.25*(q_up2 - q_down)**2)
+    smooth_2 = (13/12.*(q_up - 2*q_down + q_down2)**2 +
+                0.25*(3*q_up - 4*q_down + q_down2)**2)
+    weight_0 = 0.1 / (_WENO5_EPS + smooth_0)**2
+    weight_1 = 0.6 / (_WENO5_EPS + smooth_1)**2
+    weight_2 = 0.3 / (_WENO5_EPS + smooth_2)**2
+    return (weight_0*(2*q_up3 - 7*q_up2 + 11*q_up) +
+            weight_1*(-q_up2 + 5*q_up + 2*q_down) +
+            weight_2*(2*q_up + 5*q_down - q_down2)) / (
+                6.*(weight_0 + weight_1 + weight_2))
+
+
+def weno5_faces(values, axis=-1, cyclic=False):
+    """Fifth-order WENO values at the faces between points.
+
+    Each is the combination of the three third-order reconstructions from
+    the points around the face, weighted so as to be fifth-order accurate
+    where the field is smooth and to ignore the stencils containing any
+    discontinuity.  Arguments and output are as for `limited_faces`.
+    """
+    values = _as_float(values)
+    q_m2, q_m1, q_0, q_1, q_2, q_3 = _face_stencil(
+        values, axis % values.ndim, 3, cyclic
+    )
+    return (_weno5(q_m2, q_m1, q_0, q_1, q_2),
+            _weno5(q_3, q_2, q_1, q_0, q_m1))
+
+
+RECONSTRUCTIONS = {'upwind3': upwind3_faces, 'weno5': weno5_faces}
+
+
+def _face_derivs(faces, values, coord, axis, cyclic, circumf):
+    """Derivatives from the differences of face values across each point."""
+    n = values.shape[axis]
+    coord = _prep_coord(coord, values.ndim, axis)
+    if cyclic:
+        widths = 0.5*(np.roll(coord, -1, axis=axis) -
+                      np.roll(coord, 1, axis=axis))
+        _slice_axis(widths, axis, 0, 1)[...] += 0.5*circumf
+        _slice_axis(widths, axis, n - 1, n)[...] += 0.5*circumf
+        return tuple((face - np.roll(face, 1, axis=axis)) / widths
+                     for face in faces)
+    widths = 0.5*(_slice_axis(coord, axis, 2, None) -
+                  _slice_axis(coord, axis, None, n - 2))
+    derivs = []
+    for face in faces:
+        deriv = np.empty(np.broadcast(values, coord).shape,
+                         dtype=values.dtype)
+        _slice_axis(deriv, axis, 1, n - 1)[...] = (
+            _slice_axis(face, axis, 1, None) -
+            _slice_axis(face, axis, None, n - 2)
+        ) / widths
+        for edge, (lower, upper) in [(0, (0, 1)), (n - 1, (n - 2, n - 1))]:
+            _slice_axis(deriv, axis, edge, edge + 1)[...] = (
+                (_slice_axis(values, axis, upper, upper + 1) -
+                 _slice_axis(values, axis, lower, lower + 1)) /
+                (_slice_axis(coord, axis, upper, upper + 1) -
+                 _slice_axis(coord, axis, lower, lower + 1))
+            )
+        derivs.append(deriv)
+    return tuple(derivs)
+
+
+def tvd_derivs(values, coord, axis=-1, limiter='minmod', cyclic=False,
+               circumf=0.):
+    """Flux-limited upwind derivatives for positive and for negative flow.
+
+    Each is the difference across each point of the face values from
+    `limited_faces`, divided by the distance between the midpoints to its
+    neighbors.  If not cyclic, both derivatives at either edge are
+    first-order one-sided differences into the domain.
+
+    :param numpy.ndarray values: Field being advected.
+    :param numpy.ndarray coord: Coordinate; either 1-D along `axis` or
+        broadcastable against `values`.
+    :param float circumf: Span of the coordinate, if cyclic.
+    :out: The derivatives for positive and for negative flow, each with the
+        shape of `values`.
+    """
+    values = _as_float(values)
+    axis = axis % values.ndim
+    faces = limited_faces(values, axis=axis, limiter=limiter, cyclic=cyclic)
+    return _face_derivs(faces, values, coord, axis, cyclic, circumf)
+
+
+def reconstructed_derivs(values, coord, axis=-1, scheme='weno5',
+                         cyclic=False, circumf=0.):
+    """Higher-order upwind derivatives for positive and for negative flow.
+
+    As `tvd_derivs`, but with the face values from `upwind3_faces` or
+    `weno5_faces`.  The reconstructions assume evenly spaced points, and
+    their full order of accuracy holds only away from non-cyclic edges.
+
+    :param str scheme: 'upwind3' or 'weno5'.
+    """
+    try:
+        reconstruct = RECONSTRUCTIONS[scheme]
+    except KeyError:
+        raise ValueError("Scheme must be one of {}: "
+                         "'{}'".format(sorted(RECONSTRUCTIONS), scheme))
+    values = _as_float(values)
+    axis = axis % values.ndim
+    faces = reconstruct(values, axis=axis, cyclic=cyclic)
+    return _face_derivs(faces, values, coord, axis, cyclic, circumf)
+
+
+def stencil_start(coord, target, size):
+    """Index of the first point of the interpolation stencil for each target.
+
+    The stencil of `size` points is centered on the interval containing the
+    target, but shifted as needed to lie wholly within the coordinate.
+
+    :param numpy.ndarray coord: Increasing 1-D coordinate.
+    :param numpy.ndarray target: Positions to interpolate to.
+    :param int size: Number of points in the stencil.
+    """
+    start = np.searchsorted(coord, target, side='right') - size // 2
+    return np.clip(start, 0, len(coord) - size)
+
+
+def lagrange_weights(target, nodes):
+    """Weights of Lagrange interpolation from the nodes to the targets.
+
+    :param numpy.ndarray target: Positions to interpolate to.
+    :param numpy.ndarray nodes: Positions of the stencil's points, indexed
+        by the stencil along the first axis, and otherwise broadcastable
+        against `target`.
+    :out: Weights, indexed like `nodes`, and summing to 1 along the first
+        axis.
+    """
+    weights = []
+    for point, node in enumerate(nodes):
+        weight = np.ones(np.broadcast(target, node).shape)
+        for other_point, other_node in enumerate(nodes):
+            if other_point != point:
+                weight *= (target - other_node) / (node - other_node)
+        weights.append(weight)
+    return np.stack(weights)
+
+
+def _tridiag_factors(lower, diag, upper):
+    """Forward elimination of tridiagonal systems along the first axis.
+
+    :out: The lower coefficients, the reciprocals of the eliminated
+        diagonal, and the eliminated upper coefficients, with which
+        `_tridiag_substitute` solves for any right-hand side.
+    """
+    shape = np.broadcast(lower, diag, upper).shape
+    dtype = np.result_type(lower, diag, upper, float)
+    lower = np.broadcast_to(lower, shape)
+    inv_denom = np.empty(shape, dtype=dtype)
+    upper_mod = np.empty(shape, dtype=dtype)
+    inv_denom[0] = 1 / diag[0]
+    upper_mod[0] = upper[0]*inv_denom[0]
+    for num in range(1, shape[0]):
+        inv_denom[num] = 1 / (diag[num] - lower[num]*upper_mod[num - 1])
+        upper_mod[num] = upper[num]*inv_denom[num]
+    return lower, inv_denom, upper_mod
+
+
+def _tridiag_substitute(factors, rhs, solution):
+    """Solve factorized tridiagonal systems along the first axis.
+
+    `solution` can be `rhs` itself, to solve in place.
+    """
+    lower, inv_denom, upper_mod = factors
+    solution[0] = rhs[0]*inv_denom[0]
+    for num in range(1, len(solution)):
+        solution[num] = ((rhs[num] - lower[num]*solution[num - 1]) *
+                         inv_denom[num])
+    for num in range(len(solution) - 2, -1, -1):
+        solution[num] -= upper_mod[num]*solution[num + 1]
+    return solution
+
+
+def solve_tridiag(lower, diag, upper, rhs, axis=-1, out=None):
+    """Solve tridiagonal systems along an axis, by the Thomas algorithm.
+
+    Each 1-D slice along `axis` is a separate system, and all are solved at
+    once: the only loop is over the points along the axis.  The algorithm
+    doesn't pivot, so is stable for diagonally dominant matrices, such as
+    those of implicit upwind advection.
+
+    :param numpy.ndarray lower: Coefficients of the point before each point.
+        The first is ignored.
+    :param numpy.ndarray diag: Coefficients of each point.
+    :param numpy.ndarray upper: Coefficients of the point after each point.
+        The last is ignored.
+    :param numpy.ndarray rhs: Right-hand side.  The coefficients have the
+        same number of dimensions, and broadcast against it.
+    :param int axis: Axis along which the systems lie.
+    :param numpy.ndarray out: Optional array in which to place the solution.
+    """
+    axis = axis % rhs.ndim
+    lower, diag, upper, rhs = [np.moveaxis(np.asarray(arr), axis, 0)
+                               for arr in (lower, diag, upper, rhs)]
+    shape = np.broadcast(lower, diag, upper, rhs).shape
+    dtype = np.result_type(lower, diag, upper, rhs, float)
+    if out is None:
+        out = np.empty(shape[1:axis + 1] + shape[:1] + shape[axis + 1:],
+                       dtype=dtype)
+    _tridiag_substitute(_tridiag_factors(lower, diag, upper), rhs,
+                        np.moveaxis(out, axis, 0))
+    return out
+
+
+# Weight of the neighboring derivatives, and of the differences over two and
+# four gridpoints, in the compact schemes of Lele (1992).
+_COMPACT_COEFFS = {4: (1/4., 3/2., 0.), 6: (1/3., 14/9., 1/9.)}
+
+
+@functools.lru_cache(maxsize=32)
+def _compact_factors(n, order, cyclic):
+    """Factorized matrix of the compact scheme for `n` points.
+
+    If not cyclic, the edge points use the third-order closure
+    f'_0 + 2 f'_1 = (-5 f_0 + 4 f_1 + f_2) / 2, and for sixth order their
+    neighbors use the fourth-order scheme.  If cyclic, the matrix's corners
+    are handled by the Sherman-Morrison formula: the solution is corrected
+    by a multiple of `corner`, given by `weights` dotted with the first and
+    last points of the uncorrected solution.
+    """
+    alpha = _COMPACT_COEFFS[order][0]
+    lower = np.full(n, alpha)
+    diag = np.ones(n)
+    upper = np.full(n, alpha)
+    if not cyclic:
+        upper[0] = lower[-1] = 2.
+        if order == 6:
+            lower[1] = upper[1] = lower[-2] = upper[-2] = 0.25
+        return _tridiag_factors(lower, diag, upper), None, None
+    gamma = -diag[0]
+    diag[0] -= gamma
+    diag[-1] -= alpha*alpha / gamma
+    factors = _tridiag_factors(lower, diag, upper)
+    corner = np.zeros(n)
+    corner[0] = gamma
+    corner[-1] = alpha
+    corner = _tridiag_substitute(factors, corner, corner)
+    weights = (np.array([1., alpha / gamma]) /
+               (1 + corner[0] + alpha*corner[-1] / gamma))
+    return factors, corner, weights
+
+
+def _compact_d_dindex(values, axis, order, cyclic):
+    """Compact derivative with respect to the index along `axis`.
+
+    :out: The derivative, with `axis` moved first.
+    """
+    values = np.moveaxis(values, axis, 0)
+    _, two_point, four_point = _COMPACT_COEFFS[order]
+    if cyclic:
+        deriv = 0.5*two_point*(np.roll(values, -1, axis=0) -
+                               np.roll(values, 1, axis=0))
+        if four_point:
+            deriv += 0.25*four_point*(np.roll(values, -2, axis=0) -
+                                      np.roll(values, 2, axis=0))
+    else:
+        deriv = np.empty(values.shape, dtype=np.result_type(values, float))
+        deriv[1:-1] = 0.5*two_point*(values[2:] - values[:-2])
+        if four_point:
+            deriv[2:-2] += 0.25*four_point*(values[4:] - values[:-4])
+            deriv[1] = 0.75*(values[2] - values[0])
+            deriv[-2] = 0.75*(values[-1] - values[-3])
+        deriv[0] = -2.5*values[0] + 2*values[1] + 0.5*values[2]
+        deriv[-1] = 2.5*values[-1] - 2*values[-2] - 0.5*values[-3]
+    factors, corner, weights = _compact_factors(len(deriv), order, cyclic)
+    _tridiag_substitute(factors, deriv, deriv)
+    if cyclic:
+        correction = weights[0]*deriv[0] + weights[1]*deriv[-1]
+        deriv -= (corner.reshape((-1,) + (1,)*(deriv.ndim - 1)) *
+                  correction)
+    return deriv
+
+
+def compact_deriv(values, coord, axis=-1, order=4, cyclic=False, circumf=0.,
+                  out=None):
+    """Derivative via compact (Pade) finite differencing.
+
+    The derivatives at neighboring points are coupled, as in
+    alpha f'_{i-1} + f'_i + alpha f'_{i+1} = a (f_{i+1} - f_{i-1}) / 2h +
+    b (f_{i+2} - f_{i-2}) / 4h, which is solved as a tridiagonal system
+    along `axis` for all of the other points at once.  The matrix depends
+    only on the number of points, the order, and whether the axis is
+    cyclic, so is factorized once and cached.  A non-uniform coordinate is
+    handled by differencing it in the same way, as a function of the index.
+
+    :param numpy.ndarray values: Field to take the derivative of.
+    :param numpy.ndarray coord: Coordinate; either 1-D along `axis` or
+        broadcastable against `values`.
+    :param int axis: Axis over which to take the derivative.
+    :param int order: Order of accuracy in the interior: 4 or 6.
+    :param bool cyclic: Whether the axis is cyclic.  If not, the edges are
+        third order.
+    :param float circumf: If cyclic, the coordinate's period.
+    :param numpy.ndarray out: Optional array in which to place the result.
+    """
+    if order not in _COMPACT_COEFFS:
+        raise ValueError("Compact differencing only supported for orders "
+                         "{}: {}".format(sorted(_COMPACT_COEFFS), order))
+    axis = axis % values.ndim
+    n = values.shape[axis]
+    if n < 5:
+        raise ValueError("Compact differencing requires at least 5 points: "
+                         "{}".format(n))
+    coord = _prep_coord(coord, values.ndim, axis)
+    out = _prep_out(out, values, coord, axis, n)
+    dvalues = _compact_d_dindex(values, axis, order, cyclic)
+    # A cyclic coordinate less its mean increase is periodic.
+    trend = circumf / n if cyclic else 0.
+    index = _prep_coord(np.arange(n), coord.ndim, axis)
+    dcoord = _compact_d_dindex(coord - trend*index, axis, order,
+                               cyclic) + trend
+    np.true_divide(dvalues, dcoord, out=np.moveaxis(out, axis, 0))
+    return out
@@ -0,0 +1,303 @@
+"""Deferred evaluation of composite operators as expression graphs.
+
+Composite operators, e.g. the horizontal gradient at constant pressure,
+combine several derivatives and metric factors, some shared between terms.
+In lazy mode they return an `Expr` rather than a computed array.  Evaluating
+it computes each distinct subterm only once, and combines the terms
+elementwise with as few passes over the data as possible, rather than
+materializing every intermediate.
+"""
+from collections import defaultdict
+from numbers import Number
+
+import numpy as np
+import xarray as xr
+
+from .incremental import fingerprint
+
+_UFUNCS = {'add': np.add, 'sub': np.subtract, 'mul': np.multiply,
+           'div': np.true_divide, 'maximum': np.maximum,
+           'minimum': np.minimum}
+
+
+def _is_const(obj):
+    return obj is None or isinstance(obj, (Number, str, bool, np.number))
+
+
+def _arg_key(obj):
+    """Key of an argument: by value for constants, otherwise by identity."""
+    if isinstance(obj, Expr):
+        return obj.key
+    if _is_const(obj):
+        return ('const', type(obj).__name__, obj)
+    return ('id', id(obj))
+
+
+def _as_operand(obj):
+    """Wrap arrays as expressions; constants are kept as is."""
+    if isinstance(obj, Expr) or _is_const(obj):
+        return obj
+    return Value(obj)
+
+
+class Expr(object):
+    """Node of an expression graph.
+
+    Arithmetic with other expressions, arrays, and scalars builds further
+    expressions.  The expression should be on the left of any arithmetic
+    with an xarray object.
+    """
+    # Prevent numpy from broadcasting over expressions.
+    __array_ufunc__ = None
+    key = None
+
+    def _children(self):
+        return []
+
+    def _evaluate(self, cache, refs):
+        raise NotImplementedError
+
+    def evaluate(self):
+        """Compute the value of the expression."""
+        return evaluate(self)[0]
+
+    def __add__(self, other):
+        return Elementwise('add', self, other)
+
+    def __radd__(self, other):
+        return Elementwise('add', other, self)
+
+    def __sub__(self, other):
+        return Elementwise('sub', self, other)
+
+    def __rsub__(self, other):
+        return Elementwise('sub', other, self)
+
+    def __mul__(self, other):
+        return Elementwise('mul', self, other)
+
+    def __rmul__(self, other):
+        return Elementwise('mul', other, self)
+
+    def __truediv__(self, other):
+        return Elementwise('div', self, other)
+
+    def __rtruediv__(self, other):
+        return Elementwise('div', other, self)
+
+    __div__ = __truediv__
+    __rdiv__ = __rtruediv__
+
+    def __neg__(self):
+        return Elementwise('mul', -1, self)
+
+
+class Value(Expr):
+    """An already computed array."""
+    def __init__(self, data):
+        self.data = data
+        self.key = _arg_key(data)
+
+    def _evaluate(self, cache, refs):
+        return self.data
+
+
+class Term(Expr):
+    """Deferred call of a function.
+
+    Terms with the same function and arguments are computed only once per
+    evaluation.  Arguments that are expressions are evaluated first.
+    """
+    def __init__(self, func, args=(), kwargs=None, pure=False):
+        """
+        :param func: Function or method to call.
+        :param args: Positional arguments.
+        :param kwargs: Keyword arguments.
+        :param bool pure: Whether the result depends only on the arguments
+            and on the public attributes of the object the method is bound
+            to, e.g. the grid of a coordinate, rather than on its identity.
+            If so, the same method of different objects with equal
+            attributes, e.g. those of different operators on the same grid,
+            is called only once for the same arguments.
+        """
+        self.func = func
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        owner = getattr(func, '__self__', None)
+        if pure and owner is not None:
+            func_key = (type(owner).__name__, func.__name__,
+                        fingerprint(owner))
+        elif owner is not None:
+            func_key = (id(owner), func.__name__)
+        else:
+            func_key = id(func)
+        self.key = ('term', func_key, tuple(_arg_key(arg) for arg in args),
+                    tuple((name, _arg_key(self.kwargs[name]))
+                          for name in sorted(self.kwargs)))
+
+    def _children(self):
+        return [arg for arg in list(self.args) + list(self.kwargs.values())
+                if isinstance(arg, Expr)]
+
+    def _evaluate(self, cache, refs):
+        if self.key not in cache:
+            def value(arg):
+                if isinstance(arg, Expr):
+                    return arg._evaluate(cache, refs)
+                return arg
+            cache[self.key] = self.func(
+                *[value(arg) for arg in self.args],
+                **{name: value(arg) for name, arg in self.kwargs.items()}
+            )
+        return cache[self.key]
+
+
+class Elementwise(Expr):
+    """Elementwise binary operation.
+
+    Trees of these are evaluated together in a single fused computation,
+    except for subtrees shared with other parts of the graph, which are
+    computed once and reused.
+    """
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = _as_operand(left)
+        self.right = _as_operand(right)
+        self.key = ('op', op, _arg_key(self.left), _arg_key(self.right))
+
+    def _children(self):
+        return [arg for arg in (self.left, self.right)
+                if isinstance(arg, Expr)]
+
+    def _program(self, cache, refs, leaves):
+        """Nested tuples describing the fused computation."""
+        def operand(arg):
+            if not isinstance(arg, Expr):
+                return ('const', arg)
+            if isinstance(arg, Elementwise) and refs[arg.key] <= 1:
+                return arg._program(cache, refs, leaves)
+            leaves.append(arg._evaluate(cache, refs))
+            return ('leaf', len(leaves) - 1)
+        return (self.op, operand(self.left), operand(self.right))
+
+    def _evaluate(self, cache, refs):
+        if self.key not in cache:
+            leaves = []
+            program = self._program(cache, refs, leaves)
+            cache[self.key] = _fused(program, leaves)
+        return cache[self.key]
+
+
+def maximum(expr, other):
+    """Elementwise maximum, as an expression."""
+    return Elementwise('maximum', expr, other)
+
+
+def minimum(expr, other):
+    """Elementwise minimum, as an expression."""
+    return Elementwise('minimum', expr, other)
+
+
+def _ops(program):
+    if program[0] in ('leaf', 'const'):
+        return set()
+    return {program[0]} | _ops(program[1]) | _ops(program[2])
+
+
+def _operand(program, out, values):
+    if program[0] == 'leaf':
+        return values[program[1]]
+    if program[0] == 'const':
+        return program[1]
+    scratch = np.empty_like(out)
+    _into(program, scratch, values)
+    return scratch
+
+
+def _into(program, out, values):
+    """Evaluate the program into `out`, in place."""
+    if program[0] in ('leaf', 'const'):
+        out[...] = _operand(program, out, values)
+        return
+    op, left, right = program
+    ufunc = _UFUNCS[op]
+    if left[0] == 'const':
+        _into(right, out, values)
+        ufunc(left[1], out, out=out)
+        return
+    _into(left, out, values)
+    ufunc(out, _operand(right, out, values), out=out)
+
+
+def _fused(program, leaves):
+    """Compute the program over the leaves in a single output array.
+
+    DataArray leaves are aligned and broadcast as in xarray arithmetic.
+    """
+    arrays = [leaf for leaf in leaves if isinstance(leaf, xr.DataArray)]
+    if not arrays:
+        values = [np.asarray(leaf) for leaf in leaves]
+        dtype = np.result_type(*values) if values else np.float64
+        if 'div' in _ops(program):
+            dtype = np.result_type(dtype, np.float64)
+        out = np.empty(np.broadcast(*values).shape if values else (),
+                       dtype=dtype)
+        _into(program, out, values)
+        return out
+    aligned = iter(xr.align(*arrays, join='inner'))
+    leaves = [next(aligned) if isinstance(leaf, xr.DataArray) else leaf
+              for leaf in leaves]
+
+    dims, sizes, coords, names = [], {}, {}, set()
+    for leaf in leaves:
+        if not isinstance(leaf, xr.DataArray):
+            continue
+        names.add(leaf.name)
+        for dim in leaf.dims:
+            if dim not in sizes:
+                dims.append(dim)
+                sizes[dim] = leaf.sizes[dim]
+        for name, coord in leaf.coords.items():
+            coords.setdefault(name, coord)
+
+    values = []
+    for leaf in leaves:
+        if isinstance(leaf, xr.DataArray):
+            leaf_dims = [dim for dim in dims if dim in leaf.dims]
+            values.append(np.asarray(leaf.transpose(*leaf_dims).values)
+                          .reshape([sizes[dim] if dim in leaf.dims else 1
+                                    for dim in dims]))
+        else:
+            values.append(np.asarray(leaf))
+    dtype = np.result_type(*values)
+    if 'div' in _ops(program):
+        dtype = np.result_type(dtype, np.float64)
+    out = np.empty([sizes[dim] for dim in dims], dtype=dtype)
+    _into(program, out, values)
+    name = names.pop() if len(names) == 1 else None
+    return xr.DataArray(out, dims=dims, coords=coords, name=name)
+
+
+def _count_refs(expr, refs, seen):
+    if expr.key in seen:
+        return
+    seen.add(expr.key)
+    for child in expr._children():
+        refs[child.key] += 1
+        _count_refs(child, refs, seen)
+
+
+def evaluate(*exprs):
+    """Evaluate expressions together, sharing their common subterms.
+
+    :out: tuple of the values of the expressions.  Arguments that aren't
+        expressions are returned as is.
+    """
+    refs = defaultdict(int)
+    seen = set()
+    for expr in exprs:
+        if isinstance(expr, Expr):
+            _count_refs(expr, refs, seen)
+    cache = {}
+    return tuple(expr._evaluate(cache, refs) if isinstance(expr, Expr)
+                 else expr for expr in exprs)
@@ -0,0 +1,156 @@
+"""Pickling operators without their field data."""
+import copy
+import inspect
+
+import xarray as xr
+
+from .workspace import Workspace
+
+
+class FieldSpec(object):
+    """Stand-in for field data in a pickled operator.
+
+    Retains the data's dims, sizes, and coordinates, but not its values.
+    """
+    def __init__(self, arr):
+        self.dims = tuple(arr.dims)
+        self.sizes = dict(arr.sizes)
+        self.coords = arr.coords.to_dataset()
+
+    def __repr__(self):
+        return 'FieldSpec(sizes={})'.format(self.sizes)
+
+    def check(self, arr):
+        """Raise if the array's dims differ from those of the original."""
+        if tuple(arr.dims) != tuple(self.dims):
+            raise ValueError("Data has dims {}, but the operator was created "
+                             "with dims {}".format(arr.dims, self.dims))
+
+
+class LightPickle(object):
+    """Operators whose pickled state is their configuration, not their data.
+
+    Operators hold the field data, e.g. the array being differenced and the
+    advecting flow, often along with several copies of it.  Rather than
+    their attributes, their pickled state is the arguments they were
+    created with, with the field data replaced by `FieldSpec` objects.  The
+    geometry, e.g. coordinates and pk/bk, and all other options are
+    retained.  The unpickled operator must be given the data via `bind`
+    before use.
+    """
+    # Names of the arguments of `__init__` that are field data.
+    _DATA_ARGS = ('arr', 'flow', 'ps', 'mask')
+
+    def __new__(cls, *args, **kwargs):
+        obj = super(LightPickle, cls).__new__(cls)
+        obj._init_args = args
+        obj._init_kwargs = kwargs
+        return obj
+
+    @classmethod
+    def _arg_names(cls):
+        params = list(inspect.signature(cls.__init__).parameters.values())
+        return [param.name for param in params[1:]
+                if param.kind in (param.POSITIONAL_ONLY,
+                                  param.POSITIONAL_OR_KEYWORD)]
+
+    def _is_data(self, name, value):
+        return (name in self._DATA_ARGS and
+                isinstance(value, (xr.DataArray, xr.Dataset)))
+
+    def _ship(self, name, value):
+        if self._is_data(name, value):
+            return FieldSpec(value)
+        if isinstance(value, Workspace):
+            return Workspace()
+        return value
+
+    def __getstate__(self):
+        names = self._arg_names()
+        args = [self._ship(name, value)
+                for name, value in zip(names, self._init_args)]
+        args.extend(self._init_args[len(names):])
+        kwargs = {name: self._ship(name, value)
+                  for name, value in self._init_kwargs.items()}
+        return dict(_init_args=tuple(args), _init_kwargs=kwargs)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._unbound = True
+
+    # Copies, unlike pickles, keep the field data.
+    def __copy__(self):
+        obj = type(self).__new__(type(self))
+        obj.__dict__.update(self.__dict__)
+        return obj
+
+    def __deepcopy__(self, memo):
+        obj = type(self).__new__(type(self))
+        memo[id(self)] = obj
+        obj.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return obj
+
+    def __getattr__(self, name):
+        # Only reached for attributes that aren't found.
+        if name.startswith('__') or not self.__dict__.get('_unbound'):
+            raise AttributeError(name)
+        raise AttributeError("'{}' has no attribute '{}': it must be given "
+                             "its data via `bind` after being "
+                             "unpickled".format(type(self).__name__, name))
+
+    # Attributes naming a dim that the operator differences along.
+    _DIFF_DIM_ATTRS = ('dim', 'x_dim', 'y_dim', 'vert_dim')
+    # Dims differenced along by operators that build their sub-operators
+    # only when called.
+    _DIFF_DIMS = ()
+
+    def _diff_dims(self):
+        """Names of the dims that the operator differences along.
+
+        Those named by its own attributes or by `_DIFF_DIMS`, and those of
+        the operators it holds.
+        """
+        dims = set(self._DIFF_DIMS)
+        for name, value in vars(self).items():
+            if name in self._DIFF_DIM_ATTRS and isinstance(value, str):
+                dims.add(value)
+            elif isinstance(value, LightPickle) and value is not self:
+                dims |= value._diff_dims()
+        return dims
+
+    @property
+    def data_args(self):
+        """Names of the field data arguments that `bind` requires."""
+        names = self._arg_names()
+        return ([name for name, value in zip(names, self._init_args)
+                 if isinstance(value, FieldSpec)] +
+                [name for name, value in self._init_kwargs.items()
+                 if isinstance(value, FieldSpec)])
+
+    def bind(self, **data):
+        """Give an unpickled operator its field data.
+
+        :param data: The field data, keyed by argument name, e.g. `arr`, or
+            `flow` and `arr`.  All in `data_args` are required.
+        :out: The operator itself, ready to use.
+        """
+        missing = set(self.data_args) - set(data)
+        if missing:
+            raise ValueError("Missing data for {}".format(sorted(missing)))
+
+        def bound(name, value):
+            if not isinstance(value, FieldSpec):
+                return value
+            value.check(data[name])
+            return data[name]
+        names = self._arg_names()
+        args = [bound(name, value)
+                for name, value in zip(names, self._init_args)]
+        args.extend(self._init_args[len(names):])
+        kwargs = {name: bound(name, value)
+                  for name, value in self._init_kwargs.items()}
+        self._init_args = tuple(args)
+        self._init_kwargs = kwargs
+        self.__dict__.pop('_unbound', None)
+        self.__init__(*args, **kwargs)
+        return self
@@ -0,0 +1,151 @@
+"""Evaluation of operators over a regional subdomain."""
+import numpy as np
+
+from ._constants import LON_STR, LAT_STR
+
+
+class Region(object):
+    """Latitude-longitude box over which to evaluate operators.
+
+    Operators given a region select from their input data only the points
+    within the box plus a surrounding halo wide enough for their stencils,
+    compute over that subset, and return results only within the box.  The
+    results are the same as computing over the whole domain and subsetting
+    afterwards.
+    """
+    def __init__(self, lon_bounds=None, lat_bounds=None, lon_str=LON_STR,
+                 lat_str=LAT_STR, circumf=360.):
+        """
+        :param lon_bounds: (west, east) bounds, inclusive, of the box in the
+            units of the longitude coordinate.  If west exceeds east, the box
+            spans the seam of the (cyclic) longitude coordinate, e.g. (300,
+            30) on a 0-360 grid.  If None, all longitudes are used.
+        :param lat_bounds: (south, north) bounds, inclusive, of the box.  If
+            None, all latitudes are used.
+        :param circumf: Period of the cyclic longitude coordinate.
+        """
+        self.lon_bounds = lon_bounds
+        self.lat_bounds = lat_bounds
+        self.lon_str = lon_str
+        self.lat_str = lat_str
+        self.circumf = circumf
+
+    def __repr__(self):
+        return '{}(lon_bounds={}, lat_bounds={})'.format(
+            type(self).__name__, self.lon_bounds, self.lat_bounds
+        )
+
+    def _window(self, values, bounds, cyclic):
+        """Positions of the coordinate values within the bounds, in order."""
+        lower, upper = bounds
+        if cyclic and lower > upper:
+            # Box spans the seam: its eastern part comes first.
+            window = np.concatenate([np.nonzero(values >= lower)[0],
+                                     np.nonzero(values <= upper)[0]])
+        else:
+            window = np.nonzero((values >= lower) & (values <= upper))[0]
+        if not window.size:
+            raise ValueError("No points of the coordinate within the bounds "
+                             "{}".format(bounds))
+        return window
+
+    def select(self, arr, halo, cyclic_lon=True):
+        """Determine the subset of the array's grid needed for the box.
+
+        :param arr: Data on the full grid.
+        :param int halo: Number of points beyond the box needed on each side
+            by the operator's stencils, typically `spacing*order`.
+        :param bool cyclic_lon: Whether longitude is cyclic in the full grid.
+        :out: `RegionSelection` that extracts this subset from arrays on the
+            same grid and trims results back to the box.
+        """
+        selection = RegionSelection(cyclic_lon=cyclic_lon)
+        if self.lat_bounds is not None:
+            lat = arr[self.lat_str].values
+            window = self._window(lat, self.lat_bounds, cyclic=False)
+            start = max(window[0] - halo, 0)
+            stop = min(window[-1] + halo + 1, lat.size)
+            selection._add(self.lat_str, slice(start, stop), lat[window],
+                           lat[window])
+        if self.lon_bounds is not None:
+            lon = arr[self.lon_str].values
+            window = self._window(lon, self.lon_bounds, cyclic_lon)
+            if not cyclic_lon:
+                start = max(window[0] - halo, 0)
+                stop = min(window[-1] + halo + 1, lon.size)
+                selection._add(self.lon_str, slice(start, stop), lon[window],
+                               lon[window])
+            elif window.size + 2*halo < lon.size:
+                # Unwrap the subset across the seam, so that it is
+                # contiguous and no longer cyclic.
+                unwrapped = window[0] - halo + np.arange(window.size +
+                                                         2*halo)
+                positions = unwrapped % lon.size
+                coord = (lon[positions] +
+                         self.circumf*(unwrapped // lon.size))
+                selection._add(self.lon_str, positions, lon[window],
+                               coord[halo:-halo], coord=coord)
+                selection.cyclic_lon = False
+            else:
+                # The box and its halo span the whole circle, so the full
+                # grid is used, but the result is still trimmed to the box.
+                labels = lon[np.sort(window)]
+                selection._add(self.lon_str, None, labels, labels)
+        return selection
+
+
+class RegionSelection(object):
+    """Subset of a grid covering a `Region` and its halo."""
+    def __init__(self, cyclic_lon=True):
+        self.cyclic_lon = cyclic_lon
+        self._indexers = {}
+        self._coords = {}
+        self._labels = {}
+        self._subset_labels = {}
+
+    def _add(self, dim, indexer, labels, subset_labels, coord=None):
+        if indexer is not None:
+            self._indexers[dim] = indexer
+        self._labels[dim] = labels
+        self._subset_labels[dim] = subset_labels
+        if coord is not None:
+            self._coords[dim] = coord
+
+    def extract(self, arr):
+        """Select the subset from an array on the full grid.
+
+        Arrays lacking the subset dims, scalars, and None are returned
+        unchanged.  A coordinate array whose longitudes are unwrapped across
+        the seam has its values unwrapped also.
+        """
+        if not hasattr(arr, 'dims'):
+            return arr
+        indexers = {dim: indexer for dim, indexer in self._indexers.items()
+                    if dim in arr.dims}
+        if not indexers:
+            return arr
+        subset = arr.isel(**indexers)
+        coords = {dim: coord for dim, coord in self._coords.items()
+                  if dim in arr.dims}
+        if coords:
+            subset = subset.assign_coords(**coords)
+            if subset.name in coords and subset.dims == (subset.name,):
+                return subset[subset.name]
+        return subset
+
+    def trim(self, arr):
+        """Restrict a result computed on the subset to the region's box.
+
+        Points within the box that are absent from the result, e.g. because
+        edge filling was disabled at a true edge of the domain, remain
+        absent.
+        """
+        for dim, subset_labels in self._subset_labels.items():
+            if dim not in arr.dims:
+                continue
+            keep = np.isin(arr[dim].values, subset_labels)
+            arr = arr.isel(**{dim: keep})
+            labels = self._labels[dim][np.isin(subset_labels,
+                                               arr[dim].values)]
+            arr = arr.assign_coords(**{dim: labels})
+        return arr
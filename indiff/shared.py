@@ -0,0 +1,318 @@
+"""Multi-process execution of operators over data in shared memory."""
+from concurrent.futures import ProcessPoolExecutor
+import gc
+import os
+from multiprocessing import shared_memory
+
+import cloudpickle
+import numpy as np
+import xarray as xr
+
+
+class _SharedBlock(object):
+    """Owner of a shared memory block, which is freed once nothing views it.
+
+    Arrays viewing the block are created with `np.asarray(block)`, which
+    makes the block their base, and so keeps it alive as long as they are.
+    """
+    def __init__(self, shm, shape, dtype):
+        self.shm = shm
+        self._values = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        self.__array_interface__ = self._values.__array_interface__
+
+    def __del__(self):
+        # The view of the block must be released before it can be closed.
+        del self._values
+        self.shm.close()
+        self.shm.unlink()
+
+
+class _SharedArray(object):
+    """Handle of a DataArray whose values are in a shared memory block."""
+    def __init__(self, name, shape, dtype, dims, coords, arr_name=None,
+                 attrs=None):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.dims = tuple(dims)
+        self.coords = coords
+        self.arr_name = arr_name
+        self.attrs = attrs or {}
+
+    @classmethod
+    def empty(cls, shape, dtype, dims, coords, arr_name=None, attrs=None):
+        """Create a new block, and the handle of an array occupying it.
+
+        :out: The handle, and the block, which the caller must unlink.
+        """
+        nbytes = int(np.prod(shape))*np.dtype(dtype).itemsize
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        return cls(shm.name, shape, dtype, dims, coords, arr_name=arr_name,
+                   attrs=attrs), shm
+
+    @classmethod
+    def create(cls, arr):
+        """Copy the array into a new block; see `empty`."""
+        handle, shm = cls.empty(arr.shape, arr.dtype, arr.dims,
+                                arr.coords.to_dataset(), arr_name=arr.name,
+                                attrs=arr.attrs)
+        np.ndarray(arr.shape, dtype=arr.dtype,
+                   buffer=shm.buf)[...] = arr.values
+        return handle, shm
+
+    @classmethod
+    def from_shared(cls, arr):
+        """The handle of an array occupying the whole of a `_SharedBlock`.
+
+        :out: The handle, or None if the array's values aren't such a block.
+        """
+        values = arr.values
+        block = values.base
+        if not isinstance(block, _SharedBlock):
+            return None
+        owned = block._values
+        if (values.shape != owned.shape or values.dtype != owned.dtype or
+                not values.flags.c_contiguous or
+                values.ctypes.data != owned.ctypes.data):
+            return None
+        return cls(block.shm.name, arr.shape, arr.dtype, arr.dims,
+                   arr.coords.to_dataset(), arr_name=arr.name,
+                   attrs=arr.attrs)
+
+    def owned(self, shm):
+        """The DataArray viewing the block, which it then owns.
+
+        The block is closed and unlinked once the DataArray, and any views
+        of it, are gone.
+        """
+        values = np.asarray(_SharedBlock(shm, self.shape, self.dtype))
+        return xr.DataArray(values, dims=self.dims, coords=self.coords.coords,
+                            name=self.arr_name, attrs=self.attrs)
+
+    def attach(self):
+        """The shared memory block, and the DataArray viewing it."""
+        shm = shared_memory.SharedMemory(name=self.name)
+        values = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        return shm, xr.DataArray(values, dims=self.dims,
+                                 coords=self.coords.coords,
+                                 name=self.arr_name, attrs=self.attrs)
+
+
+def _close(blocks):
+    # Views of the blocks must be released before they can be closed.
+    gc.collect()
+    for shm in blocks:
+        shm.close()
+
+
+class _SlabTask(object):
+    """The operator applied to a slab of the shared inputs."""
+    def __init__(self, cls, args, kwargs, method, method_args,
+                 method_kwargs, split_dim):
+        self.cls = cls
+        self.args = args
+        self.kwargs = kwargs
+        self.method = method
+        self.method_args = method_args
+        self.method_kwargs = method_kwargs
+        self.split_dim = split_dim
+
+    def handles(self):
+        """Handles of the shared inputs."""
+        return [arg for arg in (list(self.args) + list(self.kwargs.values()) +
+                                list(self.method_args) +
+                                list(self.method_kwargs.values()))
+                if isinstance(arg, _SharedArray)]
+
+    def _slab(self, arg, start, stop, blocks):
+        if not isinstance(arg, _SharedArray):
+            return arg
+        shm, arr = arg.attach()
+        blocks.append(shm)
+        if self.split_dim in arr.dims:
+            return arr.isel(**{self.split_dim: slice(start, stop)})
+        return arr
+
+    def operator(self, start, stop, blocks):
+        """The operator, created from the slab of its inputs."""
+        return self.cls(*[self._slab(arg, start, stop, blocks)
+                          for arg in self.args],
+                        **{key: self._slab(val, start, stop, blocks)
+                           for key, val in self.kwargs.items()})
+
+    def apply(self, operator, start, stop, blocks):
+        """The method of the operator, applied to the slab."""
+        return getattr(operator, self.method)(
+            *[self._slab(arg, start, stop, blocks)
+              for arg in self.method_args],
+            **{key: self._slab(val, start, stop, blocks)
+               for key, val in self.method_kwargs.items()}
+        )
+
+    def __call__(self, start, stop, blocks):
+        return self.apply(self.operator(start, stop, blocks), start, stop,
+                          blocks)
+
+
+def _write_slab(result, out, split_dim, start, stop, blocks):
+    shm, out_arr = out.attach()
+    blocks.append(shm)
+    out_arr[{split_dim: slice(start, stop)}] = result.transpose(*out.dims)
+
+
+def _run_slab(payload, start, stop, out):
+    """Compute one slab and write it into the shared output, in place."""
+    task = cloudpickle.loads(payload)
+    blocks = []
+    try:
+        _write_slab(task(start, stop, blocks), out, task.split_dim, start,
+                    stop, blocks)
+    finally:
+        _close(blocks)
+
+
+class SharedMemoryRunner(object):
+    """Runs an operator in parallel over slabs of data in shared memory.
+
+    The inputs are copied once into `multiprocessing.shared_memory` blocks,
+    unless they already occupy such blocks, as do those created by `share`
+    or `empty`, and the results of `run`.  Rather than receiving a copy of
+    the data, each worker attaches to the blocks, computes the operator over
+    a disjoint slab along a dimension over which it doesn't difference, e.g.
+    time, and writes its result into its slab of the output in place.  No
+    process therefore holds more than a slab's worth of data beyond the
+    shared blocks.  The result views the output block, without a copy.
+    """
+    def __init__(self, processes=None, slabs=None):
+        """
+        :param int processes: Number of worker processes.  Defaults to the
+            number of CPUs.
+        :param int slabs: Number of slabs to split the data into.  Defaults
+            to the number of processes.
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.slabs = slabs or self.processes
+
+    @staticmethod
+    def share(arr):
+        """Copy of the DataArray in shared memory, for use in several runs.
+
+        The block is freed once the copy, and any views of it, are gone.
+        """
+        handle, shm = _SharedArray.create(arr)
+        return handle.owned(shm)
+
+    @staticmethod
+    def empty(shape, dims, coords=None, dtype=float, name=None, attrs=None):
+        """Uninitialized DataArray in shared memory, to be filled in place.
+
+        :param shape: Shape of the array.
+        :param dims: Its dims.
+        :param coords: Its coords, as accepted by `xarray.Dataset`.
+        """
+        handle, shm = _SharedArray.empty(shape, dtype, dims,
+                                         xr.Dataset(coords=coords),
+                                         arr_name=name, attrs=attrs)
+        return handle.owned(shm)
+
+    def _bounds(self, size):
+        edges = np.linspace(0, size, min(self.slabs, size) + 1).astype(int)
+        return [(int(start), int(stop))
+                for start, stop in zip(edges[:-1], edges[1:])]
+
+    def run(self, cls, split_dim, args=(), kwargs=None, method='deriv',
+            method_args=(), method_kwargs=None):
+        """Result of the operator's method, computed in slabs.
+
+        Arguments of the operator and its method that are DataArrays are
+        put in shared memory, and those with `split_dim` are split along it.
+        Other arguments are passed to the workers as is.
+
+        :param cls: Operator class, e.g. `CenDeriv` or `SphereEtaUpwind`.
+        :param str split_dim: Dimension along which to split the data.  The
+            operator mustn't difference along it; see
+            `LightPickle._diff_dims`.
+        :param args: Positional arguments to create the operator with.
+        :param kwargs: Keyword arguments to create the operator with.
+        :param str method: Name of the operator's method to call, e.g.
+            'deriv' or 'advec_3d'.
+        :param method_args: Positional arguments to the method.
+        :param method_kwargs: Keyword arguments to the method.
+        :out: The result, in a shared memory block that is freed once the
+            result, and any views of it, are gone.
+        """
+        kwargs = kwargs or {}
+        method_kwargs = method_kwargs or {}
+        if split_dim in [arg for arg in list(args) + [kwargs.get('dim')]
+                         if isinstance(arg, str)]:
+            raise ValueError("Can't split along the dim being differenced, "
+                             "'{}'".format(split_dim))
+        created, attached = [], []
+
+        def share(arg):
+            if not isinstance(arg, xr.DataArray):
+                return arg
+            handle = _SharedArray.from_shared(arg)
+            if handle is None:
+                handle, shm = _SharedArray.create(arg)
+                created.append(shm)
+            return handle
+
+        try:
+            task = _SlabTask(
+                cls, [share(arg) for arg in args],
+                {key: share(val) for key, val in kwargs.items()}, method,
+                [share(arg) for arg in method_args],
+                {key: share(val) for key, val in method_kwargs.items()},
+                split_dim
+            )
+            split = [handle for handle in task.handles()
+                     if split_dim in handle.dims]
+            if not split:
+                raise ValueError("No inputs have the dim "
+                                 "'{}'".format(split_dim))
+            split_coords = split[0].coords
+            size = split[0].shape[split[0].dims.index(split_dim)]
+            bounds = self._bounds(size)
+
+            # The first slab is computed here, and sets the output's layout.
+            operator = task.operator(bounds[0][0], bounds[0][1], attached)
+            if split_dim in getattr(operator, '_diff_dims', set)():
+                raise ValueError("Can't split along the dim being "
+                                 "differenced, '{}'".format(split_dim))
+            first = task.apply(operator, bounds[0][0], bounds[0][1],
+                               attached)
+            del operator
+            if split_dim not in first.dims:
+                raise ValueError("Output lacks the dim "
+                                 "'{}'".format(split_dim))
+            coords = {name: coord for name, coord in first.coords.items()
+                      if split_dim not in coord.dims}
+            if split_dim in split_coords.coords:
+                coords[split_dim] = split_coords[split_dim]
+            out, out_shm = _SharedArray.empty(
+                [size if dim == split_dim else first.sizes[dim]
+                 for dim in first.dims],
+                first.dtype, first.dims, xr.Dataset(coords=coords),
+                arr_name=first.name, attrs=first.attrs
+            )
+            created.append(out_shm)
+            _write_slab(first, out, split_dim, bounds[0][0], bounds[0][1],
+                        attached)
+            del first
+
+            payload = cloudpickle.dumps(task)
+            with ProcessPoolExecutor(max_workers=self.processes) as pool:
+                futures = [pool.submit(_run_slab, payload, start, stop, out)
+                           for start, stop in bounds[1:]]
+                for future in futures:
+                    future.result()
+
+            # The result takes over the output block, rather than copying it.
+            created.remove(out_shm)
+            result = out.owned(out_shm)
+        finally:
+            _close(attached + created)
+            for shm in created:
+                shm.unlink()
+        return result
@@ -5,6 +5,8 @@ import numpy as np
 import pytest
 import xarray as xr
 
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR
+
 
 class InfiniteDiffTestCase(unittest.TestCase):
     def setUp(self):
@@ -112,3 +114,29 @@ class InfiniteDiffTestCase(unittest.TestCase):
 
     def assertAllZeros(self, arr):
         assert not np.any(arr), arr
+
+
+class SphereEtaTestCase(InfiniteDiffTestCase):
+    """Random fields on the lat-lon grid with hybrid levels."""
+    def setUp(self):
+        super(SphereEtaTestCase, self).setUp()
+        self.dims = [PFULL_STR, LAT_STR, LON_STR]
+        self.coords = {PFULL_STR: self.pfull, LAT_STR: self.lat,
+                       LON_STR: self.lon}
+        self.shape = (len(self.pfull), len(self.lat), len(self.lon))
+        randstate = np.random.RandomState(12345)
+        self.arr = self._field(randstate.rand(*self.shape))
+        self.u, self.v, self.omega = [
+            self._field(randstate.rand(*self.shape) - 0.5) for _ in range(3)
+        ]
+        self.flow = self.u
+        self.ps = xr.DataArray(
+            1e5 + 1e3*randstate.rand(len(self.lat), len(self.lon)),
+            dims=[LAT_STR, LON_STR],
+            coords={LAT_STR: self.lat, LON_STR: self.lon}
+        )
+
+    def _field(self, values):
+        """Field on the grid, with the values broadcast over it."""
+        return xr.DataArray(np.broadcast_to(values, self.shape).copy(),
+                            dims=self.dims, coords=self.coords)
@@ -153,6 +153,41 @@ class TestUpwind(UpwindTestCase):
                                      fill_edge=False).advec()
             self.assertDatasetIdentical(actual, desired)
 
+
+class TestUpwindScheme(UpwindTestCase):
+    _SCHEMES = ['upwind3', 'weno5']
+
+    def test_advec_linear(self):
+        arr = 3.*self.arange
+        for scheme, sign in itertools.product(self._SCHEMES, [1, -1]):
+            actual = self._ADVEC_CLS(sign*self.ones, arr, self.dim,
+                                     scheme=scheme).advec()
+            np.testing.assert_allclose(actual, sign*3.)
+
+    def test_advec_zero_flow(self):
+        for scheme in self._SCHEMES:
+            self.assertAllZeros(self._ADVEC_CLS(self.zeros, self.arr,
+                                                self.dim,
+                                                scheme=scheme).advec())
+
+    def test_convergence(self):
+        for scheme, order in zip(self._SCHEMES, [3, 5]):
+            errors = []
+            for num_points in [40, 80]:
+                coord = np.arange(num_points) / float(num_points)
+                arr = xr.DataArray(np.sin(2*np.pi*coord), dims=[self.dim],
+                                   coords={self.dim: coord})
+                actual = self._ADVEC_CLS(xr.ones_like(arr), arr, self.dim,
+                                         scheme=scheme).advec()
+                expected = 2*np.pi*np.cos(2*np.pi*coord)
+                errors.append(float(np.abs(actual - expected)[4:-4].max()))
+            self.assertGreater(errors[0] / errors[1], 0.8*2**order)
+
+    def test_bad_scheme(self):
+        self.assertRaises(ValueError, self._ADVEC_CLS, self.flow, self.arr,
+                          self.dim, scheme='bogus')
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
 
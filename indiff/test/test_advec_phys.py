@@ -5,13 +5,15 @@ import unittest
 import numpy as np
 import xarray as xr
 
-from indiff._constants import LAT_STR, LON_STR, PFULL_STR
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR, _RADEARTH
 from indiff.advec import (PhysUpwind, LonUpwind, LatUpwind, SphereUpwind,
                           EtaUpwind, SphereEtaUpwind, LonUpwindConstP,
-                          LatUpwindConstP)
+                          LatUpwindConstP, PressureUpwind, Upwind,
+                          SigmaUpwind, SphereSigmaUpwind)
 from indiff.deriv import (PhysDeriv, LonFwdDeriv, LonBwdDeriv, LatFwdDeriv,
                           LatBwdDeriv, EtaFwdDeriv, EtaBwdDeriv,
                           SphereEtaFwdDeriv, SphereEtaBwdDeriv)
+from indiff.coord import Eta
 from . import InfiniteDiffTestCase
 
 
@@ -67,6 +69,21 @@ class TestLonUpwind(PhysAdvecSharedTests, LonUpwindTestCase):
     def test_advec(self):
         self.advec_obj.advec(self.lat)
 
+    def test_advec_scheme(self):
+        lon = np.deg2rad(self.arr[LON_STR])
+        arr = np.sin(lon) + 0.*self.arr
+        expected = (np.cos(lon) /
+                    (_RADEARTH*np.cos(np.deg2rad(self.arr[LAT_STR]))))
+        errors = {}
+        for scheme in [None, 'upwind3', 'weno5']:
+            actual = self._ADVEC_CLS(xr.ones_like(arr), arr,
+                                     scheme=scheme).advec(self.lat)
+            errors[scheme] = float(np.abs(
+                (actual.sel(**{LON_STR: self.lon}) - expected)/expected
+            ).max())
+        self.assertLess(errors['upwind3'], errors[None])
+        self.assertLess(errors['weno5'], errors['upwind3'])
+
 
 class LatUpwindTestCase(LonUpwindTestCase):
     _ADVEC_CLS = LatUpwind
@@ -153,6 +170,82 @@ class TestEtaUpwind(PhysAdvecSharedTests, EtaUpwindTestCase):
         self.advec_obj.advec()
 
 
+class TestEtaUpwindScheme(EtaUpwindTestCase):
+    def test_advec_scheme(self):
+        column = {LAT_STR: 2, LON_STR: 5}
+        pfull = Eta(self.pk, self.bk, self.pfull).pfull_from_ps(self.ps)
+        for scheme in ['upwind3', 'weno5']:
+            actual = self._ADVEC_CLS(self.flow, self.arr, self.pk, self.bk,
+                                     self.ps, scheme=scheme).advec()
+            expected = Upwind(
+                self.flow[column], self.arr[column], PFULL_STR,
+                coord=pfull[column].drop_vars(list(column)), scheme=scheme
+            ).advec()
+            np.testing.assert_allclose(actual[column].values,
+                                       expected.values)
+
+
+class TestPressureUpwind(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestPressureUpwind, self).setUp()
+        self.dim = self.pressure.dims[0]
+        shape = (len(self.pressure), len(self.lat))
+        dims = [self.dim, LAT_STR]
+        coords = {self.dim: self.pressure, LAT_STR: self.lat}
+        self.flow = xr.DataArray(np.random.randn(*shape), dims=dims,
+                                 coords=coords)
+        self.arr = xr.DataArray(np.random.random(shape), dims=dims,
+                                coords=coords)
+
+    def test_advec(self):
+        for order, fill_edge in itertools.product([1, 2], [True, False]):
+            actual = PressureUpwind(self.flow, self.arr, self.dim,
+                                    order=order, fill_edge=fill_edge).advec()
+            desired = Upwind(self.flow, self.arr, self.dim, order=order,
+                             fill_edge=fill_edge).advec()
+            xr.testing.assert_allclose(actual, desired)
+
+
+class SigmaUpwindTestCase(InfiniteDiffTestCase):
+    def setUp(self):
+        super(SigmaUpwindTestCase, self).setUp()
+        self.dim = self.sigma.dims[0]
+        shape = (len(self.sigma), len(self.lat), len(self.lon))
+        dims = [self.dim, LAT_STR, LON_STR]
+        coords = {self.dim: self.sigma, LAT_STR: self.lat, LON_STR: self.lon}
+        self.flow = xr.DataArray(np.random.randn(*shape), dims=dims,
+                                 coords=coords)
+        self.arr = xr.DataArray(np.random.random(shape), dims=dims,
+                                coords=coords)
+        self.ps = xr.DataArray(
+            np.random.random((len(self.lat), len(self.lon))),
+            dims=[LAT_STR, LON_STR],
+            coords={LAT_STR: self.lat, LON_STR: self.lon}
+        )*1e3 + 1e5
+
+
+class TestSigmaUpwind(SigmaUpwindTestCase):
+    def test_advec(self):
+        pressure = (self.ps*self.sigma).transpose(*self.arr.dims)
+        actual = SigmaUpwind(self.flow, self.arr, self.ps, self.dim).advec()
+        desired = Upwind(self.flow, self.arr, self.dim,
+                         coord=pressure).advec()
+        xr.testing.assert_allclose(actual, desired)
+
+
+class TestSphereSigmaUpwind(SigmaUpwindTestCase):
+    def test_advec_zero_flow(self):
+        advec_obj = SphereSigmaUpwind(self.arr, self.ps, self.dim)
+        zeros = xr.zeros_like(self.flow)
+        self.assertAllZeros(advec_obj.advec_3d(zeros, zeros, zeros))
+
+    def test_advec_3d(self):
+        advec_obj = SphereSigmaUpwind(self.arr, self.ps, self.dim)
+        actual = advec_obj.advec_3d(self.flow, self.flow, self.flow)
+        self.assertEqual(actual.shape, self.arr.shape)
+        self.assertFalse(actual.isnull().any())
+
+
 class LonUpwindConstPTestCase(EtaUpwindTestCase):
     _ADVEC_CLS = LonUpwindConstP
     _DERIV_FWD_CLS = SphereEtaFwdDeriv
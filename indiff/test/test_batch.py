@@ -0,0 +1,68 @@
+import sys
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR
+from indiff.advec import SphereEtaBatchUpwind, SphereEtaUpwind
+from . import SphereEtaTestCase
+
+
+class SphereEtaBatchUpwindTestCase(SphereEtaTestCase):
+    def setUp(self):
+        super(SphereEtaBatchUpwindTestCase, self).setUp()
+        randstate = np.random.RandomState(54321)
+        self.tracers = xr.concat(
+            [self._field(randstate.rand(*self.shape)) for _ in range(3)],
+            dim='tracer'
+        )
+        self.batch_obj = SphereEtaBatchUpwind(self.u, self.v, self.omega,
+                                              self.pk, self.bk, self.ps)
+
+
+class TestSphereEtaBatchUpwind(SphereEtaBatchUpwindTestCase):
+    def test_matches_single(self):
+        flows = {'advec_x_const_p': [self.u], 'advec_y_const_p': [self.v],
+                 'advec_horiz_const_p': [self.u, self.v],
+                 'advec_p': [self.omega],
+                 'advec_3d': [self.u, self.v, self.omega]}
+        for method, args in flows.items():
+            actual = getattr(self.batch_obj, method)(self.tracers)
+            for num in range(self.tracers.sizes['tracer']):
+                desired = getattr(
+                    SphereEtaUpwind(self.tracers.isel(tracer=num), self.pk,
+                                    self.bk, self.ps), method
+                )(*args)
+                xr.testing.assert_allclose(actual.isel(tracer=num),
+                                           desired.transpose(*self.u.dims))
+
+    def test_dims_order(self):
+        tracers = self.tracers.transpose(LON_STR, 'tracer', PFULL_STR,
+                                         LAT_STR)
+        actual = self.batch_obj.advec_3d(tracers)
+        self.assertEqual(actual.dims, tracers.dims)
+        xr.testing.assert_allclose(
+            actual, self.batch_obj.advec_3d(self.tracers).transpose(
+                *tracers.dims)
+        )
+
+    def test_dataset(self):
+        tracers = xr.Dataset({'a': self.tracers.isel(tracer=0),
+                              'b': self.tracers.isel(tracer=1)})
+        actual = self.batch_obj.advec_3d(tracers)
+        self.assertEqual(sorted(actual.data_vars), ['a', 'b'])
+        xr.testing.assert_allclose(
+            actual['b'], self.batch_obj.advec_3d(self.tracers).isel(
+                tracer=1, drop=True)
+        )
+
+    def test_zero_flow(self):
+        zeros = xr.zeros_like(self.u)
+        batch_obj = SphereEtaBatchUpwind(zeros, zeros, zeros, self.pk,
+                                         self.bk, self.ps)
+        self.assertAllZeros(batch_obj.advec_3d(self.tracers))
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
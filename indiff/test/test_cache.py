@@ -0,0 +1,89 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import xarray as xr
+
+from indiff import CenDeriv, ResultCache, Upwind
+
+from . import InfiniteDiffTestCase
+
+
+class TestResultCache(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestResultCache, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.cache = ResultCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _run(self, arr, **kwargs):
+        return self.cache.run(CenDeriv, args=(arr, self.dim), kwargs=kwargs)
+
+    def test_hit(self):
+        desired = CenDeriv(self.random, self.dim, order=4).deriv()
+        xr.testing.assert_identical(self._run(self.random, order=4), desired)
+        key = self.cache.key(CenDeriv, args=(self.random, self.dim),
+                             kwargs=dict(order=4))
+        self.assertIn(key, self.cache)
+        xr.testing.assert_identical(self._run(self.random.copy(), order=4),
+                                    desired)
+        self.assertEqual(len(self.cache._entries()), 1)
+
+    def test_key(self):
+        key = self.cache.key(CenDeriv, args=(self.random, self.dim))
+        self.assertEqual(key, self.cache.key(CenDeriv,
+                                             args=(self.random.copy(),
+                                                   self.dim)))
+        arr = self.random.copy()
+        arr[self.dim] = arr[self.dim] + 1
+        for other in [
+                self.cache.key(CenDeriv, args=(self.random2, self.dim)),
+                self.cache.key(CenDeriv, args=(arr, self.dim)),
+                self.cache.key(CenDeriv,
+                               args=(self.random.rename('a'), self.dim)),
+                self.cache.key(CenDeriv, args=(self.random, self.dim),
+                               kwargs=dict(fill_edge=False)),
+                self.cache.key(Upwind, args=(self.random, self.dim)),
+        ]:
+            self.assertNotEqual(key, other)
+
+    def test_attrs(self):
+        for units in ['K', 'm']:
+            actual = self._run(self.random.assign_attrs(units=units))
+            self.assertEqual(actual.attrs, {'units': units})
+        self.assertEqual(len(self.cache._entries()), 2)
+
+    def test_chunked(self):
+        cache = ResultCache(self.path, chunk_bytes=self.random[0].nbytes)
+        desired = CenDeriv(self.random, self.dim).deriv()
+        cache.run(CenDeriv, args=(self.random, self.dim))
+        actual = cache.run(CenDeriv, args=(self.random, self.dim))
+        xr.testing.assert_identical(actual, desired)
+        key = cache._entries()[0]
+        chunks = [name for name in os.listdir(cache._entry(key))
+                  if name.startswith('chunk')]
+        self.assertEqual(len(chunks), self.dummy_len)
+
+    def test_evict_lru(self):
+        arrs = [self.random, self.random2, self.random + 1]
+        keys = [self.cache.key(CenDeriv, args=(arr, self.dim))
+                for arr in arrs[:2]]
+        for i, arr in enumerate(arrs[:2]):
+            self._run(arr)
+            meta = os.path.join(self.cache._entry(keys[i]), self.cache._META)
+            os.utime(meta, (i, i))
+        # Using the first makes the second the least recently used.
+        self._run(arrs[0])
+        self.cache.max_bytes = self.cache.nbytes
+        self._run(arrs[2])
+        self.assertIn(keys[0], self.cache)
+        self.assertNotIn(keys[1], self.cache)
+        self.assertLessEqual(self.cache.nbytes, self.cache.max_bytes)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
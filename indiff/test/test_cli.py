@@ -0,0 +1,120 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from indiff import cli
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR
+from indiff.advec import SphereEtaUpwind
+from indiff.deriv import SphereCenDeriv
+
+from . import InfiniteDiffTestCase
+
+
+class TestCli(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestCli, self).setUp()
+        randstate = np.random.RandomState(12345)
+        time = np.arange(5)
+        shape = (len(time), len(self.pfull), len(self.lat), len(self.lon))
+        dims = ['time', PFULL_STR, LAT_STR, LON_STR]
+        coords = {'time': time, PFULL_STR: self.pfull, LAT_STR: self.lat,
+                  LON_STR: self.lon}
+        self.ds = xr.Dataset({
+            'temp': (dims, randstate.rand(*shape)),
+            'ucomp': (dims, randstate.rand(*shape) - 0.5),
+            'vcomp': (dims, randstate.rand(*shape) - 0.5),
+            'omega': (dims, randstate.rand(*shape) - 0.5),
+            'ps': (['time', LAT_STR, LON_STR],
+                   randstate.rand(len(time), len(self.lat),
+                                  len(self.lon))*1e3 + 1e5),
+            'pk': (['phalf'], np.asarray(self.pk)),
+            'bk': (['phalf'], np.asarray(self.bk)),
+        }, coords=coords)
+        self.written = {}
+
+    def _write(self, result, path, index, job):
+        self.written.setdefault(path, {})[index] = result
+        return path
+
+    def _main(self, argv):
+        with mock.patch.object(cli, '_open', return_value=self.ds), \
+             mock.patch.object(cli, '_write', side_effect=self._write):
+            cli.main(argv)
+        self.assertEqual(len(self.written), 1)
+        path, chunks = self.written.popitem()
+        return path, xr.concat([chunks[i] for i in sorted(chunks)],
+                               dim='time')
+
+    def test_operator_from_spec(self):
+        self.assertEqual(cli.operator_from_spec('SphereCenDeriv.d_dx'),
+                         (SphereCenDeriv, 'd_dx'))
+        self.assertEqual(cli.operator_from_spec('SphereEtaUpwind.advec_3d'),
+                         (SphereEtaUpwind, 'advec_3d'))
+        for spec in ['Nonexistent.deriv', 'SphereCenDeriv.nonexistent']:
+            with pytest.raises(ValueError):
+                cli.operator_from_spec(spec)
+
+    def test_deriv(self):
+        path, actual = self._main(['in.nc', '-v', 'temp', '-p',
+                                   'SphereCenDeriv.d_dx', '--option',
+                                   'order=4', '--chunk-size', '2'])
+        self.assertEqual(path, './in.SphereCenDeriv_d_dx.nc')
+        desired = SphereCenDeriv(self.ds['temp'], order=4).d_dx()
+        actual = actual['temp_d_dx']
+        xr.testing.assert_allclose(actual, desired.transpose(*actual.dims))
+
+    def test_advec_3d(self):
+        for workers in ['1', '2']:
+            _, actual = self._main([
+                'in.zarr', '-v', 'temp', '-p', 'SphereEtaUpwind.advec_3d',
+                '--pk', 'pk', '--bk', 'bk', '--ps', 'ps', '--method-args',
+                'ucomp', 'vcomp', 'omega', '--chunk-size', '2', '--workers',
+                workers
+            ])
+            desired = SphereEtaUpwind(
+                self.ds['temp'], self.ds['pk'], self.ds['bk'], self.ds['ps']
+            ).advec_3d(self.ds['ucomp'], self.ds['vcomp'], self.ds['omega'])
+            actual = actual['temp_advec_3d']
+            xr.testing.assert_allclose(actual,
+                                       desired.transpose(*actual.dims))
+
+    def test_netcdf_parts(self):
+        paths = []
+
+        def to_netcdf(ds, path):
+            paths.append(path)
+
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        with mock.patch.object(cli, '_open', return_value=self.ds), \
+             mock.patch.object(xr.Dataset, 'to_netcdf', autospec=True,
+                               side_effect=to_netcdf), \
+             mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            cli.main(['in.nc', '-v', 'temp', '-p', 'SphereCenDeriv.d_dx',
+                      '-o', output_dir, '--chunk-size', '2'])
+        stem = os.path.join(output_dir, 'in.SphereCenDeriv_d_dx')
+        desired = [stem + '.nc', stem + '.0001.nc', stem + '.0002.nc']
+        self.assertEqual(paths, desired)
+        self.assertEqual(stdout.getvalue().split(), desired)
+
+    def test_missing_grid(self):
+        with pytest.raises(ValueError):
+            self._main(['in.nc', '-v', 'temp', '-p',
+                        'SphereEtaUpwind.advec_3d', '--method-args', 'ucomp',
+                        'vcomp', 'omega'])
+
+    def test_missing_dim(self):
+        with pytest.raises(ValueError):
+            self._main(['in.nc', '-v', 'temp', '-p', 'CenDeriv.deriv'])
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
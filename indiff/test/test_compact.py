@@ -0,0 +1,124 @@
+import sys
+import unittest
+import warnings
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR, _RADEARTH
+from indiff.coord import Eta
+from indiff.deriv import (CompactDeriv, LonCompactDeriv, LatCompactDeriv,
+                          EtaCompactDeriv)
+from indiff.kernels import compact_deriv
+from . import InfiniteDiffTestCase
+
+
+def _max_error(num_points, order, cyclic):
+    if cyclic:
+        coord = np.arange(num_points)*2*np.pi / num_points
+    else:
+        coord = np.linspace(0., 1., num_points)
+    values = np.sin(3*coord + 0.3)*np.ones((2, 1))
+    actual = compact_deriv(values, coord, order=order, cyclic=cyclic,
+                           circumf=2*np.pi)
+    error = np.abs(actual - 3*np.cos(3*coord + 0.3))
+    if not cyclic:
+        # Away from the lower-order edges.
+        error = error[:, num_points // 4:-(num_points // 4)]
+    return error.max()
+
+
+class TestCompactDerivKernel(unittest.TestCase):
+    def test_convergence(self):
+        for cyclic in [True, False]:
+            for order in [4, 6]:
+                errors = [_max_error(num_points, order, cyclic)
+                          for num_points in [32, 64]]
+                self.assertGreater(np.log2(errors[0] / errors[1]),
+                                   order - 0.2)
+
+    def test_polynomial(self):
+        coord = np.linspace(-1., 2., 12)
+        for order in [4, 6]:
+            np.testing.assert_allclose(
+                compact_deriv(coord**3, coord, order=order), 3*coord**2
+            )
+
+    def test_nonuniform(self):
+        coord = (np.linspace(0., 1., 40) + 0.5)**2
+        actual = compact_deriv(np.sin(coord), coord, order=6)
+        np.testing.assert_allclose(actual, np.cos(coord), atol=1e-3)
+
+    def test_cyclic_offset(self):
+        coord = np.arange(24)*2*np.pi / 24 + 1.
+        actual = compact_deriv(np.sin(coord), coord, cyclic=True,
+                               circumf=2*np.pi, order=6)
+        np.testing.assert_allclose(actual, np.cos(coord), atol=1e-6)
+
+    def test_axis_out(self):
+        coord = np.linspace(0., 1., 10)
+        values = np.random.RandomState(12345).rand(10, 3)
+        out = np.empty_like(values)
+        actual = compact_deriv(values, coord, axis=0, out=out)
+        self.assertIs(actual, out)
+        np.testing.assert_allclose(actual,
+                                   compact_deriv(values.T, coord).T)
+
+    def test_bad_args(self):
+        coord = np.arange(10.)
+        self.assertRaises(ValueError, compact_deriv, coord, coord, order=5)
+        self.assertRaises(ValueError, compact_deriv, coord[:4], coord[:4])
+
+
+class TestCompactDeriv(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestCompactDeriv, self).setUp()
+        self.lon_rad = np.deg2rad(self.lon)
+        self.lat_rad = np.deg2rad(self.lat)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.arr = np.sin(self.lat_rad)*np.cos(self.lon_rad)
+
+    def test_deriv(self):
+        arr = self.arange**2
+        actual = CompactDeriv(arr, self.dim).deriv()
+        xr.testing.assert_allclose(actual, 2*self.arange)
+
+    def test_bad_order(self):
+        with pytest.raises(ValueError):
+            CompactDeriv(self.arange, self.dim, order=2)
+
+    def test_lon(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            actual = LonCompactDeriv(self.arr, order=6).deriv(self.lat)
+        desired = (-np.sin(self.lat_rad)*np.sin(self.lon_rad) /
+                   (_RADEARTH*np.cos(self.lat_rad)))
+        xr.testing.assert_allclose(actual, desired.transpose(*actual.dims),
+                                   atol=1e-12)
+
+    def test_lat(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            actual = LatCompactDeriv(self.arr, order=6).deriv('divg')
+        desired = (np.cos(2*self.lat_rad)*np.cos(self.lon_rad) /
+                   (_RADEARTH*np.cos(self.lat_rad)))
+        interior = {LAT_STR: slice(2, -2)}
+        xr.testing.assert_allclose(actual[interior],
+                                   desired.transpose(*actual.dims)[interior],
+                                   rtol=1e-3)
+
+    def test_eta(self):
+        ps = xr.DataArray(
+            1e5 + 1e3*np.cos(self.lon_rad)*np.cos(self.lat_rad),
+            dims=[LON_STR, LAT_STR]
+        )
+        pfull = Eta(self.pk, self.bk, self.pfull).pfull_from_ps(ps)
+        actual = EtaCompactDeriv(2*pfull, self.pk, self.bk, ps).deriv()
+        self.assertEqual(set(actual.dims), {PFULL_STR, LAT_STR, LON_STR})
+        np.testing.assert_allclose(actual, 2.)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
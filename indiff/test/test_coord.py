@@ -3,6 +3,7 @@ import unittest
 
 
 import numpy as np
+import xarray as xr
 
 from indiff._constants import LON_STR, LAT_STR, PHALF_STR
 from indiff.utils import to_radians
@@ -189,7 +190,11 @@ class SigmaTestCase(VertCoordTestCase):
 
 
 class TestSigma(SigmaTestCase, TestVertCoord):
-    pass
+    def test_pressure(self):
+        ps = 1e5 + 1e3*self.random
+        actual = self.coord_obj.pressure(ps)
+        self.assertEqual(set(actual.dims), set(ps.dims) | {self.dim})
+        xr.testing.assert_allclose(actual, ps*self.sigma)
 
 
 class EtaTestCase(VertCoordTestCase):
@@ -1,3 +1,4 @@
+import itertools
 import sys
 import unittest
 
@@ -342,6 +343,51 @@ class TestCenDeriv(TestFiniteDeriv, CenDerivTestCase):
         xr.testing.assert_identical(actual, desired)
 
 
+class TestCenDerivAt(CenDerivTestCase):
+    def setUp(self):
+        super(TestCenDerivAt, self).setUp()
+        self.indexers = {self.dummy_dim: [0, 2, 1, 2, 0],
+                         self.dim: [0, 1, 2, 5, 9]}
+        self.points = {dim: xr.DataArray(ind, dims=['point'])
+                       for dim, ind in self.indexers.items()}
+
+    def test_matches_deriv(self):
+        # The data is too short for the wider stencils at spacing 2.
+        for order, spacing in (list(itertools.product([2, 4], [1, 2])) +
+                               [(6, 1), (8, 1)]):
+            kwargs = dict(order=order, spacing=spacing)
+            desired = self._DERIV_CLS(self.random, self.dim,
+                                      **kwargs).deriv().isel(**self.points)
+            actual = self._DERIV_CLS(self.random, self.dim,
+                                     **kwargs).deriv_at(self.indexers)
+            xr.testing.assert_allclose(actual, desired)
+
+    def test_no_fill_edge(self):
+        actual = self._DERIV_CLS(self.random, self.dim, order=4,
+                                 fill_edge=False).deriv_at(self.indexers)
+        self.assertTrue(actual[[0, 1, 4]].isnull().all())
+        desired = self._DERIV_CLS(self.random, self.dim, order=4,
+                                  fill_edge=False).deriv()
+        desired = desired.reindex(**{self.dim: self.random[self.dim]})
+        xr.testing.assert_allclose(actual, desired.isel(**self.points))
+
+    def test_dims_retained(self):
+        actual = self._DERIV_CLS(self.random, self.dim).deriv_at(
+            {self.dim: [3, 4]}, point_dim='station'
+        )
+        self.assertEqual(actual.dims, (self.dummy_dim, 'station'))
+        desired = self._DERIV_CLS(self.random, self.dim).deriv()
+        xr.testing.assert_allclose(actual, desired.isel(**{
+            self.dim: xr.DataArray([3, 4], dims=['station'])
+        }))
+
+    def test_missing_dim(self):
+        with pytest.raises(ValueError):
+            self._DERIV_CLS(self.random, self.dim).deriv_at(
+                {self.dummy_dim: [0]}
+            )
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
 
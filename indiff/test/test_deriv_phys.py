@@ -1,3 +1,4 @@
+import itertools
 import sys
 import unittest
 
@@ -6,14 +7,19 @@ import xarray as xr
 
 from indiff._constants import LON_STR, LAT_STR, PFULL_STR
 from indiff.utils import wraparound
+from indiff.workspace import Workspace
 from indiff.deriv import (
     PhysDeriv, LonDeriv, LatDeriv, SphereEtaDeriv,
     LonFwdDeriv, LatFwdDeriv, EtaFwdDeriv, SphereFwdDeriv,
     LonBwdDeriv, LatBwdDeriv, EtaBwdDeriv, SphereBwdDeriv,
-    SphereEtaFwdDeriv, SphereEtaBwdDeriv
+    SphereEtaFwdDeriv, SphereEtaBwdDeriv, LonCenDeriv, LatCenDeriv,
+    EtaCenDeriv, FwdDeriv, BwdDeriv, CenDeriv, PressureDeriv,
+    PressureFwdDeriv, PressureBwdDeriv, PressureCenDeriv, SphereCenDeriv,
+    SpherePressureCenDeriv, SigmaDeriv, SigmaCenDeriv, SphereSigmaCenDeriv,
+    ZDeriv, ZFwdDeriv, ZBwdDeriv, ZCenDeriv
 )
 
-from . import InfiniteDiffTestCase
+from . import InfiniteDiffTestCase, SphereEtaTestCase
 
 
 class PhysDerivSharedTests(object):
@@ -361,6 +367,197 @@ class TestEtaBwdDeriv(TestEtaFwdDeriv, EtaBwdDerivTestCase):
     pass
 
 
+class PressureDerivTestCase(InfiniteDiffTestCase):
+    _DERIV_CLS = PressureDeriv
+
+    def setUp(self):
+        super(PressureDerivTestCase, self).setUp()
+        self.dim = self.pressure.dims[0]
+        self.arr = xr.DataArray(
+            np.random.random((len(self.lat), len(self.pressure))),
+            dims=[LAT_STR, self.dim],
+            coords={LAT_STR: self.lat, self.dim: self.pressure}
+        )
+        self.deriv_obj = self._DERIV_CLS(self.arr, self.dim)
+
+
+class TestPressureDeriv(PhysDerivSharedTests, PressureDerivTestCase):
+    def test_deriv(self):
+        self.assertNotImplemented(self.deriv_obj.deriv)
+
+
+class TestPressureOneSidedDeriv(PressureDerivTestCase):
+    def test_deriv(self):
+        for (cls, generic_cls), order, fill_edge in itertools.product(
+                [(PressureFwdDeriv, FwdDeriv), (PressureBwdDeriv, BwdDeriv)],
+                [1, 2], [True, False]):
+            actual = cls(self.arr, self.dim, order=order,
+                         fill_edge=fill_edge).deriv()
+            desired = generic_cls(self.arr, self.dim, order=order,
+                                  fill_edge=fill_edge).deriv()
+            xr.testing.assert_allclose(actual, desired.transpose(*actual.dims))
+
+
+class TestPressureCenDeriv(PressureDerivTestCase):
+    _DERIV_CLS = PressureCenDeriv
+
+    def test_deriv(self):
+        for order, spacing, fill_edge in itertools.product([2, 4], [1, 2],
+                                                           [True, False]):
+            actual = self._DERIV_CLS(self.arr, self.dim, spacing=spacing,
+                                     order=order, fill_edge=fill_edge).deriv()
+            desired = CenDeriv(self.arr, self.dim, spacing=spacing,
+                               order=order, fill_edge=fill_edge).deriv()
+            xr.testing.assert_allclose(actual, desired.transpose(*actual.dims))
+
+    def test_deriv_linear(self):
+        p = 100.*self.arr[self.dim]
+        actual = self._DERIV_CLS(self.arr[self.dim]*3., self.dim,
+                                 p=p).deriv()
+        np.testing.assert_allclose(actual, 0.03)
+
+    def test_weights_shared(self):
+        other = self._DERIV_CLS(self.arr.copy()*2, self.dim)
+        self.assertIs(other.weights, self.deriv_obj.weights)
+
+
+class TestSpherePressureCenDeriv(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestSpherePressureCenDeriv, self).setUp()
+        self.dim = self.pressure.dims[0]
+        self.arr = xr.DataArray(
+            np.random.random((len(self.pressure), len(self.lat),
+                              len(self.lon))),
+            dims=[self.dim, LAT_STR, LON_STR],
+            coords={self.dim: self.pressure, LAT_STR: self.lat,
+                    LON_STR: self.lon}
+        )
+        self.deriv_obj = SpherePressureCenDeriv(self.arr, self.dim)
+
+    def test_d_dp(self):
+        xr.testing.assert_allclose(
+            self.deriv_obj.d_dp(), CenDeriv(self.arr, self.dim).deriv()
+        )
+
+    def test_grad_3d(self):
+        desired = (SphereCenDeriv(self.arr).horiz_grad() +
+                   CenDeriv(self.arr, self.dim).deriv())
+        xr.testing.assert_allclose(self.deriv_obj.grad_3d(), desired)
+
+
+class ZDerivTestCase(InfiniteDiffTestCase):
+    _DERIV_CLS = ZDeriv
+
+    def setUp(self):
+        super(ZDerivTestCase, self).setUp()
+        self.dim = 'level'
+        dims = ['time', self.dim, LAT_STR, LON_STR]
+        shape = (3, 12, len(self.lat), len(self.lon))
+        randstate = np.random.RandomState(12345)
+        # Height increasing upwards, by a different amount in each column.
+        self.z = xr.DataArray(
+            300.*np.cumsum(0.5 + randstate.rand(*shape), axis=1), dims=dims,
+            coords={LAT_STR: self.lat, LON_STR: self.lon}
+        )
+        self.arr = xr.DataArray(randstate.rand(*shape), dims=dims,
+                                coords=self.z.coords)
+        self.deriv_obj = self._DERIV_CLS(self.arr, self.z, self.dim)
+
+
+class TestZDeriv(PhysDerivSharedTests, ZDerivTestCase):
+    def test_deriv(self):
+        self.assertNotImplemented(self.deriv_obj.deriv)
+
+
+class TestZDerivs(ZDerivTestCase):
+    def test_deriv(self):
+        for (cls, generic_cls, orders), fill_edge in itertools.product(
+                [(ZFwdDeriv, FwdDeriv, [1, 2]), (ZBwdDeriv, BwdDeriv, [1, 2]),
+                 (ZCenDeriv, CenDeriv, [2, 4])], [True, False]):
+            for order in orders:
+                actual = cls(self.arr, self.z, self.dim, order=order,
+                             fill_edge=fill_edge).deriv()
+                # The workspace selects the generic numpy kernels.
+                desired = generic_cls(self.arr, self.dim, coord=self.z,
+                                      order=order, fill_edge=fill_edge,
+                                      workspace=Workspace()).deriv()
+                xr.testing.assert_allclose(actual,
+                                           desired.transpose(*actual.dims))
+
+    def test_deriv_other_field(self):
+        deriv_obj = ZCenDeriv(self.arr, self.z, self.dim)
+        other = (2*self.arr).transpose(LON_STR, self.dim, 'time', LAT_STR)
+        xr.testing.assert_allclose(deriv_obj.deriv(other),
+                                   2*deriv_obj.deriv())
+
+    def test_deriv_z_fewer_dims(self):
+        z = self.z.isel(time=0, drop=True)
+        actual = ZCenDeriv(self.arr, z, self.dim).deriv()
+        desired = CenDeriv(self.arr, self.dim, coord=z).deriv()
+        xr.testing.assert_allclose(actual, desired.transpose(*actual.dims))
+
+    def test_deriv_linear(self):
+        actual = ZCenDeriv(3.*self.z, self.z, self.dim, order=4).deriv()
+        np.testing.assert_allclose(actual, 3.)
+
+
+class SigmaDerivTestCase(InfiniteDiffTestCase):
+    _DERIV_CLS = SigmaDeriv
+
+    def setUp(self):
+        super(SigmaDerivTestCase, self).setUp()
+        self.dim = self.sigma.dims[0]
+        self.arr = xr.DataArray(
+            np.random.random((len(self.sigma), len(self.lat),
+                              len(self.lon))),
+            dims=[self.dim, LAT_STR, LON_STR],
+            coords={self.dim: self.sigma, LAT_STR: self.lat,
+                    LON_STR: self.lon}
+        )
+        self.ps = xr.DataArray(
+            np.random.random((len(self.lat), len(self.lon))),
+            dims=[LAT_STR, LON_STR],
+            coords={LAT_STR: self.lat, LON_STR: self.lon}
+        )*1e3 + 1e5
+        self.deriv_obj = self._DERIV_CLS(self.arr, self.ps, self.dim)
+
+
+class TestSigmaDeriv(PhysDerivSharedTests, SigmaDerivTestCase):
+    def test_deriv(self):
+        self.assertNotImplemented(self.deriv_obj.deriv)
+
+
+class TestSigmaCenDeriv(SigmaDerivTestCase):
+    _DERIV_CLS = SigmaCenDeriv
+
+    def test_deriv(self):
+        pressure = self.ps*self.sigma
+        for order in [2, 4]:
+            actual = self._DERIV_CLS(self.arr, self.ps, self.dim,
+                                     order=order).deriv()
+            desired = CenDeriv(self.arr, self.dim, coord=pressure,
+                               order=order).deriv()
+            xr.testing.assert_allclose(actual, desired.transpose(*actual.dims))
+
+
+class TestSphereSigmaCenDeriv(SigmaDerivTestCase):
+    _DERIV_CLS = SigmaCenDeriv
+
+    def test_horiz_grad_const_p(self):
+        # A function of pressure alone has no gradient at constant pressure,
+        # up to truncation error, though it does along the sigma levels.
+        arr = np.sin(self.ps*self.sigma / 3e4).transpose(*self.arr.dims)
+        deriv_obj = SphereSigmaCenDeriv(arr, self.ps, self.dim)
+        along_sigma = abs(deriv_obj.horiz_grad()).max()
+        const_p = abs(deriv_obj.horiz_grad_const_p()).max()
+        self.assertLess(const_p, 0.1*along_sigma)
+
+    def test_d_dp(self):
+        deriv_obj = SphereSigmaCenDeriv(self.arr, self.ps, self.dim)
+        xr.testing.assert_allclose(deriv_obj.d_dp(),
+                                   self.deriv_obj.deriv())
+
+
 class SphereEtaDerivTestCase(InfiniteDiffTestCase):
     _DERIV_CLS = SphereEtaDeriv
 
@@ -438,5 +635,44 @@ class TestSphereEtaBwdDeriv(TestSphereEtaFwdDeriv, SphereEtaBwdDerivTestCase):
     pass
 
 
+class TestCenDerivAt(SphereEtaTestCase):
+    def setUp(self):
+        super(TestCenDerivAt, self).setUp()
+        # Includes points at the edges of each dim.
+        self.indexers = {PFULL_STR: [0, 5, 21, 10],
+                         LAT_STR: [0, 17, 3, 9],
+                         LON_STR: [35, 0, 1, 20]}
+        self.points = {dim: xr.DataArray(ind, dims=['point'])
+                       for dim, ind in self.indexers.items()}
+
+    def test_lon_cyclic(self):
+        for order in [2, 4]:
+            deriv_obj = LonCenDeriv(self.arr, LON_STR, order=order)
+            desired = deriv_obj.deriv(self.arr[LAT_STR])
+            desired = desired.sel(**{LON_STR: self.lon}).isel(**self.points)
+            actual = deriv_obj.deriv_at(self.indexers, self.arr[LAT_STR])
+            xr.testing.assert_allclose(actual, desired)
+
+    def test_lat(self):
+        for order, oper in itertools.product([2, 4], ['grad', 'divg']):
+            deriv_obj = LatCenDeriv(self.arr, LAT_STR, order=order)
+            desired = deriv_obj.deriv(oper).isel(**self.points)
+            actual = deriv_obj.deriv_at(self.indexers, oper)
+            xr.testing.assert_allclose(actual, desired)
+
+    def test_eta(self):
+        for order in [2, 4]:
+            deriv_obj = EtaCenDeriv(self.arr, self.pk, self.bk, self.ps,
+                                    order=order)
+            desired = deriv_obj.deriv().isel(**self.points)
+            actual = deriv_obj.deriv_at(self.indexers)
+            xr.testing.assert_allclose(actual, desired)
+
+    def test_not_implemented(self):
+        with self.assertRaises(NotImplementedError):
+            LonFwdDeriv(self.arr, LON_STR).deriv_at(self.indexers,
+                                                    self.arr[LAT_STR])
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
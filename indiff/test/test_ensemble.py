@@ -0,0 +1,110 @@
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+
+import pytest
+import xarray as xr
+
+from indiff import CenDeriv, EnsembleRunner
+
+from . import InfiniteDiffTestCase
+
+
+class FlakyDeriv(CenDeriv):
+    """Fails, or crashes its process, on the first attempt per member."""
+    def __init__(self, arr, dim, path=None, crash=False, crash_sum=None,
+                 **kwargs):
+        super(FlakyDeriv, self).__init__(arr, dim, **kwargs)
+        self.path = path
+        self.crash = crash
+        # If given, only the member with this sum crashes.
+        self.crash_sum = crash_sum
+
+    def deriv(self):
+        total = float(self.arr.sum())
+        marker = os.path.join(self.path, str(total))
+        if not os.path.exists(marker):
+            open(marker, 'w').close()
+            if self.crash and self.crash_sum in [None, total]:
+                os._exit(1)
+            raise ValueError('flaky')
+        return super(FlakyDeriv, self).deriv()
+
+
+class TestEnsembleRunner(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestEnsembleRunner, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.members = [self.random, self.random2, self.arange]
+        self.desired = [CenDeriv(arr, self.dim, order=4).deriv()
+                        for arr in self.members]
+        self.runner = EnsembleRunner(processes=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_arrays(self):
+        actual = self.runner.run(CenDeriv, self.members, args=(self.dim,),
+                                 kwargs=dict(order=4))
+        for act, des in zip(actual, self.desired):
+            xr.testing.assert_identical(act, des)
+
+    def test_files(self):
+        paths = []
+        for i, arr in enumerate(self.members):
+            paths.append(os.path.join(self.path, '{}.pkl'.format(i)))
+            with open(paths[-1], 'wb') as f:
+                pickle.dump(arr, f)
+
+        def load(path):
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+
+        actual = self.runner.run(CenDeriv, paths, args=(self.dim,),
+                                 kwargs=dict(order=4), load=load,
+                                 concat_dim='member')
+        xr.testing.assert_identical(actual,
+                                    xr.concat(self.desired, dim='member'))
+
+    def test_retries(self):
+        for crash in [False, True]:
+            path = tempfile.mkdtemp(dir=self.path)
+            actual = self.runner.run(
+                FlakyDeriv, self.members, args=(self.dim,),
+                kwargs=dict(order=4, path=path, crash=crash)
+            )
+            for act, des in zip(actual, self.desired):
+                xr.testing.assert_identical(act, des)
+
+    def test_crash_not_charged_to_others(self):
+        # The others fail once themselves, so would exceed a single retry
+        # if also charged for the crash.
+        runner = EnsembleRunner(processes=2, retries=1)
+        actual = runner.run(
+            FlakyDeriv, self.members, args=(self.dim,),
+            kwargs=dict(order=4, path=self.path, crash=True,
+                        crash_sum=float(self.members[0].sum()))
+        )
+        for act, des in zip(actual, self.desired):
+            xr.testing.assert_identical(act, des)
+
+    def test_retries_exhausted(self):
+        runner = EnsembleRunner(processes=2, retries=0)
+        for crash in [False, True]:
+            path = tempfile.mkdtemp(dir=self.path)
+            with pytest.raises(RuntimeError):
+                runner.run(FlakyDeriv, self.members, args=(self.dim,),
+                           kwargs=dict(path=path, crash=crash))
+
+    def test_memory_limit(self):
+        runner = EnsembleRunner(processes=1, max_bytes_per_worker=2**34)
+        actual = runner.run(CenDeriv, self.members[:1], args=(self.dim,),
+                            kwargs=dict(order=4))
+        xr.testing.assert_identical(actual[0], self.desired[0])
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,131 @@
+import sys
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR
+from indiff.advec import (FluxDiv, LonFluxDiv, LatFluxDiv, EtaFluxDiv,
+                          SphereEtaFluxDiv)
+from indiff.kernels import flux_div
+from . import InfiniteDiffTestCase, SphereEtaTestCase
+
+
+class TestFluxDivKernel(unittest.TestCase):
+    def setUp(self):
+        randstate = np.random.RandomState(12345)
+        self.values = randstate.rand(4, 12)
+        self.flow = randstate.rand(4, 12) - 0.5
+        self.widths = randstate.rand(12) + 0.5
+
+    def test_conservation(self):
+        for scheme in ['upwind', 'centered']:
+            for cyclic in [False, True]:
+                div = flux_div(self.values, self.flow, self.widths,
+                               scheme=scheme, cyclic=cyclic)
+                np.testing.assert_allclose((div*self.widths).sum(axis=-1),
+                                           0, atol=1e-14)
+
+    def test_upwind(self):
+        flow = np.ones_like(self.values)
+        div = flux_div(self.values, flow, self.widths, cyclic=True)
+        expected = ((self.values - np.roll(self.values, 1, axis=-1)) /
+                    self.widths)
+        np.testing.assert_allclose(div, expected)
+
+    def test_centered(self):
+        flow = np.ones_like(self.values)
+        div = flux_div(self.values, flow, self.widths, scheme='centered',
+                       cyclic=True)
+        expected = 0.5*(np.roll(self.values, -1, axis=-1) -
+                        np.roll(self.values, 1, axis=-1)) / self.widths
+        np.testing.assert_allclose(div, expected)
+
+    def test_out(self):
+        out = np.empty_like(self.values)
+        div = flux_div(self.values, self.flow, self.widths, out=out)
+        self.assertIs(div, out)
+
+    def test_bad_scheme(self):
+        self.assertRaises(ValueError, flux_div, self.values, self.flow,
+                          self.widths, scheme='bogus')
+
+
+class TestFluxDiv(InfiniteDiffTestCase):
+    def test_uniform(self):
+        div = FluxDiv(self.ones, self.ones, self.dim, cyclic=True,
+                      circumf=self.array_len).advec()
+        self.assertAllZeros(div)
+
+    def test_conservation(self):
+        obj = FluxDiv(self.random2 - 0.5, self.random, self.dim)
+        total = (obj.advec()*obj.widths).sum(self.dim)
+        np.testing.assert_allclose(total, 0, atol=1e-14)
+
+    def test_bad_scheme(self):
+        self.assertRaises(ValueError, FluxDiv, self.ones, self.ones,
+                          self.dim, scheme='bogus')
+
+
+class SphereFluxTestCase(SphereEtaTestCase):
+    def setUp(self):
+        super(SphereFluxTestCase, self).setUp()
+        self.flux_obj = SphereEtaFluxDiv(self.arr, self.pk, self.bk, self.ps)
+
+    def _global_integral(self, div):
+        return (div*self.flux_obj.cell_area()).sum([LAT_STR, LON_STR])
+
+
+class TestSphereEtaFluxDiv(SphereFluxTestCase):
+    def test_cell_area(self):
+        np.testing.assert_allclose(self.flux_obj.cell_area().sum(),
+                                   4*np.pi*self.flux_obj.radius**2)
+
+    def test_horiz_conservation(self):
+        for scheme in ['upwind', 'centered']:
+            flux_obj = SphereEtaFluxDiv(self.arr, self.pk, self.bk, self.ps,
+                                        scheme=scheme)
+            total = self._global_integral(flux_obj.advec_horiz(self.u,
+                                                               self.v))
+            scale = self._global_integral(np.abs(
+                flux_obj.advec_horiz(self.u, self.v)))
+            np.testing.assert_allclose(total / scale, 0, atol=1e-12)
+
+    def test_vert_conservation(self):
+        div = self.flux_obj.advec_p(self.omega)
+        total = (div*self.flux_obj.dp).sum(PFULL_STR)
+        scale = (np.abs(div)*self.flux_obj.dp).sum(PFULL_STR)
+        np.testing.assert_allclose(total / scale, 0, atol=1e-12)
+
+    def test_uniform_zonal_flow(self):
+        ones = xr.ones_like(self.arr)
+        div = SphereEtaFluxDiv(ones, self.pk, self.bk,
+                               self.ps).advec_x(10.*ones)
+        self.assertAllZeros(div)
+
+    def test_advec_3d(self):
+        expected = (self.flux_obj.advec_x(self.u) +
+                    self.flux_obj.advec_y(self.v) +
+                    self.flux_obj.advec_p(self.omega))
+        xr.testing.assert_allclose(
+            self.flux_obj.advec_3d(self.u, self.v, self.omega), expected
+        )
+
+    def test_matches_components(self):
+        xr.testing.assert_allclose(
+            self.flux_obj.advec_x(self.u),
+            LonFluxDiv(self.u, self.arr).advec()
+        )
+        xr.testing.assert_allclose(
+            self.flux_obj.advec_y(self.v),
+            LatFluxDiv(self.v, self.arr).advec()
+        )
+        xr.testing.assert_allclose(
+            self.flux_obj.advec_p(self.omega),
+            EtaFluxDiv(self.omega, self.arr, self.pk, self.bk,
+                       self.ps).advec()
+        )
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -1,11 +1,18 @@
 import sys
 import unittest
 
-from indiff.coord import VertCoord, Eta
-from indiff.geom import (HorizGeom, HorizCartesian, HorizSphere, HorizVertGeom,
-                         SphereEtaGeom)
+import numpy as np
+import xarray as xr
 
-from . import InfiniteDiffTestCase
+from indiff._constants import LAT_STR, PFULL_STR
+from indiff.advec.phys import LonUpwind, LatUpwind
+from indiff.coord import Pressure, Eta
+from indiff.deriv import SphereCenDeriv
+from indiff.deriv.phys import SphereEtaCenDeriv
+from indiff.geom import (HorizGeom, HorizCartesian, HorizSphere,
+                         SpherePressureGeom, SphereEtaGeom)
+
+from . import InfiniteDiffTestCase, SphereEtaTestCase
 
 
 class HorizGeomSharedTests(object):
@@ -58,16 +65,73 @@ class TestHorizSphere(HorizSphereTestCase, TestHorizGeom):
     pass
 
 
-# class HorizVertGeomTestCase(InfiniteDiffTestCase):
-#     _GEOM_CLS = HorizVertGeom
+class SphereGeomOperatorsTestCase(SphereEtaTestCase):
+    def assertClose(self, actual, desired):
+        xr.testing.assert_allclose(actual.transpose(*desired.dims), desired)
+
+
+class TestHorizSphereOperators(SphereGeomOperatorsTestCase):
+    def setUp(self):
+        super(TestHorizSphereOperators, self).setUp()
+        self.geom_obj = HorizSphere(self.lon, self.lat)
+
+    def test_metric_terms(self):
+        np.testing.assert_allclose(self.geom_obj.cos_lat,
+                                   np.cos(np.deg2rad(self.lat.values)))
+        self.assertEqual(len(self.geom_obj.x_halo_map),
+                         len(self.lon) + 2*self.geom_obj.halo)
+
+    def test_d_dx(self):
+        # The cyclic operator returns the wraparound points too.
+        self.assertClose(self.geom_obj.d_dx(self.arr),
+                         SphereCenDeriv(self.arr).d_dx().sel(lon=self.lon))
+
+    def test_d_dy(self):
+        for oper in ['grad', 'divg']:
+            self.assertClose(self.geom_obj.d_dy(self.arr, oper=oper),
+                             SphereCenDeriv(self.arr).d_dy(oper=oper))
 
-#     def setUp(self):
-#         super(HorizSphereTestCase, self).setUp()
-#         self.geom_obj = HorizVertGeomTestCase(self.x, self.y, self.z)
+    def test_advec(self):
+        self.assertClose(self.geom_obj.advec_x(self.arr, self.u),
+                         LonUpwind(self.u, self.arr).advec(self.lat))
+        self.assertClose(self.geom_obj.advec_y(self.arr, self.v),
+                         LatUpwind(self.v, self.arr).advec())
 
 
-# class TestHorizVertGeomTestCase(HorizVertGeomTestCase):
-#     pass
+class TestSphereEtaGeom(SphereGeomOperatorsTestCase):
+    def setUp(self):
+        super(TestSphereEtaGeom, self).setUp()
+        self.geom_obj = SphereEtaGeom(self.lon, self.lat, self.pk, self.bk,
+                                      self.pfull)
+        self.deriv_obj = SphereEtaCenDeriv(self.arr, self.pk, self.bk,
+                                           self.ps)
+
+    def test_init(self):
+        self.assertIsInstance(self.geom_obj.z, Eta)
+        self.assertEqual(self.geom_obj.z.dim, PFULL_STR)
+        self.assertEqual(len(self.geom_obj.bk_at_pfull), len(self.pfull))
+
+    def test_horiz_grad_const_p(self):
+        self.assertClose(
+            self.geom_obj.horiz_grad_const_p(self.arr, self.ps),
+            self.deriv_obj.horiz_grad_const_p()
+        )
+
+    def test_d_dp(self):
+        self.assertClose(self.geom_obj.d_dp(self.arr, self.ps),
+                         self.deriv_obj.d_dp())
+
+
+class TestSpherePressureGeom(InfiniteDiffTestCase):
+    def test_d_dp(self):
+        geom_obj = SpherePressureGeom(self.lon, self.lat, self.pressure)
+        self.assertIsInstance(geom_obj.z, Pressure)
+        arr = xr.DataArray(
+            np.outer(self.pressure.values, np.ones(len(self.lat))),
+            dims=[self.pressure.dims[0], LAT_STR],
+            coords={self.pressure.dims[0]: self.pressure, LAT_STR: self.lat}
+        )
+        np.testing.assert_allclose(geom_obj.d_dp(arr), 1.)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,121 @@
+import sys
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR
+from indiff.advec import EtaFluxDiv, EtaImplicitFluxDiv
+from indiff.kernels import flux_div, flux_div_coeffs, solve_tridiag
+from . import SphereEtaTestCase
+
+
+class TestTridiagKernels(unittest.TestCase):
+    def setUp(self):
+        randstate = np.random.RandomState(12345)
+        self.lower, self.upper, self.rhs = randstate.rand(3, 5, 9)
+        self.diag = 2 + randstate.rand(5, 9)
+
+    def test_solve_tridiag(self):
+        actual = solve_tridiag(self.lower, self.diag, self.upper, self.rhs)
+        for col in range(self.rhs.shape[0]):
+            matrix = (np.diag(self.diag[col]) +
+                      np.diag(self.lower[col, 1:], -1) +
+                      np.diag(self.upper[col, :-1], 1))
+            np.testing.assert_allclose(actual[col],
+                                       np.linalg.solve(matrix,
+                                                       self.rhs[col]))
+
+    def test_solve_tridiag_axis(self):
+        desired = solve_tridiag(self.lower, self.diag, self.upper, self.rhs)
+        out = np.empty_like(self.rhs.T)
+        actual = solve_tridiag(self.lower.T, self.diag.T, self.upper.T,
+                               self.rhs.T, axis=0, out=out)
+        self.assertIs(actual, out)
+        np.testing.assert_allclose(actual.T, desired)
+
+    def test_flux_div_coeffs(self):
+        widths = self.diag[0]
+        for scheme in ['upwind', 'centered']:
+            lower, diag, upper = flux_div_coeffs(self.rhs - 0.5, widths,
+                                                 scheme=scheme)
+            actual = diag*self.lower
+            actual[:, 1:] += lower[:, 1:]*self.lower[:, :-1]
+            actual[:, :-1] += upper[:, :-1]*self.lower[:, 1:]
+            np.testing.assert_allclose(
+                actual, flux_div(self.lower, self.rhs - 0.5, widths,
+                                 scheme=scheme)
+            )
+
+
+class EtaImplicitFluxDivTestCase(SphereEtaTestCase):
+    def _implicit(self, dt, **kwargs):
+        return EtaImplicitFluxDiv(self.omega, self.pk, self.bk, self.ps, dt,
+                                  **kwargs)
+
+
+class TestEtaImplicitFluxDiv(EtaImplicitFluxDivTestCase):
+    def test_explicit(self):
+        dt = 10.
+        actual = self._implicit(dt, theta=0.).step(self.arr)
+        desired = self.arr - dt*EtaFluxDiv(self.omega, self.arr, self.pk,
+                                           self.bk, self.ps).advec()
+        xr.testing.assert_allclose(actual, desired)
+
+    def test_conservation(self):
+        for scheme in ['upwind', 'centered']:
+            for theta in [0.5, 1.]:
+                implicit = self._implicit(1e5, scheme=scheme, theta=theta)
+                actual = implicit.step(self.arr)
+                change = ((actual - self.arr)*implicit.dp).sum(PFULL_STR)
+                total = (self.arr*implicit.dp).sum(PFULL_STR)
+                np.testing.assert_allclose(change / total, 0, atol=1e-10)
+
+    def test_positive(self):
+        # Far beyond the explicit scheme's CFL limit.
+        actual = self._implicit(1e7).step(self.arr)
+        self.assertTrue(np.all(actual > 0))
+
+    def test_crank_nicolson_order(self):
+        self.omega = xr.full_like(self.omega, 0.5)
+        duration = 2e4
+
+        def run(num_steps, theta=0.5):
+            implicit = self._implicit(duration / num_steps, theta=theta,
+                                      scheme='centered')
+            arr = self.arr
+            for _ in range(num_steps):
+                arr = implicit.step(arr)
+            return arr
+
+        desired = run(1000)
+        errors = [float(np.abs(run(num_steps) - desired).max())
+                  for num_steps in [10, 20]]
+        self.assertGreater(np.log2(errors[0] / errors[1]), 1.8)
+
+    def test_extra_dims(self):
+        implicit = self._implicit(1e4, theta=0.5)
+        arr = xr.concat([self.arr, 2*self.arr], dim='tracer').transpose(
+            LON_STR, 'tracer', PFULL_STR, LAT_STR
+        )
+        actual = implicit.step(arr)
+        self.assertEqual(actual.dims, arr.dims)
+        xr.testing.assert_allclose(
+            actual.isel(tracer=1, drop=True),
+            implicit.step(2*self.arr).transpose(
+                *actual.isel(tracer=1).dims)
+        )
+
+    def test_advec(self):
+        implicit = self._implicit(1e4)
+        xr.testing.assert_allclose(implicit.advec(self.arr),
+                                   (self.arr - implicit.step(self.arr)) /
+                                   1e4)
+
+    def test_bad_args(self):
+        self.assertRaises(ValueError, self._implicit, 1., scheme='bogus')
+        self.assertRaises(ValueError, self._implicit, 1., theta=2.)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import pytest
+
+import indiff
+
+
+def _imports_xarray(statement):
+    code = '{}; import sys; print("xarray" in sys.modules)'.format(statement)
+    return subprocess.check_output([sys.executable, '-c', code],
+                                   cwd=os.path.dirname(indiff.__path__[0])
+                                   ).decode().strip() == 'True'
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_pure_numpy_without_xarray(self):
+        for statement in ['import indiff', 'import indiff.kernels',
+                          'from indiff import Workspace']:
+            self.assertFalse(_imports_xarray(statement))
+
+    def test_operators(self):
+        self.assertTrue(_imports_xarray('from indiff import CenDeriv'))
+        from indiff.deriv import CenDeriv
+        self.assertIs(indiff.CenDeriv, CenDeriv)
+        self.assertIs(indiff.deriv, sys.modules['indiff.deriv'])
+        self.assertIn('SphereEtaUpwind', dir(indiff.advec))
+        self.assertIn('CenDeriv', dir(indiff))
+
+    def test_missing(self):
+        with pytest.raises(AttributeError):
+            indiff.nonexistent
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,81 @@
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from indiff import CenDeriv, IncrementalStore, Upwind
+
+from . import InfiniteDiffTestCase
+
+
+class TestIncrementalStore(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestIncrementalStore, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.store = IncrementalStore(self.path, time_dim=self.dummy_dim)
+        self.arr = self.random.copy()
+        self.arr[self.dim] = np.cumsum(self.random2.values[0])
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def _run(self, arr, order=2):
+        return self.store.run(CenDeriv, args=(arr, self.dim),
+                              kwargs=dict(order=order))
+
+    def test_append(self):
+        self._run(self.arr[{self.dummy_dim: slice(0, 2)}])
+        actual = self._run(self.arr)
+        desired = CenDeriv(self.arr, self.dim).deriv()
+        xr.testing.assert_identical(actual, desired)
+        parts = self.store.manifest()['parts']
+        self.assertEqual([len(part['times']) for part in parts], [2, 1])
+
+    def test_earlier_times(self):
+        self._run(self.arr[{self.dummy_dim: slice(1, None)}])
+        actual = self._run(self.arr)
+        desired = CenDeriv(self.arr, self.dim).deriv()
+        xr.testing.assert_identical(actual, desired)
+        xr.testing.assert_identical(self.store.load(), desired)
+
+    def test_no_new_times(self):
+        desired = self._run(self.arr)
+        actual = self._run(self.arr[{self.dummy_dim: slice(0, 2)}])
+        xr.testing.assert_identical(actual, desired)
+        self.assertEqual(len(self.store.manifest()['parts']), 1)
+
+    def test_params_changed(self):
+        self._run(self.arr[{self.dummy_dim: slice(0, 2)}])
+        with pytest.raises(ValueError):
+            self._run(self.arr, order=4)
+
+    def test_grid_changed(self):
+        self._run(self.arr[{self.dummy_dim: slice(0, 2)}])
+        arr = self.arr.copy()
+        arr[self.dim] = arr[self.dim] + 1.
+        with pytest.raises(ValueError):
+            self._run(arr)
+
+    def test_advec(self):
+        flow = self.random2 - 0.5
+        for stop in [1, None]:
+            time = {self.dummy_dim: slice(0, stop)}
+            actual = self.store.run(Upwind, args=(flow[time], self.arr[time],
+                                                  self.dim),
+                                    method='advec')
+        desired = Upwind(flow, self.arr, self.dim).advec()
+        xr.testing.assert_identical(actual, desired)
+
+    def test_mismatched_times(self):
+        flow = self.random2[{self.dummy_dim: slice(0, 2)}]
+        with pytest.raises(ValueError):
+            self.store.run(Upwind, args=(flow, self.arr, self.dim),
+                           method='advec')
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,102 @@
+import sys
+import unittest
+import warnings
+
+import numpy as np
+import xarray as xr
+
+from indiff._constants import LAT_STR, LON_STR, _RADEARTH
+from indiff.advec import LonUpwind
+from indiff.integrate import ForwardEuler, SSPRK2, SSPRK3, interp_flow
+from indiff.workspace import Workspace
+
+
+class TestInterpFlow(unittest.TestCase):
+    def test_nested(self):
+        start = {'u': np.zeros(2), 'v': (np.ones(2), 2.)}
+        end = {'u': np.ones(2), 'v': (np.zeros(2), 4.)}
+        actual = interp_flow(start, end, 0.25)
+        np.testing.assert_allclose(actual['u'], 0.25)
+        np.testing.assert_allclose(actual['v'][0], 0.75)
+        self.assertEqual(actual['v'][1], 2.5)
+
+    def test_no_end(self):
+        start = (np.zeros(2),)
+        self.assertIs(interp_flow(start, None, 0.5), start)
+
+
+class IntegratorTestCase(unittest.TestCase):
+    def setUp(self):
+        num_lon = 128
+        lon = np.arange(num_lon)*360. / num_lon
+        self.lon = xr.DataArray(lon, dims=[LON_STR], coords={LON_STR: lon})
+        self.lat = xr.DataArray([0.], dims=[LAT_STR], coords={LAT_STR: [0.]})
+        self.arr = np.sin(np.deg2rad(self.lon)).expand_dims(
+            {LAT_STR: self.lat.values}
+        )
+        self.speed = 10.
+        # A quarter of the way around the equator.
+        self.duration = 0.5*np.pi*_RADEARTH / self.speed
+
+    def _advec(self, arr, flow):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            return LonUpwind(flow, arr, scheme='weno5').advec(arr[LAT_STR])
+
+    def _flows(self, num_steps, accel=0.):
+        """Zonal flow speeding up linearly over the integration."""
+        for num in range(num_steps + 1):
+            yield xr.full_like(self.arr, self.speed*(1 + accel*num /
+                                                     num_steps))
+
+    def _exact(self, accel=0.):
+        dist = self.speed*self.duration*(1 + 0.5*accel)
+        return np.sin(np.deg2rad(self.lon) - dist / _RADEARTH)
+
+    def _error(self, cls, num_steps, accel=0.):
+        integrator = cls(self._advec, self.duration / num_steps)
+        actual = integrator.run(self.arr, self._flows(num_steps, accel))
+        return float(np.abs(actual - self._exact(accel)).max())
+
+
+class TestTimeIntegrators(IntegratorTestCase):
+    def test_uniform(self):
+        ones = xr.ones_like(self.arr)
+        for cls in [ForwardEuler, SSPRK2, SSPRK3]:
+            actual = cls(self._advec, 1e4).run(ones, self._flows(5, 1.))
+            np.testing.assert_allclose(actual, 1.)
+
+    def test_convergence(self):
+        for cls, order in [(ForwardEuler, 1), (SSPRK2, 2)]:
+            errors = [self._error(cls, num_steps, accel=1.)
+                      for num_steps in [50, 100]]
+            self.assertGreater(np.log2(errors[0] / errors[1]), order - 0.2)
+        self.assertLess(self._error(SSPRK3, 50, accel=1.),
+                        self._error(SSPRK2, 50, accel=1.))
+
+    def test_step(self):
+        flows = list(self._flows(1, accel=1.))
+        integrator = SSPRK3(self._advec, 1e4)
+        desired = integrator.step(self.arr, *flows).copy()
+        actual = integrator.run(self.arr, flows)
+        xr.testing.assert_identical(actual, desired)
+
+    def test_constant_memory(self):
+        workspace = Workspace()
+        integrator = SSPRK3(self._advec, 1e4, workspace=workspace)
+        results = integrator.integrate(self.arr, self._flows(4))
+        next(results)
+        nbytes = workspace.nbytes
+        self.assertEqual(len(workspace), 3)
+        self.assertEqual(nbytes, 3*self.arr.nbytes)
+        self.assertEqual(len(list(results)), 3)
+        self.assertEqual(workspace.nbytes, nbytes)
+
+    def test_no_steps(self):
+        integrator = SSPRK2(self._advec, 1e4)
+        flow = xr.full_like(self.arr, self.speed)
+        self.assertIs(integrator.run(self.arr, [flow]), self.arr)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
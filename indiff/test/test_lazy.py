@@ -0,0 +1,95 @@
+import sys
+import unittest
+
+import xarray as xr
+
+from indiff import lazy
+from indiff._constants import PFULL_STR
+from indiff.advec import SphereEtaUpwind
+from indiff.deriv import SphereCenDeriv, SphereEtaCenDeriv, SphereEtaFwdDeriv
+
+from . import SphereEtaTestCase
+
+
+class TestExpr(SphereEtaTestCase):
+    def test_arithmetic(self):
+        ps = self.ps.copy()
+        expr = 2*lazy.Value(self.arr)*ps - lazy.Value(self.arr)/ps + 1.
+        xr.testing.assert_allclose(expr.evaluate(),
+                                   2*self.arr*ps - self.arr/ps + 1.)
+        self.assertIsInstance(expr, lazy.Expr)
+
+    def test_dims_order(self):
+        expr = lazy.Value(self.ps) + self.arr
+        self.assertEqual(expr.evaluate().dims, (self.ps + self.arr).dims)
+
+    def test_shared_terms_computed_once(self):
+        calls = []
+
+        def func(arr):
+            calls.append(1)
+            return arr*2
+
+        term = lazy.Term(func, [self.arr])
+        first = term + lazy.Term(func, [self.arr])*self.ps
+        second = lazy.Term(func, [self.arr]) - 1.
+        actual = lazy.evaluate(first, second)
+        self.assertEqual(len(calls), 1)
+        xr.testing.assert_allclose(actual[0], 2*self.arr + 2*self.arr*self.ps)
+        xr.testing.assert_allclose(actual[1], 2*self.arr - 1.)
+
+    def test_pure_terms(self):
+        eta_objs = [SphereEtaFwdDeriv(self.arr, self.pk, self.bk, self.ps,
+                                      lazy=True) for _ in range(2)]
+        keys = [lazy.Term(obj.d_deta_from_pfull, [self.arr], pure=True).key
+                for obj in eta_objs]
+        self.assertEqual(keys[0], keys[1])
+        keys = [lazy.Term(obj.d_dx).key for obj in eta_objs]
+        self.assertNotEqual(keys[0], keys[1])
+
+    def test_pure_terms_other_grid(self):
+        pfull = self.pfull + 1.
+        arr = self.arr.assign_coords(**{PFULL_STR: pfull})
+        grids = [(self.arr, self.pk, self.bk), (arr, self.pk, 0.5*self.bk),
+                 (arr, self.pk, self.bk)]
+        eta_objs = [SphereEtaFwdDeriv(arr, pk, bk, self.ps, lazy=True)
+                    for arr, pk, bk in grids]
+        for method in ['d_deta_from_pfull', 'd_deta_from_phalf']:
+            keys = [lazy.Term(getattr(obj, method), [self.pk],
+                              pure=True).key for obj in eta_objs]
+            self.assertEqual(len(set(keys)), 3)
+        actual = lazy.evaluate(*[obj.d_dx_const_p() for obj in eta_objs])
+        for (arr, pk, bk), result in zip(grids, actual):
+            desired = SphereEtaFwdDeriv(arr, pk, bk, self.ps).d_dx_const_p()
+            xr.testing.assert_allclose(result, desired)
+
+
+class TestLazyOperators(SphereEtaTestCase):
+    def test_horiz_grad(self):
+        desired = SphereCenDeriv(self.arr).horiz_grad()
+        expr = SphereCenDeriv(self.arr, lazy=True).horiz_grad()
+        self.assertIsInstance(expr, lazy.Expr)
+        xr.testing.assert_allclose(expr.evaluate(), desired)
+
+    def test_sphere_eta_deriv(self):
+        for cls in [SphereEtaCenDeriv, SphereEtaFwdDeriv]:
+            eager = cls(self.arr, self.pk, self.bk, self.ps)
+            lazy_obj = cls(self.arr, self.pk, self.bk, self.ps, lazy=True)
+            for method in ['horiz_grad_const_p', 'grad_3d']:
+                desired = getattr(eager, method)()
+                actual = getattr(lazy_obj, method)().evaluate()
+                xr.testing.assert_allclose(actual, desired)
+
+    def test_advec_3d(self):
+        for order in [1, 2]:
+            desired = SphereEtaUpwind(
+                self.arr, self.pk, self.bk, self.ps, order=order
+            ).advec_3d(self.u, self.v, self.omega)
+            expr = SphereEtaUpwind(
+                self.arr, self.pk, self.bk, self.ps, order=order, lazy=True
+            ).advec_3d(self.u, self.v, self.omega)
+            xr.testing.assert_allclose(expr.evaluate(), desired)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,126 @@
+import sys
+import unittest
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from indiff import CenDeriv, FwdDeriv, BwdDeriv, StencilMap, Workspace
+from indiff.kernels import stencil_codes, STENCIL_NAMES
+
+from . import InfiniteDiffTestCase
+
+
+class TestStencilCodes(unittest.TestCase):
+    def test_centered(self):
+        mask = np.array([False, False, False, True, False, False, False,
+                         False, False])
+        codes = stencil_codes(mask, 0, 1, ['cen2', 'fwd2', 'bwd2', 'fwd1',
+                                           'bwd1'])
+        actual = [STENCIL_NAMES[code] for code in codes]
+        desired = ['fwd2', 'cen2', 'bwd2', 'none', 'fwd2', 'cen2', 'cen2',
+                   'cen2', 'bwd2']
+        self.assertEqual(actual, desired)
+
+    def test_isolated_point(self):
+        mask = np.array([True, False, True, False, False])
+        codes = stencil_codes(mask, 0, 1, ['cen2', 'fwd1', 'bwd1'])
+        actual = [STENCIL_NAMES[code] for code in codes]
+        self.assertEqual(actual, ['none', 'none', 'none', 'fwd1', 'bwd1'])
+
+
+class MaskedDerivTestCase(InfiniteDiffTestCase):
+    def setUp(self):
+        super(MaskedDerivTestCase, self).setUp()
+        self.mask = xr.zeros_like(self.arange, dtype=bool)
+        self.mask[{self.dim: 4}] = True
+        self.mask[{self.dummy_dim: 1, self.dim: 7}] = True
+        self.arr = self.arange.astype(float).where(~self.mask)
+
+
+class TestMaskedDeriv(MaskedDerivTestCase):
+    def test_linear_field_exact(self):
+        for cls, orders in [(CenDeriv, [2, 4]), (FwdDeriv, [1, 2]),
+                            (BwdDeriv, [1, 2])]:
+            for order in orders:
+                actual = cls(self.arr, self.dim, order=order,
+                             mask=self.mask).deriv()
+                desired = self.ones.astype(float).where(~self.mask)
+                xr.testing.assert_identical(actual, desired)
+
+    def test_mask_from_nan(self):
+        desired = CenDeriv(self.arr, self.dim, mask=self.mask).deriv()
+        actual = CenDeriv(self.arr, self.dim, mask=True).deriv()
+        xr.testing.assert_identical(actual, desired)
+
+    def test_interior_matches_unmasked(self):
+        mask = xr.zeros_like(self.random, dtype=bool)
+        for order in [2, 4]:
+            pad = order // 2
+            desired = CenDeriv(self.random, self.dim, order=order,
+                               fill_edge=False).deriv()
+            actual = CenDeriv(self.random, self.dim, order=order,
+                              mask=mask).deriv()
+            actual = actual[{self.dim: slice(pad, -pad)}]
+            xr.testing.assert_allclose(actual, desired)
+
+    def test_fallback_one_sided(self):
+        actual = CenDeriv(self.random, self.dim, mask=self.mask).deriv()
+        values = self.random.values
+        # Just left of the masked column: 2nd order backward differencing.
+        desired = (3*values[:, 3] - 4*values[:, 2] + values[:, 1]) / 2.
+        np.testing.assert_allclose(actual[{self.dim: 3}], desired)
+        # Just right of it: 2nd order forward differencing.
+        desired = (-3*values[:, 5] + 4*values[:, 6] - values[:, 7]) / 2.
+        np.testing.assert_allclose(actual[{self.dim: 5}][[0, 2]],
+                                   desired[[0, 2]])
+        assert actual[{self.dim: 4}].isnull().all()
+
+    def test_no_fill_edge(self):
+        actual = CenDeriv(self.arr, self.dim, mask=self.mask,
+                          fill_edge=False).deriv()
+        self.assertCoordsIdentical(actual,
+                                   self.arr[{self.dim: slice(1, -1)}])
+
+    def test_broadcast_mask(self):
+        mask = self.mask[{self.dummy_dim: 0}]
+        actual = CenDeriv(self.arange, self.dim, mask=mask).deriv()
+        desired = self.ones.astype(float).where(~mask)
+        xr.testing.assert_identical(actual, desired)
+
+    def test_workspace(self):
+        desired = CenDeriv(self.arr, self.dim, mask=self.mask).deriv()
+        actual = CenDeriv(self.arr, self.dim, mask=self.mask,
+                          workspace=Workspace()).deriv()
+        xr.testing.assert_identical(actual, desired)
+
+
+class TestStencilMap(MaskedDerivTestCase):
+    def test_reuse(self):
+        stencil_map = StencilMap(self.mask, self.dim, order=2)
+        for arr in [self.arr, 2*self.arr]:
+            desired = CenDeriv(arr, self.dim, mask=self.mask).deriv()
+            actual = CenDeriv(arr, self.dim, mask=stencil_map).deriv()
+            xr.testing.assert_identical(actual, desired)
+        self.assertEqual(len(stencil_map._selectors), 1)
+
+    def test_mismatch(self):
+        stencil_map = StencilMap(self.mask, self.dim, order=2)
+        with pytest.raises(ValueError):
+            CenDeriv(self.arr, self.dim, order=4, mask=stencil_map)
+        with pytest.raises(ValueError):
+            FwdDeriv(self.arr, self.dim, order=2, mask=stencil_map)
+
+    def test_counts(self):
+        counts = StencilMap(self.mask, self.dim, order=2).counts()
+        self.assertEqual(sum(counts.values()), self.mask.size)
+        self.assertEqual(counts['none'], int(self.mask.sum()))
+
+    def test_missing_dims(self):
+        stencil_map = StencilMap(self.mask, self.dim)
+        with pytest.raises(ValueError):
+            stencil_map.selectors([self.dim])
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
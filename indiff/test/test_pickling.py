@@ -0,0 +1,75 @@
+import copy
+import pickle
+import sys
+import unittest
+
+import cloudpickle
+import pytest
+import xarray as xr
+
+from indiff import CenDeriv, Upwind, Workspace
+from indiff.advec import SphereEtaUpwind, TVDUpwind
+from indiff.deriv import SphereEtaCenDeriv
+
+from . import SphereEtaTestCase
+
+
+class TestLightPickle(SphereEtaTestCase):
+    def test_roundtrip(self):
+        deriv = CenDeriv(self.random, self.dim, order=4,
+                         workspace=Workspace())
+        unpickled = pickle.loads(pickle.dumps(deriv))
+        self.assertEqual(unpickled.data_args, ['arr'])
+        unpickled.bind(arr=self.random2)
+        xr.testing.assert_identical(
+            unpickled.deriv(), CenDeriv(self.random2, self.dim,
+                                        order=4).deriv()
+        )
+
+    def test_upwind(self):
+        upwind = Upwind(self.random, self.random2, self.dim)
+        unpickled = cloudpickle.loads(cloudpickle.dumps(upwind))
+        self.assertEqual(sorted(unpickled.data_args), ['arr', 'flow'])
+        unpickled.bind(flow=self.random, arr=self.random2)
+        xr.testing.assert_identical(unpickled.advec(), upwind.advec())
+
+    def test_size(self):
+        for obj in [SphereEtaCenDeriv(self.arr, self.pk, self.bk, self.ps),
+                    SphereEtaUpwind(self.arr, self.pk, self.bk, self.ps)]:
+            self.assertLess(len(pickle.dumps(obj)), self.arr.nbytes // 10)
+
+    def test_sphere_eta_upwind(self):
+        upwind = SphereEtaUpwind(self.arr, self.pk, self.bk, self.ps,
+                                 order=1)
+        unpickled = pickle.loads(pickle.dumps(upwind))
+        self.assertEqual(sorted(unpickled.data_args), ['arr', 'ps'])
+        unpickled.bind(arr=self.arr, ps=self.ps)
+        xr.testing.assert_identical(unpickled.advec_p(self.flow),
+                                    upwind.advec_p(self.flow))
+
+    def test_copy(self):
+        for obj, method in [
+                (CenDeriv(self.random, self.dim, order=4), 'deriv'),
+                (Upwind(self.random, self.random2, self.dim), 'advec'),
+                (TVDUpwind(self.random, self.random2, self.dim), 'advec')
+        ]:
+            for copied in [copy.copy(obj), copy.deepcopy(obj)]:
+                self.assertNotIn('_unbound', copied.__dict__)
+                xr.testing.assert_identical(getattr(copied, method)(),
+                                            getattr(obj, method)())
+        deriv = CenDeriv(self.random, self.dim)
+        self.assertIsNot(copy.deepcopy(deriv).arr, deriv.arr)
+
+    def test_unbound(self):
+        unpickled = pickle.loads(pickle.dumps(CenDeriv(self.random,
+                                                       self.dim)))
+        with pytest.raises(AttributeError):
+            unpickled.deriv()
+        with pytest.raises(ValueError):
+            unpickled.bind()
+        with pytest.raises(ValueError):
+            unpickled.bind(arr=self.random.transpose())
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,127 @@
+import itertools
+import sys
+import unittest
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from indiff import Region
+from indiff._constants import LAT_STR, LON_STR
+from indiff.advec import SphereEtaUpwind
+from indiff.deriv import SphereCenDeriv, SphereFwdDeriv
+
+from . import SphereEtaTestCase
+
+
+class RegionTestCase(SphereEtaTestCase):
+    def setUp(self):
+        super(RegionTestCase, self).setUp()
+        # Spans the seam of the longitude coordinate.
+        self.region = Region(lon_bounds=(320., 40.), lat_bounds=(-30., 30.))
+        # Abuts the northern edge of the domain.
+        self.region_edge = Region(lon_bounds=(100., 150.),
+                                  lat_bounds=(50., 90.))
+
+    def _subset(self, arr, region):
+        lon = self.arr[LON_STR].values
+        west, east = region.lon_bounds
+        if west > east:
+            lon = np.concatenate([lon[lon >= west], lon[lon <= east]])
+        else:
+            lon = lon[(lon >= west) & (lon <= east)]
+        lat = self.arr[LAT_STR].values
+        south, north = region.lat_bounds
+        lat = lat[(lat >= south) & (lat <= north)]
+        return arr.sel(**{LON_STR: lon, LAT_STR: lat})
+
+
+class TestRegion(RegionTestCase):
+    def test_select_seam(self):
+        selection = self.region.select(self.arr, 2)
+        subset = selection.extract(self.arr)
+        self.assertFalse(selection.cyclic_lon)
+        np.testing.assert_array_equal(subset[LON_STR],
+                                      np.arange(305., 416., 10))
+        np.testing.assert_array_equal(subset[LAT_STR],
+                                      np.arange(-45., 46., 10))
+
+    def test_select_global(self):
+        region = Region(lon_bounds=(10., 350.))
+        selection = region.select(self.arr, 2)
+        self.assertTrue(selection.cyclic_lon)
+        xr.testing.assert_identical(selection.extract(self.arr), self.arr)
+
+    def test_select_not_cyclic(self):
+        selection = self.region_edge.select(self.arr, 2, cyclic_lon=False)
+        subset = selection.extract(self.arr)
+        np.testing.assert_array_equal(subset[LAT_STR],
+                                      np.arange(35., 86., 10))
+
+    def test_trim(self):
+        selection = self.region.select(self.arr, 2)
+        actual = selection.trim(selection.extract(self.arr))
+        xr.testing.assert_identical(actual,
+                                    self._subset(self.arr, self.region))
+
+    def test_extract_passthrough(self):
+        selection = self.region.select(self.arr, 2)
+        self.assertEqual(selection.extract(1e5), 1e5)
+        self.assertIs(selection.extract(None), None)
+        pk = xr.DataArray(self.pk, dims=['phalf'])
+        self.assertIs(selection.extract(pk), pk)
+
+    def test_no_points(self):
+        with pytest.raises(ValueError):
+            Region(lat_bounds=(86., 89.)).select(self.arr, 2)
+
+
+class TestSphereDerivRegion(RegionTestCase):
+    def test_matches_full_domain(self):
+        for (cls, order), region in itertools.product(
+                [(SphereFwdDeriv, 1), (SphereFwdDeriv, 2), (SphereCenDeriv, 2),
+                 (SphereCenDeriv, 4)], [self.region, self.region_edge]
+        ):
+            full = cls(self.arr, order=order)
+            regional = cls(self.arr, order=order, region=region)
+            for method in ['d_dx', 'd_dy', 'horiz_grad']:
+                desired = self._subset(getattr(full, method)(), region)
+                actual = getattr(regional, method)()
+                xr.testing.assert_allclose(actual, desired)
+
+    def test_not_cyclic(self):
+        region = Region(lon_bounds=(5., 40.), lat_bounds=(-30., 30.))
+        for fill_edge_lon in [True, False]:
+            kwargs = dict(cyclic_lon=False, fill_edge_lon=fill_edge_lon)
+            desired = SphereCenDeriv(self.arr, **kwargs).d_dx()
+            desired = desired.sel(**{LAT_STR: slice(-30., 30.),
+                                     LON_STR: slice(5., 40.)})
+            actual = SphereCenDeriv(self.arr, region=region, **kwargs).d_dx()
+            xr.testing.assert_allclose(actual, desired)
+
+    def test_whole_circle_trimmed(self):
+        # The halo of this box reaches around to meet itself.
+        region = Region(lon_bounds=(15., 345.), lat_bounds=(-30., 30.))
+        desired = self._subset(SphereCenDeriv(self.arr).d_dx(), region)
+        actual = SphereCenDeriv(self.arr, region=region).d_dx()
+        self.assertEqual(actual.sizes[LON_STR], 34)
+        xr.testing.assert_allclose(actual, desired)
+
+
+class TestSphereEtaUpwindRegion(RegionTestCase):
+    def test_matches_full_domain(self):
+        for order, region in itertools.product([1, 2], [self.region,
+                                                        self.region_edge]):
+            full = SphereEtaUpwind(self.arr, self.pk, self.bk, self.ps,
+                                   order=order)
+            regional = SphereEtaUpwind(self.arr, self.pk, self.bk, self.ps,
+                                       order=order, region=region)
+            for method in ['advec_x_const_p', 'advec_y_const_p', 'advec_p']:
+                desired = self._subset(getattr(full, method)(self.flow),
+                                       region)
+                actual = getattr(regional, method)(self.flow)
+                xr.testing.assert_allclose(actual, desired)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,123 @@
+import sys
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR, _RADEARTH
+from indiff.advec import SphereEtaSemiLagrangian
+from indiff.kernels import lagrange_weights, stencil_start
+from . import SphereEtaTestCase
+
+
+class TestInterpKernels(unittest.TestCase):
+    def test_stencil_start(self):
+        coord = np.arange(10.)
+        np.testing.assert_array_equal(
+            stencil_start(coord, np.array([0., 0.5, 4.5, 8.5, 9.]), 4),
+            [0, 0, 3, 6, 6]
+        )
+
+    def test_lagrange_weights(self):
+        nodes = np.array([0., 1., 3., 4.])
+        target = np.array([0.5, 2., 3.])
+        weights = lagrange_weights(target, nodes[:, np.newaxis])
+        np.testing.assert_allclose(weights.sum(axis=0), 1.)
+        np.testing.assert_allclose((weights*nodes[:, np.newaxis]**3).sum(0),
+                                   target**3)
+
+
+class SemiLagrangianTestCase(SphereEtaTestCase):
+    def setUp(self):
+        super(SemiLagrangianTestCase, self).setUp()
+        self.lat_rad = np.deg2rad(self.lat.values)[np.newaxis, :, np.newaxis]
+        self.lon_rad = np.deg2rad(self.lon.values)[np.newaxis, np.newaxis]
+        self.ps = xr.DataArray(np.full(self.shape[1:], 1e5),
+                               dims=[LAT_STR, LON_STR],
+                               coords={LAT_STR: self.lat, LON_STR: self.lon})
+        self.dt = 3600.
+        self.zeros = self._field(0.)
+
+    def _sl(self, u, v, omega, **kwargs):
+        return SphereEtaSemiLagrangian(u, v, omega, self.pk, self.bk,
+                                       self.ps, self.dt, **kwargs)
+
+
+class TestSphereEtaSemiLagrangian(SemiLagrangianTestCase):
+    def test_zero_flow(self):
+        sl = self._sl(self.zeros, self.zeros, self.zeros)
+        np.testing.assert_allclose(sl.step(self.arr), self.arr)
+        self.assertAllZeros(sl.advec(self.arr))
+
+    def test_uniform(self):
+        randstate = np.random.RandomState(54321)
+        flows = [self._field(20*randstate.randn(*self.shape))
+                 for _ in range(3)]
+        sl = self._sl(*flows)
+        np.testing.assert_allclose(sl.step(xr.ones_like(self.arr)), 1.)
+
+    def test_zonal_shift(self):
+        # Solid-body rotation moving two gridpoints per step, i.e. CFL 2.
+        u = self._field(np.deg2rad(20)*_RADEARTH*np.cos(self.lat_rad) /
+                        self.dt)
+        for interp in ['linear', 'cubic']:
+            actual = self._sl(u, self.zeros, self.zeros,
+                              interp=interp).step(self.arr)
+            np.testing.assert_allclose(actual.values,
+                                       np.roll(self.arr.values, 2, axis=-1))
+
+    def test_across_pole(self):
+        arr = self._field(np.cos(self.lat_rad)*np.cos(self.lon_rad))
+        v = self._field(-np.deg2rad(12)*_RADEARTH / self.dt)
+        sl = self._sl(self.zeros, v, self.zeros)
+        lat = self.lat_rad + np.deg2rad(12)
+        lon = np.where(lat > 0.5*np.pi, self.lon_rad + np.pi, self.lon_rad)
+        lat = np.where(lat > 0.5*np.pi, np.pi - lat, lat)
+        assert np.all(np.abs(sl.lat_departure) <= 0.5*np.pi)
+        np.testing.assert_allclose(sl.step(arr).values,
+                                   np.broadcast_to(np.cos(lat)*np.cos(lon),
+                                                   self.shape),
+                                   atol=1e-4)
+
+    def test_vertical(self):
+        omega = self._field(2.)
+        sl = self._sl(self.zeros, self.zeros, omega)
+        actual = sl.step(self._field(sl.p))
+        interior = {PFULL_STR: slice(3, -3)}
+        np.testing.assert_allclose(actual[interior].values,
+                                   (sl.p - 2.*self.dt)[3:-3])
+
+    def test_extra_dims(self):
+        u = self._field(np.deg2rad(20)*_RADEARTH*np.cos(self.lat_rad) /
+                        self.dt)
+        sl = self._sl(u, self.zeros, self.zeros)
+        arr = xr.concat([self.arr, 2*self.arr], dim='tracer').transpose(
+            LON_STR, 'tracer', LAT_STR, PFULL_STR
+        )
+        actual = sl.step(arr)
+        self.assertEqual(actual.dims, arr.dims)
+        xr.testing.assert_allclose(actual.isel(tracer=1),
+                                   sl.step(2*self.arr).transpose(
+                                       *actual.isel(tracer=1).dims))
+
+    def test_descending(self):
+        u = self._field(np.deg2rad(15)*_RADEARTH*np.cos(self.lat_rad) /
+                        self.dt)
+        v = self._field(-np.deg2rad(12)*_RADEARTH / self.dt)
+        desired = self._sl(u, v, self.zeros).step(self.arr)
+        for dims in [[LAT_STR], [LAT_STR, LON_STR]]:
+            flip = {dim: slice(None, None, -1) for dim in dims}
+            sl = SphereEtaSemiLagrangian(
+                u.isel(**flip), v.isel(**flip), self.zeros.isel(**flip),
+                self.pk, self.bk, self.ps.isel(**flip), self.dt
+            )
+            xr.testing.assert_allclose(sl.step(self.arr.isel(**flip)),
+                                       desired.isel(**flip))
+
+    def test_bad_interp(self):
+        self.assertRaises(ValueError, self._sl, self.zeros, self.zeros,
+                          self.zeros, interp='bogus')
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
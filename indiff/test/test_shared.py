@@ -0,0 +1,108 @@
+import gc
+from multiprocessing import shared_memory
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from indiff import CenDeriv, SharedMemoryRunner, shared
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR
+from indiff.advec import SphereEtaUpwind
+from indiff.deriv import SphereCenDeriv
+
+from . import InfiniteDiffTestCase
+
+
+class TestSharedMemoryRunner(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestSharedMemoryRunner, self).setUp()
+        self.runner = SharedMemoryRunner(processes=2, slabs=3)
+
+    def test_deriv(self):
+        actual = self.runner.run(CenDeriv, self.dummy_dim,
+                                 args=(self.random, self.dim),
+                                 kwargs=dict(order=4))
+        desired = CenDeriv(self.random, self.dim, order=4).deriv()
+        xr.testing.assert_allclose(actual, desired)
+
+    def test_sphere_eta_upwind(self):
+        randstate = np.random.RandomState(12345)
+        time = np.arange(4)
+        shape = (len(time), len(self.pfull), len(self.lat), len(self.lon))
+        dims = ['time', PFULL_STR, LAT_STR, LON_STR]
+        coords = {'time': time, PFULL_STR: self.pfull, LAT_STR: self.lat,
+                  LON_STR: self.lon}
+        arr = xr.DataArray(randstate.rand(*shape), dims=dims, coords=coords)
+        flow = xr.DataArray(randstate.rand(*shape) - 0.5, dims=dims,
+                            coords=coords)
+        ps = xr.DataArray(
+            randstate.rand(len(time), len(self.lat), len(self.lon))*1e3 + 1e5,
+            dims=['time', LAT_STR, LON_STR],
+            coords={'time': time, LAT_STR: self.lat, LON_STR: self.lon}
+        )
+        args = (arr, self.pk, self.bk, ps)
+        actual = self.runner.run(SphereEtaUpwind, 'time', args=args,
+                                 method='advec_3d',
+                                 method_args=(flow, flow, flow))
+        desired = SphereEtaUpwind(*args).advec_3d(flow, flow, flow)
+        xr.testing.assert_allclose(actual, desired.transpose(*actual.dims))
+
+    def test_shared_inputs(self):
+        desired = CenDeriv(self.random, self.dim, order=4).deriv()
+        inputs = [self.runner.share(self.random),
+                  self.runner.empty(self.random.shape, self.random.dims,
+                                    coords=self.random.coords)]
+        inputs[1][...] = self.random
+        for arr in inputs:
+            with mock.patch.object(shared._SharedArray, 'create',
+                                   side_effect=AssertionError):
+                actual = self.runner.run(CenDeriv, self.dummy_dim,
+                                         args=(arr, self.dim),
+                                         kwargs=dict(order=4))
+            xr.testing.assert_allclose(actual, desired)
+
+    def test_result_owns_block(self):
+        actual = self.runner.run(CenDeriv, self.dummy_dim,
+                                 args=(self.random, self.dim))
+        # The result can itself be an input, without a copy.
+        with mock.patch.object(shared._SharedArray, 'create',
+                               side_effect=AssertionError):
+            self.runner.run(CenDeriv, self.dummy_dim,
+                            args=(actual, self.dim))
+        name = shared._SharedArray.from_shared(actual).name
+        del actual
+        gc.collect()
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+    def test_invalid_split_dim(self):
+        with pytest.raises(ValueError):
+            self.runner.run(CenDeriv, self.dim, args=(self.random, self.dim))
+        with pytest.raises(ValueError):
+            self.runner.run(CenDeriv, 'nonexistent',
+                            args=(self.random, self.dim))
+
+    def test_split_implicit_diff_dim(self):
+        # The operators difference along these dims without being told.
+        dims = [PFULL_STR, LAT_STR, LON_STR]
+        coords = {PFULL_STR: self.pfull, LAT_STR: self.lat,
+                  LON_STR: self.lon}
+        arr = xr.DataArray(np.random.RandomState(12345).rand(
+            len(self.pfull), len(self.lat), len(self.lon)
+        ), dims=dims, coords=coords)
+        ps = xr.full_like(arr.isel(**{PFULL_STR: 0}, drop=True), 1e5)
+        for split_dim, method in [(LAT_STR, 'd_dy'), (LON_STR, 'd_dx')]:
+            with pytest.raises(ValueError):
+                self.runner.run(SphereCenDeriv, split_dim, args=(arr,),
+                                method=method)
+        with pytest.raises(ValueError):
+            self.runner.run(SphereEtaUpwind, PFULL_STR,
+                            args=(arr, self.pk, self.bk, ps),
+                            method='advec_3d', method_args=(arr, arr, arr))
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
@@ -0,0 +1,148 @@
+import sys
+import unittest
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from indiff.deriv import CenDeriv, FwdDeriv, BwdDeriv, PressureCenDeriv
+from indiff.kernels import (cen_deriv, one_sided_deriv, fornberg_weights,
+                            stencil_deriv, stencil_weights, level_weights)
+from indiff.workspace import Workspace
+from . import InfiniteDiffTestCase
+
+
+class TestStencilKernels(unittest.TestCase):
+    def setUp(self):
+        self.coord = np.linspace(0., 2., 25)**1.3
+        self.values = np.random.RandomState(12345).rand(3, 25)
+
+    def test_fornberg_weights(self):
+        np.testing.assert_allclose(
+            12*fornberg_weights(np.arange(-2., 3.)), [1, -8, 0, 8, -1],
+            atol=1e-14
+        )
+        np.testing.assert_allclose(
+            fornberg_weights(np.arange(3.), deriv=2), [1, -2, 1]
+        )
+        # Many stencils at once, indexed along the trailing axes.
+        nodes = np.array([[0., 1.], [1., 3.], [2., 4.]])
+        np.testing.assert_allclose(
+            (fornberg_weights(nodes)*nodes**2).sum(axis=0), 0.
+        )
+
+    def test_polynomial(self):
+        for scheme, orders in [('centered', [2, 4, 6, 8]),
+                               ('forward', [1, 3, 5]),
+                               ('backward', [1, 3, 5])]:
+            for order in orders:
+                for spacing in [1, 2]:
+                    actual = stencil_deriv(self.coord**order, self.coord,
+                                           scheme=scheme, spacing=spacing,
+                                           order=order)
+                    np.testing.assert_allclose(
+                        actual, order*self.coord**(order - 1), atol=1e-11
+                    )
+
+    def test_explicit_orders(self):
+        # Away from the edges, which the explicit formulas fill at lower
+        # order, the weights match those formulas on a uniform grid.
+        coord = np.arange(25.)
+        np.testing.assert_allclose(
+            stencil_deriv(self.values, coord, order=4, fill_edge=False),
+            cen_deriv(self.values, coord, order=4, fill_edge=False)
+        )
+        np.testing.assert_allclose(
+            stencil_deriv(self.values, coord, scheme='backward', order=2,
+                          fill_edge=False),
+            one_sided_deriv(self.values, coord, order=2, is_bwd=True,
+                            fill_edge=False)
+        )
+
+    def test_dispatch(self):
+        for kernel, kwargs in [(cen_deriv, dict(order=6)),
+                               (one_sided_deriv, dict(order=3,
+                                                      is_bwd=True))]:
+            scheme = 'backward' if kwargs.get('is_bwd') else 'centered'
+            for fill_edge in [True, False]:
+                np.testing.assert_allclose(
+                    kernel(self.values, self.coord, fill_edge=fill_edge,
+                           **kwargs),
+                    stencil_deriv(self.values, self.coord, scheme=scheme,
+                                  order=kwargs['order'],
+                                  fill_edge=fill_edge)
+                )
+
+    def test_coord_across_columns(self):
+        coord = np.cumsum(np.random.RandomState(54321).rand(4, 30) + 0.5,
+                          axis=1)*0.05
+        actual = stencil_deriv(coord.T**5, coord.T, axis=0, order=6)
+        np.testing.assert_allclose(actual, 5*coord.T**4, rtol=1e-9)
+
+    def test_level_weights(self):
+        offsets, weights, start = level_weights(self.coord, order=6)
+        self.assertEqual(offsets, tuple(range(-6, 7)))
+        self.assertEqual(weights.shape, (13, 25))
+        self.assertEqual(start, 0)
+        self.assertEqual(
+            stencil_weights(self.coord, order=6, fill_edge=False)[2], 3
+        )
+
+    def test_bad_args(self):
+        self.assertRaises(ValueError, stencil_deriv, self.values, self.coord,
+                          order=3)
+        self.assertRaises(ValueError, stencil_deriv, self.values, self.coord,
+                          scheme='bogus')
+        self.assertRaises(ValueError, stencil_deriv, self.values[:, :4],
+                          self.coord[:4], order=6)
+
+
+class TestHigherOrderDerivs(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestHigherOrderDerivs, self).setUp()
+        x = np.linspace(0., 2., 30)**1.2
+        self.x = xr.DataArray(x, dims=['x'], coords={'x': x})
+        self.arr = np.sin(self.x)
+
+    def test_cen_deriv(self):
+        errors = [float(np.abs(CenDeriv(self.arr, 'x', order=order).deriv()
+                               - np.cos(self.x)).max())
+                  for order in [6, 8]]
+        self.assertLess(errors[0], 1e-6)
+        self.assertLess(errors[1], errors[0])
+        actual = CenDeriv(self.arr, 'x', order=6, fill_edge=False).deriv()
+        self.assertEqual(actual.sizes['x'], 24)
+        np.testing.assert_array_equal(actual['x'], self.x[3:-3])
+
+    def test_one_sided(self):
+        for cls in [FwdDeriv, BwdDeriv]:
+            actual = cls(self.arr, 'x', order=3).deriv()
+            np.testing.assert_allclose(actual, np.cos(self.x), atol=1e-3)
+            xr.testing.assert_identical(
+                actual,
+                cls(self.arr, 'x', order=3, workspace=Workspace()).deriv()
+            )
+
+    def test_levels(self):
+        arr = np.log(self.pressure)
+        actual = PressureCenDeriv(arr, 'pressure', order=6).deriv()
+        xr.testing.assert_allclose(
+            actual, CenDeriv(arr, 'pressure', order=6).deriv()
+        )
+
+    def test_attrs(self):
+        arr = self.arr.assign_attrs(units='m')
+        for cls, order in [(CenDeriv, 2), (CenDeriv, 6), (FwdDeriv, 1),
+                           (BwdDeriv, 3)]:
+            for fill_edge in [True, False]:
+                actual = cls(arr, 'x', order=order,
+                             fill_edge=fill_edge).deriv()
+                self.assertEqual(actual.attrs, {'units': 'm'})
+
+    def test_dataset(self):
+        with pytest.raises(NotImplementedError):
+            CenDeriv(xr.Dataset({'a': self.arr}), 'x', order=6).deriv()
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
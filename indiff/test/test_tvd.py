@@ -0,0 +1,130 @@
+import sys
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from indiff._constants import LAT_STR, LON_STR, PFULL_STR
+from indiff.advec import TVDUpwind, LonTVDUpwind, LatTVDUpwind, EtaTVDUpwind
+from indiff.kernels import LIMITERS, limited_faces, tvd_derivs
+from . import InfiniteDiffTestCase, SphereEtaTestCase
+
+
+class TestLimiters(unittest.TestCase):
+    def test_consistent(self):
+        ratios = np.array([-1., 0., 1.])
+        for name, phi in LIMITERS.items():
+            np.testing.assert_allclose(phi(ratios), [0., 0., 1.],
+                                       err_msg=name)
+
+    def test_tvd_region(self):
+        ratios = np.linspace(0, 5, 51)
+        for name, phi in LIMITERS.items():
+            limited = phi(ratios)
+            assert np.all(limited >= 0), name
+            assert np.all(limited <= np.minimum(2*ratios, 2) + 1e-14), name
+
+    def test_bad_limiter(self):
+        self.assertRaises(ValueError, limited_faces, np.ones(5),
+                          limiter='bogus')
+
+
+class TestTVDDerivs(unittest.TestCase):
+    def setUp(self):
+        self.num_points = 100
+        self.coord = np.arange(self.num_points) / float(self.num_points)
+        self.values = np.sin(2*np.pi*self.coord)
+
+    def test_linear(self):
+        for limiter in LIMITERS:
+            pos, neg = tvd_derivs(3.*self.coord, self.coord,
+                                  limiter=limiter)
+            np.testing.assert_allclose(pos, 3.)
+            np.testing.assert_allclose(neg, 3.)
+
+    def test_cyclic(self):
+        pos, neg = tvd_derivs(self.values, self.coord, cyclic=True,
+                              circumf=1.)
+        expected = 2*np.pi*np.cos(2*np.pi*self.coord)
+        np.testing.assert_allclose(pos, expected, atol=0.1)
+        np.testing.assert_allclose(neg, expected, atol=0.1)
+
+    def test_nd_coord(self):
+        values = np.tile(self.values, (3, 1))
+        coord = np.tile(self.coord, (3, 1))
+        pos, neg = tvd_derivs(values, coord, axis=1)
+        expected = tvd_derivs(self.values, self.coord)
+        for deriv, deriv_1d in zip((pos, neg), expected):
+            np.testing.assert_allclose(deriv, np.tile(deriv_1d, (3, 1)))
+
+
+class TestTVDUpwind(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestTVDUpwind, self).setUp()
+        coord = np.arange(100) / 100.
+        self.step = xr.DataArray(((coord > 0.3) & (coord < 0.6)).astype(float),
+                                 dims=[self.dim], coords={self.dim: coord})
+
+    def test_uniform(self):
+        for limiter in LIMITERS:
+            advec = TVDUpwind(self.random, self.ones, self.dim,
+                              limiter=limiter).advec()
+            self.assertAllZeros(advec)
+
+    def test_no_new_extrema(self):
+        flow = xr.ones_like(self.step)
+        for limiter in LIMITERS:
+            arr = self.step.copy()
+            for _ in range(50):
+                arr = arr - 0.004*TVDUpwind(flow, arr, self.dim,
+                                            limiter=limiter, cyclic=True,
+                                            circumf=1.).advec()
+            assert float(arr.min()) >= -1e-12, limiter
+            assert float(arr.max()) <= 1 + 1e-12, limiter
+            np.testing.assert_allclose(arr.sum(), self.step.sum())
+
+    def test_flow_direction(self):
+        pos = TVDUpwind(xr.ones_like(self.step), self.step, self.dim,
+                        cyclic=True, circumf=1.).advec()
+        neg = TVDUpwind(-xr.ones_like(self.step),
+                        self.step.copy(data=self.step.values[::-1]),
+                        self.dim, cyclic=True, circumf=1.).advec()
+        np.testing.assert_allclose(pos.values, neg.values[::-1])
+
+    def test_bad_limiter(self):
+        self.assertRaises(ValueError, TVDUpwind, self.ones, self.ones,
+                          self.dim, limiter='bogus')
+
+
+class TestSphereTVDUpwind(SphereEtaTestCase):
+    def test_lon_cyclic(self):
+        shift = 5
+        advec = LonTVDUpwind(self.flow, self.arr).advec()
+        rolled = LonTVDUpwind(self.flow.roll(lon=shift, roll_coords=False),
+                              self.arr.roll(lon=shift, roll_coords=False))
+        np.testing.assert_allclose(
+            rolled.advec().values,
+            advec.roll(lon=shift, roll_coords=False).values
+        )
+
+    def test_uniform(self):
+        ones = xr.ones_like(self.arr)
+        self.assertAllZeros(LonTVDUpwind(self.flow, ones).advec())
+        self.assertAllZeros(LatTVDUpwind(self.flow, ones).advec())
+        self.assertAllZeros(EtaTVDUpwind(self.flow, ones, self.pk, self.bk,
+                                         self.ps).advec())
+
+    def test_eta_columns(self):
+        advec = EtaTVDUpwind(self.flow, self.arr, self.pk, self.bk, self.ps,
+                             limiter='mc').advec()
+        column = {LAT_STR: 3, LON_STR: 7}
+        p = (self.pk + self.bk*self.ps[column]).rolling(phalf=2).mean()
+        expected = TVDUpwind(self.flow[column], self.arr[column], PFULL_STR,
+                             coord=xr.DataArray(p.values[1:],
+                                                dims=[PFULL_STR]),
+                             limiter='mc').advec()
+        np.testing.assert_allclose(advec[column].values, expected.values)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
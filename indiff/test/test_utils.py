@@ -3,11 +3,10 @@ import sys
 import unittest
 
 import numpy as np
-import pytest
 import xarray as xr
 
 from indiff._constants import LON_STR
-from indiff.utils import wraparound
+from indiff.utils import broadcastable, wraparound
 
 from . import InfiniteDiffTestCase
 
@@ -50,7 +49,6 @@ class TestWraparound(WraparoundTestCase):
                                 right_to_left=i, circumf=0, spacing=1)
             xr.testing.assert_identical(actual, desired)
 
-    @pytest.mark.xfail(reason='known bug w/ two-way wraparound')
     def test_1d_both_dir_no_circumf(self):
         dim = LON_STR
         ileft = range(1, 5)
@@ -71,8 +69,7 @@ class TestWraparound(WraparoundTestCase):
         for i in range(1, 5):
             trunc = slice(0, i)
             edge = self.arr.copy()[{dim: trunc}]
-            edge_coord_values = edge[dim].values + circumf
-            edge[dim].values = edge_coord_values
+            edge = edge.assign_coords({dim: edge[dim] + circumf})
             desired = xr.concat([self.arr, edge], dim=dim)
             actual = wraparound(self.arr, dim, left_to_right=i,
                                 right_to_left=0, circumf=circumf, spacing=1)
@@ -84,14 +81,12 @@ class TestWraparound(WraparoundTestCase):
         for i in range(1, 5):
             trunc = slice(-i, None)
             edge = self.arr.copy()[{dim: trunc}]
-            edge_coord_values = edge[dim].values - circumf
-            edge[dim].values = edge_coord_values
+            edge = edge.assign_coords({dim: edge[dim] - circumf})
             desired = xr.concat([edge, self.arr], dim=dim)
             actual = wraparound(self.arr, dim, left_to_right=0,
                                 right_to_left=i, circumf=circumf, spacing=1)
             xr.testing.assert_identical(actual, desired)
 
-    @pytest.mark.xfail(reason='known bug w/ two-way wraparound')
     def test_1d_both_dir_circumf(self):
         dim = LON_STR
         circumf = 360.
@@ -100,13 +95,13 @@ class TestWraparound(WraparoundTestCase):
         for l, r in itertools.product(ileft, iright):
             trunc_left = slice(0, l)
             edge_left = self.arr.copy()[{dim: trunc_left}]
-            edge_left_coord_values = edge_left[dim].values + circumf
-            edge_left[dim].values = edge_left_coord_values
+            edge_left = edge_left.assign_coords(
+                {dim: edge_left[dim] + circumf})
 
             trunc_right = slice(-r, None)
             edge_right = self.arr.copy()[{dim: trunc_right}]
-            edge_right_coord_values = edge_right[dim].values - circumf
-            edge_right[dim].values = edge_right_coord_values
+            edge_right = edge_right.assign_coords(
+                {dim: edge_right[dim] - circumf})
 
             desired = xr.concat([edge_right, self.arr, edge_left], dim=dim)
             actual = wraparound(self.arr, dim, left_to_right=l,
@@ -114,5 +109,15 @@ class TestWraparound(WraparoundTestCase):
             xr.testing.assert_identical(actual, desired)
 
 
+class TestBroadcastable(unittest.TestCase):
+    def test_broadcastable(self):
+        template = xr.DataArray(np.zeros((2, 3, 4)), dims=['a', 'b', 'c'])
+        arr = xr.DataArray(np.arange(8.).reshape(4, 2), dims=['c', 'a'])
+        actual = broadcastable(arr, template)
+        self.assertEqual(actual.shape, (2, 1, 4))
+        np.testing.assert_array_equal(actual[:, 0], arr.values.T)
+        self.assertIs(broadcastable(template, template), template.values)
+
+
 if __name__ == '__main__':
     sys.exit(unittest.main())
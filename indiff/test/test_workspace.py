@@ -0,0 +1,116 @@
+import itertools
+import sys
+import unittest
+
+import numpy as np
+import xarray as xr
+
+from indiff import Workspace, BwdDeriv, FwdDeriv, CenDeriv, Upwind
+
+from . import InfiniteDiffTestCase
+
+
+class TestWorkspace(unittest.TestCase):
+    def setUp(self):
+        self.workspace = Workspace()
+
+    def test_empty_reused(self):
+        buf = self.workspace.empty('a', (3, 4))
+        self.assertIs(self.workspace.empty('a', (3, 4)), buf)
+        self.assertEqual(len(self.workspace), 1)
+
+    def test_empty_reallocated(self):
+        buf = self.workspace.empty('a', (3, 4))
+        self.assertIsNot(self.workspace.empty('a', (3, 5)), buf)
+        self.assertIsNot(self.workspace.empty('a', (3, 5), np.float32), buf)
+        self.assertEqual(self.workspace.empty('a', (3, 5)).shape, (3, 5))
+        self.assertEqual(len(self.workspace), 1)
+
+    def test_nbytes(self):
+        self.assertEqual(self.workspace.nbytes, 0)
+        self.workspace.empty('a', (3, 4), np.float64)
+        self.workspace.empty('b', (2,), np.float32)
+        self.assertEqual(self.workspace.nbytes, 3*4*8 + 2*4)
+        self.assertEqual(self.workspace.buffers()['b'],
+                         ((2,), np.dtype(np.float32), 8))
+
+    def test_release(self):
+        self.workspace.empty('a', (3, 4))
+        self.workspace.empty('b', (3, 4))
+        self.workspace.release('a')
+        self.assertNotIn('a', self.workspace)
+        self.assertIn('b', self.workspace)
+        self.workspace.release()
+        self.assertEqual(len(self.workspace), 0)
+        self.assertEqual(self.workspace.nbytes, 0)
+
+
+class TestDerivWorkspace(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestDerivWorkspace, self).setUp()
+        self.workspace = Workspace()
+        self.arr = self.random.copy()
+        self.arr[self.dim] = np.cumsum(self.random2.values[0]) + 1.
+
+    def _compare(self, cls, orders):
+        for order, spacing, fill_edge in itertools.product(orders, [1, 2],
+                                                           [True, False]):
+            kwargs = dict(spacing=spacing, order=order, fill_edge=fill_edge)
+            desired = cls(self.arr, self.dim, **kwargs).deriv()
+            actual = cls(self.arr, self.dim, workspace=self.workspace,
+                         **kwargs).deriv()
+            xr.testing.assert_identical(actual, desired)
+
+    def test_fwd_deriv(self):
+        self._compare(FwdDeriv, [1, 2])
+
+    def test_bwd_deriv(self):
+        self._compare(BwdDeriv, [1, 2])
+
+    def test_cen_deriv(self):
+        self._compare(CenDeriv, [2, 4])
+
+    def test_buffers_reused(self):
+        deriv_obj = CenDeriv(self.arr, self.dim, order=4,
+                             workspace=self.workspace)
+        deriv_obj.deriv()
+        buffers = dict(self.workspace._buffers)
+        deriv_obj.deriv()
+        for name, buf in self.workspace._buffers.items():
+            self.assertIs(buf, buffers[name])
+
+    def test_output_not_workspace_owned(self):
+        deriv_obj = CenDeriv(self.arr, self.dim, workspace=self.workspace)
+        first = deriv_obj.deriv()
+        desired = first.copy(deep=True)
+        deriv_obj.deriv()
+        xr.testing.assert_identical(first, desired)
+
+
+class TestUpwindWorkspace(InfiniteDiffTestCase):
+    def setUp(self):
+        super(TestUpwindWorkspace, self).setUp()
+        self.workspace = Workspace()
+        self.flow = self.random2 - 0.5
+
+    def test_flow_neg_pos(self):
+        desired = Upwind(self.flow, self.random, self.dim)._flow_neg_pos()
+        actual = Upwind(self.flow, self.random, self.dim,
+                        workspace=self.workspace)._flow_neg_pos()
+        for act, des in zip(actual, desired):
+            xr.testing.assert_identical(act, des)
+        self.assertIn('flow_neg', self.workspace)
+        self.assertIn('flow_pos', self.workspace)
+
+    def test_advec(self):
+        for order, fill_edge in itertools.product([1, 2], [True, False]):
+            kwargs = dict(order=order, fill_edge=fill_edge)
+            desired = Upwind(self.flow, self.random, self.dim,
+                             **kwargs).advec()
+            actual = Upwind(self.flow, self.random, self.dim,
+                            workspace=self.workspace, **kwargs).advec()
+            xr.testing.assert_identical(actual, desired)
+
+
+if __name__ == '__main__':
+    sys.exit(unittest.main())
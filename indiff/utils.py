@@ -13,6 +13,18 @@ def replace_coord(arr, old_dim, new_dim, new_coord):
     return ds['new_arr']
 
 
+def broadcastable(arr, template):
+    """Values of an array over a subset of the dims of the template, with
+    length-1 axes for the template's other dims."""
+    if arr.dims == template.dims:
+        return np.asarray(arr.values)
+    arr = arr.transpose(*[dim for dim in template.dims if dim in arr.dims])
+    return np.asarray(arr.values).reshape(
+        [template.sizes[dim] if dim in arr.dims else 1
+         for dim in template.dims]
+    )
+
+
 def _arr_deep_copy(arr):
     arr_copy = arr.copy(deep=True)
     arr_props = {prop: getattr(arr_copy, prop) for prop in
@@ -67,54 +79,36 @@ def to_radians(arr, is_delta=False):
 def add_cyclic_to_left(arr, dim, num_points, circumf):
     if not num_points:
         return arr
-    # Make an isolated copy of the original coord values.
-    arr_dim_values = arr[dim].values.copy()
-    # Make an isolated copy of the whole original DataArray.
-    arr_out = xr.DataArray(arr.values.copy(),
-                           dims=arr.dims, coords=arr.coords)
-    # Grab the edge values of the copied array.
-    trunc = {dim: slice(-num_points, None)}
-    edge = deep_copy(arr_out.isel(**trunc))
-    # Subtract the circumference from the coordinates
-    edge[dim] -= circumf
-    # Join together the modified edge coord with the original coord.
-    new_coord_values = np.concatenate([edge[dim].values.copy(),
-                                       arr_dim_values])
+    # Grab an isolated copy of the edge values of the array.
+    edge = arr.isel(**{dim: slice(-num_points, None)}).copy(deep=True)
+    # Subtract the circumference from the coordinates.
+    edge = edge.assign_coords(**{dim: edge[dim].values - circumf})
     # Join together the edge array with the original array.
-    new_arr = xr.concat([edge, arr], dim=dim)
-    # Override the coord with the one just created.
-    new_arr[dim].values = new_coord_values
-    return new_arr
+    return xr.concat([edge, arr], dim=dim)
 
 
 def add_cyclic_to_right(arr, dim, num_points, circumf):
     if not num_points:
         return arr
-    # Make an isolated copy of the original coord values.
-    arr_dim_values = arr[dim].values.copy()
-    # Make an isolated copy of the whole original DataArray.
-    arr_out = xr.DataArray(arr.values.copy(),
-                           dims=arr.dims, coords=arr.coords)
-    # Grab the edge values of the copied array.
-    trunc = {dim: slice(0, num_points)}
-    edge = deep_copy(arr_out.isel(**trunc))
+    # Grab an isolated copy of the edge values of the array.
+    edge = arr.isel(**{dim: slice(0, num_points)}).copy(deep=True)
     # Add the circumference to the coordinates.
-    edge[dim] += circumf
-    # Join together the modified edge coord with the original coord.
-    new_coord_values = np.concatenate([arr_dim_values,
-                                       edge[dim].values.copy()])
+    edge = edge.assign_coords(**{dim: edge[dim].values + circumf})
     # Join together the edge array with the original array.
-    new_arr = xr.concat([arr, edge], dim=dim)
-    # Override the coord with the one just created.
-    new_arr[dim].values = new_coord_values
-    return new_arr
+    return xr.concat([arr, edge], dim=dim)
 
 
 def wraparound(arr, dim, left_to_right=0, right_to_left=0,
                circumf=360., spacing=1):
-    """Append wrap-around point(s) to the DataArray or Dataset coord."""
-    # TODO: Bugfix: if points on both sides are added, as written this
-    # causes the points first added to the right to then be added to the left,
-    # rather than the original points on the right.
+    """Append wrap-around point(s) to the DataArray or Dataset coord.
+
+    The first `left_to_right` points are appended to the right end, and the
+    last `right_to_left` points of the original array are prepended to the
+    left end.
+    """
     new = add_cyclic_to_right(arr, dim, left_to_right, circumf)
-    return add_cyclic_to_left(new, dim, right_to_left, circumf)
+    if not right_to_left:
+        return new
+    edge = add_cyclic_to_left(arr, dim, right_to_left, circumf)
+    return xr.concat([edge.isel(**{dim: slice(0, right_to_left)}), new],
+                     dim=dim)
@@ -0,0 +1,69 @@
+"""Scratch memory reused across repeated operator calls."""
+import numpy as np
+
+
+class Workspace(object):
+    """Named scratch buffers that persist between operator calls.
+
+    Operators that are given a `Workspace` draw their transient arrays (e.g.
+    sliced differences and flow-sign masks) from it rather than allocating
+    new ones on every call.  Each buffer is identified by a name and is
+    reallocated only when a different shape or dtype is requested under that
+    name, so repeated calls on identically shaped data allocate nothing after
+    the first call.
+
+    A single `Workspace` can be owned by one operator or shared among many
+    that are called in sequence.  It is not safe to share one between
+    threads or processes.
+    """
+    def __init__(self):
+        self._buffers = {}
+
+    def empty(self, name, shape, dtype=float):
+        """Get an uninitialized buffer with the given name, shape, and dtype.
+
+        :param str name: Identifier of the buffer within this workspace.
+        :param tuple shape: Required shape of the buffer.
+        :param dtype: Required dtype of the buffer.
+        :out: `numpy.ndarray` owned by the workspace.  Its contents are
+            undefined and it will be overwritten by later requests for the
+            same name.
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        return buf
+
+    @property
+    def nbytes(self):
+        """Total number of bytes held by the workspace's buffers."""
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+    def buffers(self):
+        """Name, shape, dtype, and size in bytes of each held buffer."""
+        return {name: (buf.shape, buf.dtype, buf.nbytes)
+                for name, buf in self._buffers.items()}
+
+    def release(self, name=None):
+        """Drop the workspace's reference to one or all of its buffers.
+
+        :param str name: Buffer to release.  If None, release all of them.
+        """
+        if name is None:
+            self._buffers.clear()
+        else:
+            self._buffers.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._buffers
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def __repr__(self):
+        return '<{} with {} buffers, {} bytes>'.format(
+            type(self).__name__, len(self), self.nbytes
+        )
@@ -11,7 +11,9 @@ setuptools.setup(
                       'toolz >= 0.7.2',
                       'cloudpickle >= 0.2.1',
                       'xarray >= 0.9.1'],
+    python_requires='>=3.8',
     tests_require=['pytest >= 2.7.1'],
+    entry_points={'console_scripts': ['indiff = indiff.cli:main']},
     license="Apache",
     keywords="climate science, xarray, finite differencing",
     url="https://github.com/spencerahill/infinite-diff",
@@ -20,10 +22,12 @@ setuptools.setup(
         'Intended Audience :: Science/Research',
         'License :: OSI Approved :: Apache Software License',
         'Natural Language :: English',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Topic :: Scientific/Engineering :: Atmospheric Science'
     ]
 )